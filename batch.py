@@ -0,0 +1,233 @@
+"""
+Offline processing of recordings (LOCAL_VIDEO) and image folders
+(LOCAL_IMAGE): no display, decode and detection spread over a pool of
+worker processes, results streamed to JSONL or CSV.
+
+    python batch.py recordings/*.mp4 --output audit.jsonl
+    python batch.py images/ --detectors aruco two_stage --output audit.csv
+    python batch.py day.mp4 --output day.jsonl --every 5 --workers 4
+
+Videos are split in chunks of frames, so a single long recording also uses
+every core. Finished chunks are listed in `<output>.done` with the size of
+the output after them; running the same command again after an interruption
+drops any records written past the last finished chunk, skips the finished
+chunks and appends to the output.
+"""
+import argparse
+import csv
+import glob
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from src.opencv_engine import *
+from src.camera_config import DETECTORS, CameraSpec, detector_factory
+
+IMAGE_EXTENSIONS: tuple = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+
+_detector = None
+
+
+def list_units(paths: list, chunk: int) -> list:
+    # (kind, source, start, end): frames [start, end) of a video, end None reading
+    # until the end, or for images the list of paths of the chunk and the index
+    # of its first image (in its folder, or among the images given one by one)
+    units = []
+    loose = 0
+    for path in paths:
+        if os.path.isdir(path):
+            images = sorted(name for name in glob.glob(os.path.join(path, "**", "*"), recursive=True)
+                            if name.lower().endswith(IMAGE_EXTENSIONS))
+            units += [("images", path, start, images[start:start + chunk])
+                      for start in range(0, len(images), chunk)]
+        elif path.lower().endswith(IMAGE_EXTENSIONS):
+            units.append(("images", os.path.dirname(path), loose, [path]))
+            loose += 1
+        else:
+            capture = cv.VideoCapture(path)
+            frames = int(capture.get(cv.CAP_PROP_FRAME_COUNT))
+            capture.release()
+            if frames <= 0:
+                # unknown length: a single chunk read until the end
+                units.append(("video", path, 0, None))
+                continue
+            units += [("video", path, start, start + chunk if start + chunk < frames else None)
+                      for start in range(0, frames, chunk)]
+    return units
+
+
+def unit_key(unit: tuple) -> str:
+    kind, source, start, end = unit
+    if kind == "images":
+        # images given one by one share their folder and start
+        return "{}|{}".format(kind, end[0])
+    return "{}|{}|{}".format(kind, source, start)
+
+
+def load_progress(progress: str) -> tuple:
+    # (finished keys, output size after the last of them)
+    done, size = set(), 0
+    if not os.path.exists(progress):
+        return done, size
+    with open(progress) as progress_file:
+        for line in progress_file:
+            key, tab, offset = line.rstrip("\n").rpartition("\t")
+            # a line cut short by a crash is not finished
+            if tab and line.endswith("\n") and offset.isdigit():
+                done.add(key)
+                size = int(offset)
+    return done, size
+
+
+def _init_worker(factory) -> None:
+    global _detector
+    # parallelism comes from the processes, avoid oversubscribing the cores
+    cv.setNumThreads(1)
+    _detector = factory(None)
+
+
+def _record(source: str, frame: int | str, seconds: float | None, detections: Detections) -> dict:
+    record = {
+        "source": source,
+        "frame": frame,
+        "time": None if seconds is None else round(seconds, 3),
+        "ids": detections.ids.tolist(),
+        "corners": detections.corners.round(1).tolist(),
+        "barcodes": [{"data": data, "type": kind, "rect": list(rect)}
+                     for data, kind, rect in detections.barcodes],
+    }
+    if detections.rvecs is not None:
+        record["rvecs"] = detections.rvecs.astype(float).round(4).tolist()
+        record["tvecs"] = detections.tvecs.astype(float).round(4).tolist()
+    return record
+
+
+def process_unit(task: tuple) -> tuple:
+    unit, every = task
+    kind, source, start, end = unit
+    records, frames = [], 0
+
+    if kind == "images":
+        for index, path in enumerate(end, start):
+            if index % every:
+                continue
+            image = cv.imread(path)
+            if image is None:
+                print("[ERROR] Cannot read {}".format(path), file=sys.stderr)
+                continue
+            frames += 1
+            records.append(_record(source, os.path.relpath(path, source), None, _detector.detect_frame(image)))
+        return unit, records, frames
+
+    capture = cv.VideoCapture(source)
+    fps = capture.get(cv.CAP_PROP_FPS) or 0.0
+    if start:
+        capture.set(cv.CAP_PROP_POS_FRAMES, start)
+    index = start
+    while end is None or index < end:
+        # skipped frames are grabbed but never decoded
+        if index % every:
+            if not capture.grab(): break
+        else:
+            ret, image = capture.read()
+            if not ret: break
+            frames += 1
+            records.append(_record(source, index, index / fps if fps else None, _detector.detect_frame(image)))
+        index += 1
+    capture.release()
+    return unit, records, frames
+
+
+class Writer:
+    # streams the records as JSONL, or as CSV with one row per marker/barcode
+    def __init__(self, path: str, empty: bool = False) -> None:
+        self.csv = path.lower().endswith(".csv")
+        self.empty = empty
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "a", newline="")
+        if self.csv:
+            self.writer = csv.writer(self.file)
+            if new:
+                self.writer.writerow(["source", "frame", "time", "kind", "value", "points"])
+
+    def write(self, records: list) -> None:
+        for record in records:
+            if not self.empty and not record["ids"] and not record["barcodes"]:
+                continue
+            if not self.csv:
+                self.file.write(json.dumps(record, separators=(",", ":")) + "\n")
+                continue
+            head = [record["source"], record["frame"], record["time"]]
+            for marker_id, corners in zip(record["ids"], record["corners"]):
+                self.writer.writerow(head + ["marker", marker_id, json.dumps(corners)])
+            for barcode in record["barcodes"]:
+                self.writer.writerow(head + [barcode["type"], barcode["data"], json.dumps(barcode["rect"])])
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def size(self) -> int:
+        # bytes on disk, the records are flushed by write()
+        return os.fstat(self.file.fileno()).st_size
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="video files, image files or folders of images")
+    parser.add_argument("--output", required=True, help=".jsonl or .csv")
+    parser.add_argument("--detectors", nargs="+", choices=sorted(DETECTORS), default=["aruco"])
+    parser.add_argument("--processing-width", type=int, default=None)
+    parser.add_argument("--calibration", default=None, help="adds marker poses (JSONL), see calibrate.py")
+    parser.add_argument("--marker-length", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=None, help="default: one per core")
+    parser.add_argument("--chunk", type=int, default=300, help="frames or images per task")
+    parser.add_argument("--every", type=int, default=1, help="process one frame, or image, out of N")
+    parser.add_argument("--empty", action="store_true", help="also write frames without detections")
+    parser.add_argument("--restart", action="store_true", help="ignore the progress of a previous run")
+    args = parser.parse_args()
+
+    pose = {"calibration": args.calibration, "marker_length": args.marker_length} if args.calibration else {}
+    spec = CameraSpec("batch", "LOCAL_VIDEO", detectors=args.detectors, processing_width=args.processing_width,
+                      pose=pose).validate()
+    factory = detector_factory(spec)
+
+    progress = args.output + ".done"
+    if args.restart:
+        for path in (args.output, progress):
+            if os.path.exists(path): os.remove(path)
+    done, size = load_progress(progress)
+    if os.path.exists(args.output) and not os.path.exists(progress) and os.path.getsize(args.output):
+        print("[WARN] {} exists without {}: appending to it, use --restart to overwrite it".format(
+            args.output, progress), file=sys.stderr)
+    elif os.path.exists(args.output) and os.path.getsize(args.output) > size:
+        # records of a chunk that was not marked finished: it runs again
+        with open(args.output, "r+") as output:
+            output.truncate(size)
+
+    units = [unit for unit in list_units(args.paths, args.chunk) if unit_key(unit) not in done]
+    print("[INFO] {} tasks to process, {} already done".format(len(units), len(done)), file=sys.stderr)
+
+    writer = Writer(args.output, args.empty)
+    start, frames = time.monotonic(), 0
+    # spawn: same process model as DetectionPool
+    with mp.get_context("spawn").Pool(args.workers, _init_worker, (factory,)) as pool, \
+         open(progress, "a") as progress_file:
+        # imap keeps the output in input order
+        for count, (unit, records, unit_frames) in enumerate(
+                pool.imap(process_unit, [(unit, args.every) for unit in units]), 1):
+            writer.write(records)
+            progress_file.write("{}\t{}\n".format(unit_key(unit), writer.size()))
+            progress_file.flush()
+            os.fsync(progress_file.fileno())
+            frames += unit_frames
+            elapsed = time.monotonic() - start
+            print("[INFO] {}/{} tasks, {} frames, {:.1f} FPS".format(
+                count, len(units), frames, frames / elapsed if elapsed else 0.0), file=sys.stderr)
+    writer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Detection with and without the change-detection cache (CachedReader) on a
+mostly static recording: CPU time per frame, cache hit rate and recall.
+Stale results are visible as detections reported on empty frames.
+
+    python -m benchmarks.bench_cache
+    python -m benchmarks.bench_cache --video recording.mp4 --threshold 12 --max-age 1.0
+"""
+import argparse
+import time
+from src.opencv_engine import *
+from benchmarks.synthetic import mostly_static
+from benchmarks.common import load_video, recall
+
+
+def run(reader, frames: list) -> tuple:
+    found, cpu = [], 0.0
+    for frame in frames:
+        start = time.process_time()
+        detections = reader.detect_frame(frame)
+        cpu += time.process_time() - start
+        found.append(set(detections.ids.tolist()))
+    return found, cpu / len(frames)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", default=None)
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--threshold", type=float, default=8.0)
+    parser.add_argument("--max-age", type=float, default=None,
+                        help="seconds; off by default since frames are replayed faster than real time")
+    parser.add_argument("--refresh-interval", type=int, default=30)
+    args = parser.parse_args()
+
+    if args.video:
+        frames, truth = load_video(args.video), None
+    else:
+        frames, truth = zip(*mostly_static(args.frames))
+
+    full, full_cpu = run(ArucoReader(None), frames)
+    truth = truth or full
+    cached_reader = CachedReader(None, threshold=args.threshold, max_age=args.max_age,
+                                 refresh_interval=args.refresh_interval)
+    cached, cached_cpu = run(cached_reader, frames)
+    stale = sum(len(f - t) for f, t in zip(cached, truth))
+
+    print("full:   {:.2f} ms CPU/frame, recall {:.3f}".format(full_cpu * 1000, recall(full, truth)))
+    print("cached: {:.2f} ms CPU/frame, recall {:.3f}, stale ids {}, hit rate {:.2f}, CPU -{:.0%}".format(
+        cached_cpu * 1000, recall(cached, truth), stale, cached_reader.hit_rate(),
+        1 - cached_cpu / full_cpu))
@@ -0,0 +1,64 @@
+"""
+Event clip recording costs: JPEG encode time and size per frame for a few
+widths and qualities (hence the memory a pre-trigger window needs), the
+time the camera thread spends handing frames to the recorder, and the
+clip write throughput of the output folder (with fsync, as the recorder).
+
+    python -m benchmarks.bench_clips
+    python -m benchmarks.bench_clips --video recording.mp4 --output /media/sd/clips --seconds 10
+"""
+import argparse
+import shutil
+import tempfile
+import time
+import numpy as np
+from src.opencv_engine import *
+from src.recorder import ClipRecorder
+from benchmarks.synthetic import moving_markers
+from benchmarks.common import load_video
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", default=None)
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--fps", type=float, default=10.0, help="encoded frames per second")
+    parser.add_argument("--seconds", type=float, default=5.0, help="pre-trigger window")
+    parser.add_argument("--output", default=None, help="folder to test, default a temporary one")
+    args = parser.parse_args()
+
+    if args.video:
+        frames = load_video(args.video, args.frames)
+    else:
+        frames = [frame for frame, _ in moving_markers(args.frames, width=1280, height=720, marker_size=90)]
+
+    for width in (None, 640, 320):
+        for quality in (90, 80, 60):
+            params = [cv.IMWRITE_JPEG_QUALITY, quality]
+            start = time.process_time()
+            sizes = [len(cv.imencode(".jpg", resize_to_width(frame, width), params)[1]) for frame in frames]
+            cpu = (time.process_time() - start) / len(frames)
+            print("width {:>6} quality {}: {:6.2f} ms CPU/frame {:6.1f} KB/frame "
+                  "{:5.1f} MB per {:g} s at {:g} FPS".format(width or "native", quality, cpu * 1000,
+                                                            np.mean(sizes) / 1024,
+                                                            np.mean(sizes) * args.fps * args.seconds / 1e6,
+                                                            args.seconds, args.fps))
+
+    output = args.output or tempfile.mkdtemp()
+    recorder = ClipRecorder("bench", output, pre_seconds=args.seconds, post_seconds=0.0, fps=0)
+    # the camera thread only hands over a reference
+    handoff = []
+    for index, frame in enumerate(frames):
+        start = time.perf_counter()
+        recorder.push(frame, index / 30.0)
+        handoff.append(time.perf_counter() - start)
+        time.sleep(0.01)
+    recorder.trigger("bench", len(frames) / 30.0)
+    recorder.push(frames[-1], len(frames) / 30.0)
+    time.sleep(0.5)
+    recorder.close()
+    stats = recorder.stats()
+    print("camera thread hand-off: {:.1f} us/frame".format(np.median(handoff) * 1e6))
+    print("recorder: {}".format(stats))
+    if not args.output:
+        shutil.rmtree(output)
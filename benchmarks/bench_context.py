@@ -0,0 +1,56 @@
+"""
+Shared per-frame context: ArUco plus two-stage barcode detection and the
+display resize on the same frames, with every reader handed the raw ndarray
+(each one converts and resizes on its own; `legacy` also feeds BGR to
+detectMarkers as before) against one FrameContext shared by all of them.
+
+    python -m benchmarks.bench_context
+    python -m benchmarks.bench_context --frames 100 --processing-width 640
+"""
+import argparse
+import time
+import numpy as np
+from src.opencv_engine import *
+from benchmarks.synthetic import corpus
+
+
+def step(readers: list, frame, display_width: int, shared: bool) -> tuple:
+    start = time.process_time()
+    source = FrameContext(frame) if shared else frame
+    found = sum(len(reader.detect_frame(source).ids) for reader in readers)
+    readers[0].display_image(source, display_width)
+    return time.process_time() - start, found
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--processing-width", type=int, default=None)
+    parser.add_argument("--display-width", type=int, default=640)
+    args = parser.parse_args()
+
+    frames = [frame for frame, _ in corpus(args.frames, width=args.width, height=args.height)]
+    modes = [
+        ("legacy (BGR, per reader)", False, False),
+        ("gray, per reader", True, False),
+        ("gray, shared context", True, True),
+    ]
+    readers = {name: [ArucoReader(None, processing_width=args.processing_width, grayscale=grayscale),
+                      BarcodeReaderTwoStage(None)] for name, grayscale, _ in modes}
+    times = {name: [] for name, _, _ in modes}
+    found = dict.fromkeys(times, 0)
+
+    # modes interleaved frame by frame, so machine noise hits them alike
+    for _ in range(args.repeat):
+        for frame in frames:
+            for name, _, shared in modes:
+                cpu, markers = step(readers[name], frame, args.display_width, shared)
+                times[name].append(cpu)
+                found[name] += markers
+    for name in times:
+        print("{:26s} median {:6.2f} ms CPU/frame, mean {:6.2f} ms {:5.2f} markers/frame".format(
+            name, np.median(times[name]) * 1000, np.mean(times[name]) * 1000,
+            found[name] / len(times[name])))
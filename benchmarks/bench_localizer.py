@@ -0,0 +1,46 @@
+"""
+Micro-benchmark of detect_barcode against BarcodeLocalizer on synthetic
+EAN-13 scenes. At scale 1.0 both return the same box, so the difference is
+only kernel/buffer reuse; lower scales add the downscaled processing. `hit`
+is the share of frames whose box contains the barcode center.
+
+    python -m benchmarks.bench_localizer --width 1920 --height 1080
+"""
+import argparse
+import time
+import cv2 as cv
+import numpy as np
+from src.opencv_engine import detect_barcode, BarcodeLocalizer
+from benchmarks.synthetic import barcode_scene
+
+
+def run(locate, scenes: list, repeat: int) -> tuple:
+    hits = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for image, center in scenes:
+            box = locate(image)
+            hits += box is not None and cv.pointPolygonTest(box.astype(np.float32), center, False) >= 0
+    total = repeat * len(scenes)
+    return (time.perf_counter() - start) / total * 1000, hits / total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(0)
+    scenes = []
+    for angle in (0, 5, 10, 20, 30):
+        center = (int(rng.integers(300, args.width - 300)), int(rng.integers(200, args.height - 200)))
+        code = "".join(str(d) for d in rng.integers(0, 10, 12))
+        scenes.append((barcode_scene(code, args.width, args.height, angle=angle, center=center), center))
+    
+    print("{:<22} {:>9} {:>6}".format("", "ms/frame", "hit"))
+    print("{:<22} {:>9.2f} {:>6.2f}".format("detect_barcode", *run(detect_barcode, scenes, args.repeat)))
+    for scale in (1.0, 0.5, 0.25):
+        localizer = BarcodeLocalizer(scale)
+        print("{:<22} {:>9.2f} {:>6.2f}".format("localizer x{}".format(scale), *run(localizer.box, scenes, args.repeat)))
@@ -0,0 +1,65 @@
+"""
+MJPEG network capture: cv.VideoCapture (FFmpeg, full colour decode) against
+MjpegCapture decoding with cv.imdecode at full, 1/2 and 1/4 resolution, in
+colour and grayscale. Reports client CPU per frame, delivered FPS and the
+markers found per frame. The stream comes from a local MJPEG server run in
+a separate process, so its encoding does not count.
+
+    python -m benchmarks.bench_mjpeg
+    python -m benchmarks.bench_mjpeg --width 1920 --height 1080 --frames 300
+"""
+import argparse
+import subprocess
+import sys
+import time
+from src.opencv_engine import *
+from src.capture import MjpegCapture
+
+
+def measure(capture, frames: int, reader: ArucoReader) -> dict:
+    # the first frame includes connection setup
+    capture.read()
+    cpu, found = 0.0, 0
+    wall = time.perf_counter()
+    for _ in range(frames):
+        start = time.process_time()
+        ret, image = capture.read()
+        cpu += time.process_time() - start
+        if not ret:
+            break
+        found += len(reader.detect_frame(image).ids)
+    wall = time.perf_counter() - wall
+    size = "{}x{}".format(image.shape[1], image.shape[0]) if ret else "-"
+    capture.release()
+    return {"size": size, "cpu_ms": cpu / frames * 1000, "fps": frames / wall, "markers": found / frames}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--port", type=int, default=8093)
+    args = parser.parse_args()
+
+    server = subprocess.Popen([sys.executable, "-m", "benchmarks.mjpeg_server", "--port", str(args.port),
+                               "--width", str(args.width), "--height", str(args.height),
+                               "--fps", str(args.fps)], stdout=subprocess.PIPE)
+    server.stdout.readline()
+    url = "http://127.0.0.1:{}/video.mjpg".format(args.port)
+    reader = ArucoReader(None)
+
+    modes = [("VideoCapture FFmpeg", lambda: cv.VideoCapture(url, cv.CAP_FFMPEG))]
+    for reduce in (1, 2, 4):
+        for grayscale in (False, True):
+            name = "imdecode 1/{} {}".format(reduce, "gray" if grayscale else "color")
+            modes.append((name, lambda reduce=reduce, grayscale=grayscale:
+                          MjpegCapture(url, reduce=reduce, grayscale=grayscale)))
+    try:
+        for name, open_capture in modes:
+            result = measure(open_capture(), args.frames, reader)
+            print("{:22s} {:>10s} {:6.2f} ms CPU/frame {:6.1f} FPS {:5.2f} markers/frame".format(
+                name, result["size"], result["cpu_ms"], result["fps"], result["markers"]))
+    finally:
+        server.terminate()
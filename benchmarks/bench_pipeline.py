@@ -0,0 +1,63 @@
+"""
+Replays recorded videos through the camera pipeline, as if they were live
+cameras, and reports the achieved FPS and per-stage latency.
+
+    python -m benchmarks.bench_pipeline video1.mp4 video2.mp4 --duration 20
+    python -m benchmarks.bench_pipeline video1.mp4 --legacy
+"""
+import argparse
+import threading
+import time
+from src.opencv_engine import *
+from benchmarks.common import video_fps
+
+
+def run_pipeline(path: str, target_fps: float | None, duration: float, results: dict) -> None:
+    grabber = FrameGrabber(path, pace_fps=video_fps(path))
+    pipeline = CameraPipeline(grabber, ArucoReader(None), target_fps)
+    end = time.monotonic() + duration
+    
+    while time.monotonic() < end and pipeline.step() is not None:
+        pass
+    
+    results[path] = pipeline.stats.snapshot()
+    pipeline.release()
+
+
+def run_legacy(path: str, duration: float, results: dict) -> None:
+    # Former WorkerCam loop: process one frame, then sleep a fixed 100 ms
+    reader = ArucoReader(FrameGrabber(path, pace_fps=video_fps(path)))
+    stats = PipelineStats()
+    end = time.monotonic() + duration
+    
+    while time.monotonic() < end and not reader.image_buffer.finished:
+        start = time.monotonic()
+        try:
+            reader.aruco_proccesor()
+        except AttributeError:
+            break
+        stats.record("detect", time.monotonic() - start)
+        stats.frame_done()
+        time.sleep(0.1)
+    
+    results[path] = stats.snapshot()
+    reader.image_buffer.release()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument("--target-fps", type=float, default=None)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--legacy", action="store_true", help="use the fixed 100 ms polling loop")
+    args = parser.parse_args()
+    
+    results: dict = {}
+    threads = [threading.Thread(target=run_legacy, args=(path, args.duration, results)) if args.legacy
+               else threading.Thread(target=run_pipeline, args=(path, args.target_fps, args.duration, results))
+               for path in args.videos]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    
+    for path, stats in results.items():
+        print("{}: {}".format(path, stats))
@@ -0,0 +1,58 @@
+"""
+Compares in-thread detection against the DetectionPool process mode with
+several simultaneous streams, reporting the detection throughput.
+
+    python -m benchmarks.bench_pool video.mp4 --streams 4 --workers 4
+"""
+import argparse
+import threading
+import time
+from src.opencv_engine import *
+from src.detection_pool import DetectionPool, PooledCameraPipeline
+from benchmarks.common import video_fps
+
+
+def run_streams(pipelines: list, duration: float) -> None:
+    end = time.monotonic() + duration
+    
+    def loop(pipeline) -> None:
+        while time.monotonic() < end and pipeline.step() is not None:
+            pass
+    
+    threads = [threading.Thread(target=loop, args=(pipeline,)) for pipeline in pipelines]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+
+
+def bench_threads(path: str, streams: int, duration: float) -> float:
+    pipelines = [CameraPipeline(FrameGrabber(path, pace_fps=video_fps(path)), ArucoReader(None))
+                 for _ in range(streams)]
+    run_streams(pipelines, duration)
+    
+    detected = sum(pipeline.stats.frames for pipeline in pipelines)
+    for pipeline in pipelines: pipeline.release()
+    return detected / duration
+
+
+def bench_pool(path: str, streams: int, workers: int, duration: float) -> float:
+    pool = DetectionPool(workers)
+    pipelines = [PooledCameraPipeline(FrameGrabber(path, pace_fps=video_fps(path)), ArucoReader, pool, camera)
+                 for camera in range(streams)]
+    run_streams(pipelines, duration)
+    
+    detected = sum(pool.completed.values())
+    for pipeline in pipelines: pipeline.release()
+    pool.close()
+    return detected / duration
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video")
+    parser.add_argument("--streams", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+    
+    print("threads: {:.1f} detections/s".format(bench_threads(args.video, args.streams, args.duration)))
+    print("pool:    {:.1f} detections/s".format(bench_pool(args.video, args.streams, args.workers, args.duration)))
@@ -0,0 +1,84 @@
+"""
+MJPEG preview fan-out on localhost: a synthetic camera publishes annotated
+frames while fast clients and one slow client (reading at a fraction of
+the rate) are connected. Reports frames published, JPEG encodes and frames
+received per client, first with nobody watching (no encode expected),
+then with the clients, then at two quality levels at once.
+
+    python -m benchmarks.bench_preview
+    python -m benchmarks.bench_preview --clients 8 --seconds 10 --fps 30
+"""
+import argparse
+import http.client
+import threading
+import time
+from src.preview import PreviewServer
+from benchmarks.synthetic import moving_markers
+
+
+def client(port: int, path: str, stop: threading.Event, received: list, index: int, delay: float) -> None:
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+    connection.request("GET", path)
+    response = connection.getresponse()
+    try:
+        while not stop.is_set():
+            line = response.fp.readline()
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":")[1])
+                response.fp.readline()
+                response.fp.read(length)
+                received[index] += 1
+                if delay:
+                    time.sleep(delay)
+    except OSError:
+        # no more frames once the camera stopped publishing
+        pass
+    connection.close()
+
+
+def run(server: PreviewServer, frames: list, fps: float, seconds: float, paths: list, delays: list) -> tuple:
+    channel = server.channel(0)
+    stop = threading.Event()
+    received = [0] * len(paths)
+    threads = [threading.Thread(target=client, args=(server.port, path, stop, received, index, delay), daemon=True)
+               for index, (path, delay) in enumerate(zip(paths, delays))]
+    for thread in threads:
+        thread.start()
+    encodes, published = channel.encodes, 0
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        channel.publish(frames[published % len(frames)])
+        published += 1
+        time.sleep(1.0 / fps)
+    stop.set()
+    for thread in threads:
+        thread.join(2.0)
+    time.sleep(0.2)
+    return published, channel.encodes - encodes, received
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=4, help="fast clients, plus one slow")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--fps", type=float, default=30.0, help="camera rate")
+    parser.add_argument("--slow-delay", type=float, default=0.25, help="seconds the slow client waits per frame")
+    args = parser.parse_args()
+
+    frames = [frame for frame, _ in moving_markers(60, width=640, height=480)]
+    server = PreviewServer(0, max_fps=args.fps).start()
+    try:
+        published, encodes, _ = run(server, frames, args.fps, 1.0, [], [])
+        print("no client:      {} frames published, {} encodes".format(published, encodes))
+
+        paths = ["/camera/0.mjpg"] * (args.clients + 1)
+        delays = [0.0] * args.clients + [args.slow_delay]
+        published, encodes, received = run(server, frames, args.fps, args.seconds, paths, delays)
+        print("{} fast + 1 slow: {} frames published, {} encodes, received {} (slow {})".format(
+            args.clients, published, encodes, received[:-1], received[-1]))
+
+        paths = ["/camera/0.mjpg?quality=80", "/camera/0.mjpg?quality=40"] * 2
+        published, encodes, received = run(server, frames, args.fps, args.seconds, paths, [0.0] * 4)
+        print("2 qualities x 2: {} frames published, {} encodes, received {}".format(published, encodes, received))
+    finally:
+        server.stop()
@@ -0,0 +1,53 @@
+"""
+Pyramid detection against single-resolution detection on a sequence with
+markers of mixed sizes. Reports time per frame, recall and how many markers
+each pyramid level resolved.
+
+    python -m benchmarks.bench_pyramid --levels 320 640 0 --min-markers 4
+"""
+import argparse
+import time
+from collections import Counter
+from src.opencv_engine import *
+from benchmarks.synthetic import moving_markers
+from benchmarks.common import load_video, recall
+
+
+def run(reader: ArucoReader, frames: list) -> tuple:
+    found, levels = [], Counter()
+    start = time.perf_counter()
+    for frame in frames:
+        detections = reader.detect_frame(frame)
+        found.append(set(detections.ids.tolist()))
+        if detections.levels is not None:
+            levels.update(detections.levels.tolist())
+    return found, (time.perf_counter() - start) / len(frames), levels
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", default=None)
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--levels", type=int, nargs="+", default=[320, 640, 0],
+                        help="coarse to fine widths, 0 means native resolution")
+    parser.add_argument("--min-markers", type=int, default=1)
+    parser.add_argument("--no-crops", action="store_true")
+    args = parser.parse_args()
+    
+    if args.video:
+        frames, truth = load_video(args.video), None
+    else:
+        frames, truth = zip(*moving_markers(args.frames, ids=(1, 2, 3, 4), width=1280, height=720,
+                                            marker_size=(40, 60, 120, 160)))
+    
+    found, elapsed, _ = run(ArucoReader(None), frames)
+    truth = truth or found
+    print("native:  {:.2f} ms/frame, recall {:.3f}".format(elapsed * 1000, recall(found, truth)))
+    
+    levels = tuple(level or None for level in args.levels)
+    reader = ArucoReader(None, pyramid=levels, min_markers=args.min_markers,
+                         pyramid_crops=not args.no_crops)
+    found, elapsed, resolved = run(reader, frames)
+    print("pyramid: {:.2f} ms/frame, recall {:.3f}".format(elapsed * 1000, recall(found, truth)))
+    for level, width in enumerate(levels):
+        print("  level {} ({}): {} markers".format(level, width or "native", resolved.get(level, 0)))
@@ -0,0 +1,71 @@
+"""
+Overlay cost with many markers per frame: the former per-marker loop of
+ArucoReader.aruco_display against src.rendering, on the full resolution
+frame and on the 640 px display frame.
+
+    python -m benchmarks.bench_rendering --markers 48
+"""
+import argparse
+import time
+import cv2 as cv
+import numpy as np
+from src.rendering import draw_markers
+
+
+def legacy_display(corners, ids, image):
+    for (markerCorner, markerID) in zip(corners, ids.flatten()):
+        (topLeft, topRight, bottomRight, bottomLeft) = markerCorner.reshape((4, 2))
+        topRight = (int(topRight[0]), int(topRight[1]))
+        bottomRight = (int(bottomRight[0]), int(bottomRight[1]))
+        bottomLeft = (int(bottomLeft[0]), int(bottomLeft[1]))
+        topLeft = (int(topLeft[0]), int(topLeft[1]))
+        cv.line(image, topLeft, topRight, (0, 255, 0), 2)
+        cv.line(image, topRight, bottomRight, (0, 255, 0), 2)
+        cv.line(image, bottomRight, bottomLeft, (0, 255, 0), 2)
+        cv.line(image, bottomLeft, topLeft, (0, 255, 0), 2)
+        cX = int((topLeft[0] + bottomRight[0]) / 2.0)
+        cY = int((topLeft[1] + bottomRight[1]) / 2.0)
+        cv.circle(image, (cX, cY), 4, (0, 0, 255), -1)
+        cv.putText(image, str(markerID), (topLeft[0], topLeft[1] - 10), cv.FONT_HERSHEY_SIMPLEX,
+                   0.5, (0, 255, 0), 2)
+    return image
+
+
+def grid(markers: int, width: int, height: int) -> tuple:
+    side = int(np.ceil(np.sqrt(markers)))
+    cell = min(width, height) / side
+    corners = []
+    for i in range(markers):
+        x, y = (i % side) * cell + cell * 0.2, (i // side) * cell + cell * 0.2
+        s = cell * 0.6
+        corners.append([[x, y], [x + s, y], [x + s, y + s], [x, y + s]])
+    return np.array(corners, dtype=np.float32), np.arange(markers, dtype=np.int32)
+
+
+def timed(draw, image: np.ndarray, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        draw(image.copy())
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--markers", type=int, default=48)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    
+    full = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    display = np.zeros((360, 640, 3), dtype=np.uint8)
+    corners, ids = grid(args.markers, 1920, 1080)
+    small = corners * np.float32(640 / 1920)
+    
+    # the copy of the frame is measured alone and subtracted
+    base_full = timed(lambda image: image, full, args.repeat)
+    base_display = timed(lambda image: image, display, args.repeat)
+    print("legacy, full frame:       {:.3f} ms".format(
+        timed(lambda image: legacy_display(corners, ids, image), full, args.repeat) - base_full))
+    print("vectorized, full frame:   {:.3f} ms".format(
+        timed(lambda image: draw_markers(image, corners, ids), full, args.repeat) - base_full))
+    print("vectorized, display 640:  {:.3f} ms".format(
+        timed(lambda image: draw_markers(image, small, ids), display, args.repeat) - base_display))
@@ -0,0 +1,72 @@
+"""
+Per-frame time and detection rate of ArucoReader across processing widths,
+interpolation modes and colour/grayscale input. `legacy` is the former path:
+cubic upscale to 1000 px, detection, then a second resize to 640 for display.
+
+    python -m benchmarks.bench_resolution
+    python -m benchmarks.bench_resolution --video recording.mp4 --widths 1280 960 640
+"""
+import argparse
+import time
+import cv2 as cv
+import imutils
+from src.opencv_engine import *
+from benchmarks.synthetic import moving_markers
+from benchmarks.common import load_video, recall
+
+INTERPOLATIONS: dict = {
+    "nearest": cv.INTER_NEAREST,
+    "linear": cv.INTER_LINEAR,
+    "area": cv.INTER_AREA,
+    "cubic": cv.INTER_CUBIC,
+}
+
+
+def run(process, frames: list) -> tuple:
+    found = []
+    start = time.perf_counter()
+    for frame in frames:
+        found.append(set(process(frame).ids.tolist()))
+    return found, (time.perf_counter() - start) / len(frames)
+
+
+def legacy(reader: ArucoReader):
+    def process(frame: np.ndarray) -> Detections:
+        h, w = frame.shape[:2]
+        img = cv.resize(frame, (1000, int(1000*(h/w))), interpolation=cv.INTER_CUBIC)
+        detections = reader.detect(img)
+        reader.draw(img, detections)
+        imutils.resize(img, width=640)
+        return detections
+    return process
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", default=None)
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--widths", type=int, nargs="+", default=[0, 960, 640, 480, 320],
+                        help="0 means native resolution")
+    args = parser.parse_args()
+    
+    if args.video:
+        frames, truth = load_video(args.video), None
+    else:
+        frames, truth = zip(*moving_markers(args.frames, width=1280, height=720, marker_size=90))
+    
+    found, elapsed = run(legacy(ArucoReader(None)), frames)
+    truth = truth or found
+    print("{:<24} {:>9} {:>8}".format("mode", "ms/frame", "recall"))
+    print("{:<24} {:>9.2f} {:>8.3f}".format("legacy", elapsed * 1000, recall(found, truth)))
+    
+    for width in args.widths:
+        for name, interpolation in INTERPOLATIONS.items():
+            if not width and name != "area":
+                continue
+            for grayscale in (False, True):
+                reader = ArucoReader(None, processing_width=width or None,
+                                     interpolation=interpolation, grayscale=grayscale)
+                process = lambda frame: reader.process_frame(frame, 640)[1]
+                found, elapsed = run(process, frames)
+                label = "{} {}{}".format(width or "native", name if width else "", " gray" if grayscale else "")
+                print("{:<24} {:>9.2f} {:>8.3f}".format(label, elapsed * 1000, recall(found, truth)))
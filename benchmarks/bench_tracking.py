@@ -0,0 +1,71 @@
+"""
+Full-frame scan against ROI tracking mode of ArucoReader: time per frame
+and recall. With a video file the full-scan detections are the reference,
+otherwise a synthetic conveyor sequence with known ids is used.
+
+Tracking only saves the work done outside the markers (thresholding and
+contours of the background, and identifying the candidates found there).
+The bits of every marker are still read in its ROI. On the default plain
+white frames with the 1024-ID ARUCO_ORIGINAL dictionary, that
+identification is nearly the whole cost and tracking gains nothing. Use
+`--background clutter` and a larger `--width`, or `--dictionary-size`
+(as a tuned profile would), to see where it pays off.
+
+    python -m benchmarks.bench_tracking
+    python -m benchmarks.bench_tracking --background clutter --width 1280 --dictionary-size 10
+    python -m benchmarks.bench_tracking --video recording.mp4 --full-scan-interval 15
+"""
+import argparse
+import time
+from src.opencv_engine import *
+from src.aruco_profile import aruco_dictionary
+from benchmarks.synthetic import clutter, moving_markers
+from benchmarks.common import load_video, recall
+
+
+def run(reader: ArucoReader, frames: list) -> tuple:
+    prepared = [reader.prepare(frame) for frame in frames]
+    found, elapsed = [], 0.0
+    for img in prepared:
+        start = time.perf_counter()
+        detections = reader.detect(img)
+        elapsed += time.perf_counter() - start
+        found.append(set(detections.ids.tolist()))
+    return found, elapsed / len(frames)
+
+
+def reader(tracking: bool, args) -> ArucoReader:
+    aruco = ArucoReader(None, tracking=tracking, full_scan_interval=args.full_scan_interval)
+    if args.dictionary_size:
+        aruco.detector = cv.aruco.ArucoDetector(aruco_dictionary("DICT_ARUCO_ORIGINAL", args.dictionary_size),
+                                                aruco.arucoParams)
+    return aruco
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", default=None)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--full-scan-interval", type=int, default=10)
+    parser.add_argument("--width", type=int, default=640, help="synthetic frame width, 4:3")
+    parser.add_argument("--background", choices=("white", "clutter"), default="white")
+    parser.add_argument("--dictionary-size", type=int, default=None,
+                        help="first N markers of ARUCO_ORIGINAL instead of all 1024")
+    args = parser.parse_args()
+    
+    if args.video:
+        frames = load_video(args.video)
+        truth = None
+    else:
+        width, height = args.width, args.width * 3 // 4
+        background = clutter(width, height, shapes=width * height // 1000) if args.background == "clutter" else None
+        frames, truth = zip(*moving_markers(args.frames, width=width, height=height,
+                                            marker_size=60 * width // 640, background=background))
+    
+    full, full_time = run(reader(False, args), frames)
+    truth = truth or full
+    tracked, tracked_time = run(reader(True, args), frames)
+    
+    print("full scan: {:.2f} ms/frame, recall {:.3f}".format(full_time * 1000, recall(full, truth)))
+    print("tracking:  {:.2f} ms/frame, recall {:.3f}, speedup x{:.1f}".format(
+        tracked_time * 1000, recall(tracked, truth), full_time / tracked_time))
@@ -0,0 +1,81 @@
+import glob
+import os
+import resource
+import sys
+import time
+import cv2 as cv
+import numpy as np
+
+"""
+Helpers shared by the benchmark scripts: frame loading, recall and latency
+statistics.
+"""
+
+IMAGE_EXTENSIONS: tuple = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def video_fps(path: str) -> float:
+    capture = cv.VideoCapture(path)
+    fps = capture.get(cv.CAP_PROP_FPS)
+    capture.release()
+    return fps if fps > 0 else 30.0
+
+
+def load_video(path: str, limit: int | None = None) -> list:
+    capture = cv.VideoCapture(path)
+    frames = []
+    while limit is None or len(frames) < limit:
+        ret, frame = capture.read()
+        if not ret: break
+        frames.append(frame)
+    capture.release()
+    return frames
+
+
+def load_images(folder: str) -> list:
+    paths = sorted(path for path in glob.glob(os.path.join(folder, "*"))
+                   if path.lower().endswith(IMAGE_EXTENSIONS))
+    return [image for image in (cv.imread(path) for path in paths) if image is not None]
+
+
+def recall(found: list, truth: list) -> float:
+    expected = sum(len(ids) for ids in truth)
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / expected if expected else 1.0
+
+
+class StageTimer:
+    def __init__(self) -> None:
+        self.samples: dict = {}
+        
+    def measure(self, stage: str, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        self.samples.setdefault(stage, []).append(time.perf_counter() - start)
+        return result
+    
+    def summary(self, stage: str) -> dict:
+        ms = np.array(self.samples.get(stage, [0.0])) * 1000
+        total = ms.sum() / 1000
+        return {
+            "frames": len(ms),
+            "fps": round(len(ms) / total, 2) if total else None,
+            "mean_ms": round(float(ms.mean()), 3),
+            "p50_ms": round(float(np.percentile(ms, 50)), 3),
+            "p95_ms": round(float(np.percentile(ms, 95)), 3),
+            "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        }
+
+
+def memory_usage() -> dict:
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    usage = {"peak_rss_mb": round(peak_mb, 1)}
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+        usage["rss_mb"] = round(pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+    except (OSError, ValueError):
+        pass
+    return usage
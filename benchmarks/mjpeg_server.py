@@ -0,0 +1,121 @@
+"""
+Local MJPEG camera stand-in, to exercise the network capture offline. Serves
+a video file (looped) or synthetic conveyor frames as multipart/x-mixed-replace
+on http://127.0.0.1:<port>/video.mjpg and can simulate stalls and dropped
+connections.
+
+    python -m benchmarks.mjpeg_server --port 8081
+    python -m benchmarks.mjpeg_server --video recording.mp4 --stall-every 10 --stall-for 5
+    python -m benchmarks.mjpeg_server --drop-every 15
+    python -m benchmarks.mjpeg_server --width 1920 --height 1080 --fps 60
+"""
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import cv2 as cv
+from benchmarks.common import load_video
+from benchmarks.synthetic import moving_markers
+
+BOUNDARY: str = "frame"
+
+
+def encode_frames(frames: list, quality: int = 80) -> list:
+    return [cv.imencode(".jpg", frame, [cv.IMWRITE_JPEG_QUALITY, quality])[1].tobytes() for frame in frames]
+
+
+class MjpegTestServer:
+    def __init__(self, frames: list, port: int = 8081, fps: float = 30.0, host: str = "127.0.0.1",
+                 stall_every: float | None = None, stall_for: float = 5.0,
+                 drop_every: float | None = None) -> None:
+        self.jpegs = encode_frames(frames)
+        self.fps = fps
+        # faults, in seconds since each client connected
+        self.stall_every = stall_every
+        self.stall_for = stall_for
+        self.drop_every = drop_every
+        self.connections: int = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if not self.path.startswith("/video.mjpg"):
+                    self.send_error(404)
+                    return
+                server.connections += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=" + BOUNDARY)
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                try:
+                    server.stream(self.wfile)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.url = "http://{}:{}/video.mjpg".format(host, self.httpd.server_address[1])
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def stream(self, output) -> None:
+        start = time.monotonic()
+        next_frame = start
+        index = 0
+        while True:
+            elapsed = time.monotonic() - start
+            if self.drop_every and elapsed >= self.drop_every:
+                return
+            if self.stall_every and elapsed % (self.stall_every + self.stall_for) >= self.stall_every:
+                time.sleep(0.05)
+                next_frame = time.monotonic()
+                continue
+
+            jpeg = self.jpegs[index % len(self.jpegs)]
+            output.write("--{}\r\nContent-Type: image/jpeg\r\nContent-Length: {}\r\n\r\n".format(
+                BOUNDARY, len(jpeg)).encode())
+            output.write(jpeg)
+            output.write(b"\r\n")
+            output.flush()
+            index += 1
+
+            next_frame += 1.0 / self.fps
+            delay = next_frame - time.monotonic()
+            if delay > 0: time.sleep(delay)
+
+    def start(self) -> "MjpegTestServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", default=None)
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--stall-every", type=float, default=None, help="seconds of stream between stalls")
+    parser.add_argument("--stall-for", type=float, default=5.0)
+    parser.add_argument("--drop-every", type=float, default=None, help="close each connection after N seconds")
+    parser.add_argument("--width", type=int, default=640, help="size of the synthetic frames")
+    parser.add_argument("--height", type=int, default=480)
+    args = parser.parse_args()
+
+    if args.video:
+        frames = load_video(args.video, 600)
+    else:
+        frames = [frame for frame, _ in moving_markers(300, width=args.width, height=args.height,
+                                                        marker_size=args.height // 8)]
+    server = MjpegTestServer(frames, args.port, args.fps, stall_every=args.stall_every,
+                             stall_for=args.stall_for, drop_every=args.drop_every).start()
+    print("[INFO] Serving {}".format(server.url))
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        server.stop()
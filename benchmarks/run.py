@@ -0,0 +1,145 @@
+"""
+Benchmark harness for the detection engine. Runs every stage over a corpus
+of frames and writes FPS, p50/p95/p99 latency, recall and memory use as JSON,
+so results can be compared across versions. Runs headless, no camera needed.
+
+    python -m benchmarks.run --synthetic 200 --output results.json
+    python -m benchmarks.run --save-corpus corpus/ --synthetic 500
+    python -m benchmarks.run --corpus corpus/ --compare results.json
+    python -m benchmarks.run --video recording.mp4 --stages aruco two_stage
+
+Synthetic and saved corpora carry ground truth; recorded videos only report
+the number of detections per frame.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import time
+import cv2 as cv
+import numpy as np
+from src.opencv_engine import *
+from benchmarks.common import StageTimer, load_video, memory_usage, recall
+from benchmarks.synthetic import corpus, load_corpus, save_corpus
+
+
+def aruco_stage(frame: np.ndarray, truth: dict | None, reader: ArucoReader) -> tuple:
+    found = reader.detect_frame(frame).ids.tolist()
+    return found, truth and truth["ids"]
+
+
+def localizer_stage(frame: np.ndarray, truth: dict | None, localizer: BarcodeLocalizer) -> tuple:
+    # a hit is a located box containing the barcode center
+    box = localizer.box(frame)
+    if truth is None:
+        return ([] if box is None else [0]), None
+    centers = truth["barcode_centers"]
+    found = [i for i, center in enumerate(centers)
+             if box is not None and cv.pointPolygonTest(box.astype(np.float32), tuple(center), False) >= 0]
+    return found, list(range(len(centers)))
+
+
+def barcode_stage(frame: np.ndarray, truth: dict | None, reader) -> tuple:
+    found = [data for (data, _, _) in reader.detect(frame).barcodes]
+    return found, truth and truth["barcodes"]
+
+
+STAGES: dict = {
+    "aruco": lambda: (aruco_stage, ArucoReader(None)),
+    "aruco_tracking": lambda: (aruco_stage, ArucoReader(None, tracking=True)),
+    "barcode_localizer": lambda: (localizer_stage, BarcodeLocalizer()),
+    "pyzbar": lambda: (barcode_stage, BarcodeReaderPyZbar(None)),
+    "two_stage": lambda: (barcode_stage, BarcodeReaderTwoStage(None)),
+}
+
+
+def git_version() -> str | None:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(frames: list, truths: list | None, stages: list) -> dict:
+    timer = StageTimer()
+    results = {}
+    
+    for name in stages:
+        stage, state = STAGES[name]()
+        found, expected = [], []
+        for index, frame in enumerate(frames):
+            truth = truths[index] if truths else None
+            f, e = timer.measure(name, stage, frame, truth, state)
+            found.append(f)
+            expected.append(e or [])
+        
+        results[name] = timer.summary(name)
+        results[name]["recall"] = round(recall(found, expected), 4) if truths else None
+        results[name]["detections_per_frame"] = round(sum(len(f) for f in found) / len(frames), 3)
+    
+    return results
+
+
+def compare(current: dict, baseline: dict) -> None:
+    for name, stats in current["stages"].items():
+        previous = baseline.get("stages", {}).get(name)
+        if previous is None:
+            continue
+        deltas = []
+        for key in ("p50_ms", "p95_ms", "recall"):
+            if stats.get(key) is not None and previous.get(key):
+                deltas.append("{} {:+.1%}".format(key, stats[key] / previous[key] - 1))
+        print("{:<18} {}".format(name, ", ".join(deltas)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, default=100, help="number of synthetic frames")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--corpus", default=None, help="replay a corpus saved with --save-corpus")
+    parser.add_argument("--video", default=None, help="replay a recorded video")
+    parser.add_argument("--limit", type=int, default=None, help="maximum frames read from the video")
+    parser.add_argument("--save-corpus", default=None, help="write the synthetic corpus and exit")
+    # tracking only makes sense on sequences, enable it explicitly for videos
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES),
+                        default=[name for name in STAGES if name != "aruco_tracking"])
+    parser.add_argument("--output", default=None, help="JSON file for the results")
+    parser.add_argument("--compare", default=None, help="JSON results of a previous run")
+    args = parser.parse_args()
+    
+    scenes = corpus(args.synthetic, args.seed, width=args.width, height=args.height)
+    if args.save_corpus:
+        print("saved {} frames to {}".format(save_corpus(args.save_corpus, scenes), args.save_corpus))
+        raise SystemExit(0)
+    
+    if args.video:
+        frames, truths, source = load_video(args.video, args.limit), None, args.video
+    else:
+        if args.corpus:
+            scenes, source = load_corpus(args.corpus), args.corpus
+        else:
+            source = "synthetic:{}:{}".format(args.synthetic, args.seed)
+        frames, truths = map(list, zip(*scenes))
+    
+    started = time.time()
+    report = {
+        "version": git_version(),
+        "timestamp": started,
+        "host": {"machine": platform.machine(), "python": platform.python_version(),
+                 "opencv": cv.__version__},
+        "source": source,
+        "frames": len(frames),
+        "stages": run(frames, truths, args.stages),
+        "memory": memory_usage(),
+    }
+    
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline:
+            compare(report, json.load(baseline))
@@ -0,0 +1,221 @@
+import json
+import os
+import cv2 as cv
+import numpy as np
+from src.opencv_engine import ARUCO_TYPE
+
+"""
+Synthetic frames with known content, so the engine can be measured without
+a camera. Every generator yields (frame, ground_truth) pairs.
+"""
+
+
+def marker_image(marker_id: int, size: int, dictionary: int = ARUCO_TYPE) -> np.ndarray:
+    aruco_dict = cv.aruco.getPredefinedDictionary(dictionary)
+    return cv.aruco.generateImageMarker(aruco_dict, marker_id, size)
+
+
+def clutter(width: int, height: int, shapes: int = 300, seed: int = 0) -> np.ndarray:
+    # textured factory-like background: boxes, labels and cables, many of them marker candidates
+    rng = np.random.default_rng(seed)
+    background = np.full((height, width), 200, dtype=np.uint8)
+    for _ in range(shapes):
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        w, h = (int(v) for v in rng.integers(8, 80, 2))
+        shade = int(rng.integers(0, 256))
+        kind = rng.integers(0, 3)
+        if kind == 0:
+            cv.rectangle(background, (x, y), (x + w, y + h), shade, -1)
+        elif kind == 1:
+            cv.rectangle(background, (x, y), (x + w, y + h), shade, int(rng.integers(1, 6)))
+        else:
+            cv.line(background, (x, y), (x + w, y + h), shade, int(rng.integers(1, 4)))
+    return cv.cvtColor(background, cv.COLOR_GRAY2BGR)
+
+
+def moving_markers(frames: int = 300, ids: tuple = (1, 2, 3, 4), width: int = 640,
+                   height: int = 480, marker_size: int | tuple = 60, speed: float = 3.0, seed: int = 0,
+                   background: np.ndarray | None = None):
+    # one conveyor lane per marker, so markers never occlude each other
+    rng = np.random.default_rng(seed)
+    lane = height // len(ids)
+    sizes = np.broadcast_to(np.asarray(marker_size), (len(ids),))
+    markers = [marker_image(marker_id, int(size)) for marker_id, size in zip(ids, sizes)]
+    if background is not None:
+        # white quiet zone, so the texture does not touch the marker border
+        markers = [np.pad(marker_image(marker_id, int(size) - 12), 6, constant_values=255)
+                   for marker_id, size in zip(ids, sizes)]
+    low = np.array([[0, i * lane] for i in range(len(ids))], dtype=np.float32)
+    high = low + np.stack([width - sizes, np.maximum(0, lane - sizes - 10)], axis=1).astype(np.float32)
+    positions = low + rng.uniform(0, 1, (len(ids), 2)).astype(np.float32) * (high - low)
+    velocities = rng.uniform(-speed, speed, (len(ids), 2)).astype(np.float32)
+    
+    for _ in range(frames):
+        frame = np.full((height, width, 3), 255, dtype=np.uint8) if background is None else background.copy()
+        for marker, (x, y) in zip(markers, positions.astype(int)):
+            frame[y:y + len(marker), x:x + len(marker)] = marker[..., None]
+        yield frame, set(ids)
+        
+        positions += velocities
+        bounce = (positions < low) | (positions > high)
+        velocities[bounce] *= -1
+        positions = np.clip(positions, low, high)
+
+
+def mostly_static(frames: int = 600, still: int = 60, moving: int = 15, noise: float = 2.0,
+                  seed: int = 0, **options):
+    # conveyor that stops for `still` frames (only sensor noise) between
+    # bursts of `moving` frames; every third stop the belt is empty
+    rng = np.random.default_rng(seed)
+    conveyor = moving_markers(frames, seed=seed, **options)
+    produced = 0
+    while produced < frames:
+        for frame, ids in conveyor:
+            produced += 1
+            yield frame, ids
+            if produced % moving == 0:
+                break
+        else:
+            return
+        empty = (produced // moving) % 3 == 0
+        scene, ids = (np.full_like(frame, 255), set()) if empty else (frame, ids)
+        for _ in range(min(still, frames - produced)):
+            produced += 1
+            yield degrade(scene, noise=noise, rng=rng), ids
+
+
+class SyntheticSource:
+    # VideoCapture-like source usable with FrameGrabber
+    def __init__(self, frames: list, loop: bool = False) -> None:
+        self.frames = frames
+        self.loop = loop
+        self.index: int = 0
+        
+    def read(self) -> tuple:
+        if self.index >= len(self.frames):
+            if not self.loop or not self.frames:
+                return False, None
+            self.index = 0
+        frame = self.frames[self.index]
+        self.index += 1
+        return True, frame
+    
+    def release(self) -> None:
+        pass
+
+
+EAN_L: list = ["0001101", "0011001", "0010011", "0111101", "0100011",
+               "0110001", "0101111", "0111011", "0110111", "0001011"]
+EAN_G: list = ["0100111", "0110011", "0011011", "0100001", "0011101",
+               "0111001", "0000101", "0010001", "0001001", "0010111"]
+EAN_PARITY: list = ["LLLLLL", "LLGLGG", "LLGGLG", "LLGGGL", "LGLLGG",
+                    "LGGLLG", "LGGGLL", "LGLGLG", "LGLGGL", "LGGLGL"]
+
+
+def ean13(code: str) -> str:
+    # 12 digits in, 13 digits out (check digit appended)
+    digits = [int(c) for c in code[:12]]
+    total = sum(d * (3 if i % 2 else 1) for i, d in enumerate(digits))
+    return code[:12] + str((10 - total % 10) % 10)
+
+
+def ean13_modules(code: str) -> str:
+    digits = [int(c) for c in ean13(code)]
+    parity = EAN_PARITY[digits[0]]
+    left = "".join(EAN_L[d] if p == "L" else EAN_G[d] for d, p in zip(digits[1:7], parity))
+    # right-hand codes are the complement of the L codes
+    right = "".join(EAN_L[d].translate(str.maketrans("01", "10")) for d in digits[7:])
+    return "101" + left + "01010" + right + "101"
+
+
+def barcode_image(code: str, module: int = 3, height: int = 120, quiet: int = 10) -> np.ndarray:
+    bars = np.array([c == "1" for c in ean13_modules(code)])
+    row = np.where(np.repeat(bars, module), 0, 255).astype(np.uint8)
+    row = np.pad(row, quiet * module, constant_values=255)
+    return np.repeat(row[None, :], height, axis=0)
+
+
+def paste(frame: np.ndarray, patch: np.ndarray, center: tuple, angle: float = 0.0) -> None:
+    # draws a grayscale patch rotated by `angle` degrees around `center`
+    ph, pw = patch.shape
+    matrix = cv.getRotationMatrix2D((pw / 2, ph / 2), angle, 1.0)
+    matrix[:, 2] += (center[0] - pw / 2, center[1] - ph / 2)
+    cv.warpAffine(patch, matrix, (frame.shape[1], frame.shape[0]), dst=frame,
+                  borderMode=cv.BORDER_TRANSPARENT, flags=cv.INTER_LINEAR)
+
+
+def barcode_scene(code: str, width: int = 1280, height: int = 720, module: int = 3,
+                  angle: float = 0.0, center: tuple | None = None) -> np.ndarray:
+    # white frame with one EAN-13 pasted at `center`, rotated by `angle` degrees
+    frame = np.full((height, width), 255, dtype=np.uint8)
+    paste(frame, barcode_image(code, module), center or (width // 2, height // 2), angle)
+    return cv.cvtColor(frame, cv.COLOR_GRAY2BGR)
+
+
+def degrade(frame: np.ndarray, blur: float = 0.0, noise: float = 0.0, rng=None) -> np.ndarray:
+    if blur:
+        frame = cv.GaussianBlur(frame, (0, 0), blur)
+    if noise:
+        rng = rng or np.random.default_rng()
+        frame = np.clip(frame + rng.normal(0, noise, frame.shape), 0, 255).astype(np.uint8)
+    return frame
+
+
+def random_scene(rng, width: int = 1280, height: int = 720, markers: int = 3,
+                 marker_sizes: tuple = (40, 80, 160), angles: tuple = (0, 15, 30, 45),
+                 barcode: bool = True, modules: tuple = (2, 3), blurs: tuple = (0, 1.0, 2.0),
+                 noises: tuple = (0, 6, 12), max_id: int = 1024) -> tuple:
+    # markers on the left two thirds of the frame (one per cell), an EAN-13
+    # on the right third, then optional blur and noise
+    frame = np.full((height, width), 255, dtype=np.uint8)
+    truth = {"ids": [], "barcodes": [], "barcode_centers": []}
+    
+    cells = [(col, row) for col in range(markers) for row in range(2)]
+    cell_w, cell_h = (width * 2 // 3) // markers, height // 2
+    for index in rng.choice(len(cells), markers, replace=False):
+        col, row = cells[index]
+        size = int(min(rng.choice(marker_sizes), cell_w * 0.6, cell_h * 0.6))
+        marker_id = int(rng.integers(0, max_id))
+        # white quiet zone so the rotated marker keeps its border
+        patch = np.pad(marker_image(marker_id, size), size // 4, constant_values=255)
+        center = (int((col + 0.5) * cell_w), int((row + 0.5) * cell_h))
+        paste(frame, patch, center, float(rng.choice(angles)))
+        if marker_id not in truth["ids"]:
+            truth["ids"].append(marker_id)
+    
+    if barcode:
+        code = ean13("".join(str(d) for d in rng.integers(0, 10, 12)))
+        center = (width * 5 // 6, height // 2)
+        paste(frame, barcode_image(code, int(rng.choice(modules))), center, float(rng.choice(angles)))
+        truth["barcodes"].append(code)
+        truth["barcode_centers"].append(center)
+    
+    blur, noise = float(rng.choice(blurs)), float(rng.choice(noises))
+    truth.update(blur=blur, noise=noise)
+    frame = degrade(cv.cvtColor(frame, cv.COLOR_GRAY2BGR), blur, noise, rng)
+    return frame, truth
+
+
+def corpus(count: int = 100, seed: int = 0, **options):
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        yield random_scene(rng, **options)
+
+
+def save_corpus(folder: str, scenes) -> int:
+    # frames as PNG plus a manifest with the ground truth, replayable with load_corpus
+    os.makedirs(folder, exist_ok=True)
+    manifest = []
+    for index, (frame, truth) in enumerate(scenes):
+        name = "frame_{:05d}.png".format(index)
+        cv.imwrite(os.path.join(folder, name), frame)
+        manifest.append(dict(truth, file=name))
+    with open(os.path.join(folder, "manifest.json"), "w") as output:
+        json.dump(manifest, output, indent=1)
+    return len(manifest)
+
+
+def load_corpus(folder: str):
+    with open(os.path.join(folder, "manifest.json")) as manifest:
+        for truth in json.load(manifest):
+            yield cv.imread(os.path.join(folder, truth["file"])), truth
@@ -0,0 +1,140 @@
+"""
+DetectorParameters auto-tuner. Replays a corpus through cv.aruco.ArucoDetector
+for sampled points of a parameter search space (adaptive threshold window
+sweep, polygonal approximation, perimeter limits, corner refinement, ArUco3
+detection) and dictionaries narrowed to the IDs in use, measuring detection
+time and recall. The Pareto-optimal sets (no other set is both faster and
+more accurate) are written as a profile ArucoReader(profile=...) loads.
+
+    python -m benchmarks.tune_aruco --synthetic 40 --output aruco_profile.json
+    python -m benchmarks.tune_aruco --corpus corpus/ --max-id 50 --target-recall 0.98
+    python -m benchmarks.tune_aruco --video recording.mp4 --processing-width 640 --exhaustive
+
+Recorded videos carry no ground truth: the detections of the default
+parameters on the native frames are used as reference instead.
+"""
+import argparse
+import itertools
+import time
+import numpy as np
+from src.opencv_engine import *
+from src.aruco_profile import aruco_dictionary, detector_parameters, save_profiles
+from benchmarks.common import load_video, recall
+from benchmarks.synthetic import corpus, load_corpus
+
+# (adaptiveThreshWinSizeMin, Max, Step): windows min, min + step, ... <= max
+WINDOW_SWEEPS: list = [(3, 23, 10), (3, 13, 10), (5, 25, 20), (7, 7, 1), (11, 11, 1), (5, 35, 15)]
+SEARCH_SPACE: dict = {
+    "window": WINDOW_SWEEPS,
+    "polygonalApproxAccuracyRate": [0.03, 0.05, 0.08],
+    "minMarkerPerimeterRate": [0.03, 0.06],
+    "cornerRefinementMethod": [cv.aruco.CORNER_REFINE_NONE, cv.aruco.CORNER_REFINE_SUBPIX],
+    "useAruco3Detection": [False, True],
+}
+
+
+def candidates(trials: int | None, seed: int = 0) -> list:
+    # every combination, or `trials` of them sampled; the defaults always come first
+    names = list(SEARCH_SPACE)
+    grid = [dict(zip(names, values)) for values in itertools.product(*SEARCH_SPACE.values())]
+    if trials is not None and trials < len(grid):
+        rng = np.random.default_rng(seed)
+        grid = [grid[index] for index in rng.choice(len(grid), trials, replace=False)]
+
+    parameters = []
+    for point in [{}] + grid:
+        point = dict(point)
+        if "window" in point:
+            low, high, step = point.pop("window")
+            point.update(adaptiveThreshWinSizeMin=low, adaptiveThreshWinSizeMax=high,
+                         adaptiveThreshWinSizeStep=step)
+        if point.get("cornerRefinementMethod") is not None:
+            point["cornerRefinementMethod"] = int(point["cornerRefinementMethod"])
+        parameters.append(point)
+    return parameters
+
+
+def evaluate(detector, images: list, truth: list) -> dict:
+    found = []
+    detector.detectMarkers(images[0])
+    start = time.process_time()
+    for image in images:
+        _, ids, _ = detector.detectMarkers(image)
+        found.append(set() if ids is None else set(ids.flatten().tolist()))
+    elapsed = time.process_time() - start
+
+    reported = sum(len(ids) for ids in found)
+    correct = sum(len(ids & set(expected)) for ids, expected in zip(found, truth))
+    return {"time_ms": round(elapsed / len(images) * 1000, 3),
+            "recall": round(recall(found, truth), 4),
+            "precision": round(correct / reported, 4) if reported else 1.0}
+
+
+def pareto(results: list) -> list:
+    # keeps the sets no other set beats on both time and recall
+    front = []
+    for result in sorted(results, key=lambda result: (result["time_ms"], -result["recall"])):
+        if not front or result["recall"] > front[-1]["recall"]:
+            front.append(result)
+    return front
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, default=40, help="number of synthetic frames")
+    parser.add_argument("--corpus", default=None, help="folder saved by benchmarks.run --save-corpus")
+    parser.add_argument("--video", default=None)
+    parser.add_argument("--dictionary", default="DICT_ARUCO_ORIGINAL")
+    parser.add_argument("--max-id", type=int, default=None,
+                        help="IDs in use are below this, also tries a dictionary narrowed to them")
+    parser.add_argument("--processing-width", type=int, default=None)
+    parser.add_argument("--trials", type=int, default=48, help="sampled parameter sets")
+    parser.add_argument("--exhaustive", action="store_true", help="try the whole search space")
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--min-precision", type=float, default=0.99)
+    parser.add_argument("--output", default="aruco_profile.json")
+    args = parser.parse_args()
+
+    if args.video:
+        frames = load_video(args.video)
+        reference = cv.aruco.ArucoDetector(aruco_dictionary(args.dictionary), cv.aruco.DetectorParameters())
+        truth = []
+        for frame in frames:
+            _, ids, _ = reference.detectMarkers(frame)
+            truth.append([] if ids is None else ids.flatten().tolist())
+    else:
+        if args.corpus:
+            scenes = list(load_corpus(args.corpus))
+        else:
+            scenes = list(corpus(args.synthetic, max_id=args.max_id or 1024))
+        frames = [frame for frame, _ in scenes]
+        truth = [scene["ids"] for _, scene in scenes]
+
+    # the frames ArucoReader hands to detectMarkers
+    images = [FrameContext(frame).view(args.processing_width, gray=True) for frame in frames]
+    sizes = [None]
+    if args.max_id:
+        sizes.append(args.max_id)
+
+    points = candidates(None if args.exhaustive else args.trials)
+    results = []
+    for size, parameters in itertools.product(sizes, points):
+        detector = cv.aruco.ArucoDetector(aruco_dictionary(args.dictionary, size),
+                                          detector_parameters(parameters))
+        result = evaluate(detector, images, truth)
+        result.update(dictionary=args.dictionary, dictionary_size=size, parameters=parameters)
+        results.append(result)
+        print("{:8.2f} ms recall {:.3f} precision {:.3f} {} {}".format(
+            result["time_ms"], result["recall"], result["precision"], size or "full", parameters or "defaults"))
+
+    accepted = [result for result in results if result["precision"] >= args.min_precision]
+    front = pareto(accepted)
+    save_profiles(args.output, front, args.target_recall, frames=len(images),
+                  processing_width=args.processing_width)
+
+    default = results[0]
+    print("[INFO] Defaults: {:.2f} ms, recall {:.3f}".format(default["time_ms"], default["recall"]))
+    for result in front:
+        print("[INFO] Pareto: {:.2f} ms, recall {:.3f}, {} {}".format(
+            result["time_ms"], result["recall"], result["dictionary_size"] or "full", result["parameters"]))
+    print("[INFO] {} profiles written to {}".format(len(front), args.output))
@@ -0,0 +1,76 @@
+"""
+Camera calibration with a ChArUco board, for the marker pose stage
+(src/pose.py). Print the board, film it from a few dozen angles and
+distances covering the whole field of view, then calibrate:
+
+    python calibrate.py --print-board board.png
+    python calibrate.py views/ --output calibration.json
+    python calibrate.py 0 --output calibration.json --every 15 --views 40
+    python calibrate.py recording.mp4 --squares 7 10 --square-length 0.025 --marker-length 0.018
+
+A camera port or a video is sampled every `--every` frames. The board
+options must match the printed board; lengths are in meters, and poses
+come out in the same unit as the marker_length given to PoseReader.
+"""
+import argparse
+import glob
+import os
+from src.opencv_engine import *
+from src.pose import calibrate_charuco, charuco_board
+
+IMAGE_EXTENSIONS: tuple = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+
+
+def sample_frames(source: str, every: int, views: int):
+    if os.path.isdir(source):
+        for path in sorted(glob.glob(os.path.join(source, "*"))):
+            if path.lower().endswith(IMAGE_EXTENSIONS):
+                yield cv.imread(path)
+        return
+    capture = cv.VideoCapture(int(source) if source.isdigit() else source)
+    index, taken = 0, 0
+    while taken < views:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        if index % every == 0:
+            taken += 1
+            yield frame
+        index += 1
+    capture.release()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", nargs="?", help="image folder, video file or camera port")
+    parser.add_argument("--output", default="calibration.json")
+    parser.add_argument("--squares", type=int, nargs=2, default=[5, 7], metavar=("X", "Y"))
+    parser.add_argument("--square-length", type=float, default=0.04)
+    parser.add_argument("--marker-length", type=float, default=0.03)
+    parser.add_argument("--dictionary", default="DICT_5X5_100")
+    parser.add_argument("--every", type=int, default=10, help="frame step of videos and cameras")
+    parser.add_argument("--views", type=int, default=40, help="frames taken from videos and cameras")
+    parser.add_argument("--print-board", default=None, help="write the board image to print and exit")
+    args = parser.parse_args()
+
+    board = charuco_board(tuple(args.squares), args.square_length, args.marker_length,
+                          getattr(cv.aruco, args.dictionary))
+    if args.print_board:
+        # 100 pixels per square, with a white margin
+        size = (args.squares[0] * 100 + 100, args.squares[1] * 100 + 100)
+        cv.imwrite(args.print_board, board.generateImage(size, marginSize=50))
+        print("[INFO] Board written to {}".format(args.print_board))
+        raise SystemExit
+    if args.source is None:
+        parser.error("a source is needed to calibrate")
+
+    frames = [frame for frame in sample_frames(args.source, args.every, args.views) if frame is not None]
+    try:
+        calibration, used = calibrate_charuco(frames, board)
+    except ValueError as error:
+        print("[ERROR] {}".format(error))
+        raise SystemExit(1)
+    calibration.save(args.output)
+    print("[INFO] Calibrated {}x{} from {} of {} views, RMS reprojection error {:.3f} px".format(
+        calibration.size[0], calibration.size[1], used, len(frames), calibration.rms))
+    print("[INFO] Calibration written to {}".format(args.output))
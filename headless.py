@@ -0,0 +1,185 @@
+"""
+Headless service mode: runs the camera/detector pipelines without Qt, skips
+every overlay and display conversion and publishes the detections as
+newline-delimited JSON.
+
+    python headless.py --source 0 --source http://cam/video.mjpg
+    python headless.py --source 0 --detector two_stage --output tcp:127.0.0.1:5555
+    python headless.py --source recording.mp4 --output unix:/tmp/vision.sock --empty
+    python headless.py --source 0 --events
+    python headless.py --config cameras.json
+    python headless.py --source 0 --preview-port 8080
+
+Each line holds camera, seq, timestamp, ids, corners and barcodes. With
+--events only the debounced appear/disappear transitions are published.
+With --config the cameras come from a JSON file (see src/camera_config.py)
+that is reloaded when it changes.
+"""
+import argparse
+import signal
+import sys
+import threading
+from dataclasses import asdict
+from src.opencv_engine import *
+from src.metrics import METRICS, MetricsReporter, serve_metrics
+from src.publishers import detection_record, open_publisher
+from src.preview import PreviewChannel, PreviewServer
+from src.id_tracker import IdStateTracker
+from src.camera_config import (DETECTORS, CameraSpec, ConfigWatcher, detector_factory, load_config,
+                               open_recorder, open_source)
+
+
+def parse_source(source: str) -> int | str:
+    return int(source) if source.isdigit() else source
+
+
+def specs_from_args(args) -> list:
+    specs = []
+    for index, source in enumerate(args.source or ["0"]):
+        source = parse_source(source)
+        kind = "LOCAL_CAMERA_PORT" if isinstance(source, int) else \
+               "WLAN_CAMERA_IP" if "://" in source else "LOCAL_VIDEO"
+        specs.append(CameraSpec("camera_{}".format(index), kind, source, [args.detector],
+                                processing_width=args.processing_width, target_fps=args.fps,
+                                aruco={"tracking": args.tracking}, cache=args.cache))
+    return specs
+
+
+def run_camera(index: int, spec: CameraSpec, publisher, stop: threading.Event, cancel: threading.Event,
+               empty: bool, tracker: IdStateTracker | None = None,
+               preview: PreviewChannel | None = None) -> None:
+    try:
+        pipeline = CameraPipeline(open_source(spec), detector_factory(spec)(None), spec.target_fps,
+                                  camera=index, draw=False, recorder=open_recorder(spec))
+    except ValueError as error:
+        print("[ERROR] Camera {}: {}".format(spec.name, error))
+        return
+    try:
+        while not (stop.is_set() or cancel.is_set()):
+            result = pipeline.step()
+            if result is None:
+                if pipeline.grabber.finished: break
+                continue
+            frame, _, detections = result
+            if preview is not None and preview.watched:
+                # overlays are only drawn while someone watches the preview
+                image = pipeline.detector.display_image(frame.image, spec.display_width)
+                preview.publish(pipeline.detector.draw(image, detections.scaled(image.shape[1], image.shape[0])))
+            if tracker is not None:
+                tracker.update(index, detections, frame.timestamp)
+            elif empty or len(detections.ids) or detections.barcodes:
+                publisher.publish(detection_record(index, frame.seq, detections))
+    except BrokenPipeError:
+        # the reader of stdout went away
+        stop.set()
+    finally:
+        pipeline.release()
+
+
+class Supervisor:
+    # one thread per camera; on a config change only the changed cameras restart
+    def __init__(self, publisher, stop: threading.Event, empty: bool,
+                 tracker: IdStateTracker | None, preview: PreviewServer | None = None) -> None:
+        self.publisher = publisher
+        self.stop = stop
+        self.empty = empty
+        self.tracker = tracker
+        self.preview = preview
+        self.specs: list = []
+        self.running: dict = {}
+        self._lock = threading.Lock()
+
+    def apply(self, specs: list) -> None:
+        with self._lock:
+            for index in range(max(len(specs), len(self.specs))):
+                old = self.specs[index] if index < len(self.specs) else None
+                new = specs[index] if index < len(specs) else None
+                if old == new:
+                    continue
+                if index in self.running:
+                    thread, cancel = self.running.pop(index)
+                    cancel.set()
+                    thread.join(2.0)
+                    if self.tracker is not None:
+                        self.tracker.reset(index)
+                if new is not None:
+                    cancel = threading.Event()
+                    thread = threading.Thread(target=run_camera, daemon=True,
+                                              args=(index, new, self.publisher, self.stop, cancel,
+                                                    self.empty, self.tracker,
+                                                    self.preview.channel(index) if self.preview else None))
+                    thread.start()
+                    self.running[index] = (thread, cancel)
+            self.specs = list(specs)
+
+    def alive(self) -> bool:
+        with self._lock:
+            return any(thread.is_alive() for thread, _ in self.running.values())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the detectors without GUI and stream the results")
+    parser.add_argument("--config", default=None, help="JSON camera config, reloaded on change")
+    parser.add_argument("--source", action="append", default=None,
+                        help="camera port, URL or video file (repeatable, default 0)")
+    parser.add_argument("--detector", choices=sorted(DETECTORS), default="aruco")
+    parser.add_argument("--output", default="stdout", help="stdout, tcp:HOST:PORT or unix:PATH")
+    parser.add_argument("--fps", type=float, default=None, help="target FPS per camera")
+    parser.add_argument("--processing-width", type=int, default=None)
+    parser.add_argument("--tracking", action="store_true")
+    parser.add_argument("--cache", action="store_true", help="reuse the detections while the scene is static")
+    parser.add_argument("--empty", action="store_true", help="also publish frames without detections")
+    parser.add_argument("--events", action="store_true", help="publish only ID appear/disappear events")
+    parser.add_argument("--hits", type=int, default=3, help="frames an ID must be seen in to appear")
+    parser.add_argument("--window", type=int, default=5, help="frames of the hit window and misses to disappear")
+    parser.add_argument("--metrics-interval", type=float, default=None,
+                        help="log the pipeline metrics every N seconds")
+    parser.add_argument("--metrics-port", type=int, default=None)
+    parser.add_argument("--preview-port", type=int, default=None,
+                        help="serve an MJPEG preview of the cameras on this port")
+    parser.add_argument("--preview-host", default="0.0.0.0")
+    args = parser.parse_args()
+
+    specs = load_config(args.config) if args.config else specs_from_args(args)
+
+    if args.metrics_interval or args.metrics_port:
+        METRICS.enabled = True
+    if args.metrics_interval:
+        MetricsReporter(args.metrics_interval).start()
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+
+    publisher = open_publisher(args.output)
+    # the [INFO] logs of the engine must not interleave with the NDJSON stream
+    sys.stdout = sys.stderr
+    tracker = None
+    if args.events:
+        tracker = IdStateTracker(args.hits, args.window)
+        tracker.subscribe(lambda event: publisher.publish(asdict(event)))
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    preview = PreviewServer(args.preview_port, args.preview_host).start() if args.preview_port else None
+    supervisor = Supervisor(publisher, stop, args.empty, tracker, preview)
+    supervisor.apply(specs)
+    watcher = None
+    if args.config:
+        watcher = ConfigWatcher(args.config, supervisor.apply)
+        watcher.start()
+
+    try:
+        # with a config file the service keeps waiting for new cameras
+        while not stop.wait(0.5):
+            if watcher is None and not supervisor.alive():
+                break
+    except KeyboardInterrupt:
+        pass
+    stop.set()
+    supervisor.apply([])
+    publisher.close()
+    if preview is not None:
+        preview.stop()
+
+
+if __name__ == "__main__":
+    main()
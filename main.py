@@ -1,8 +1,15 @@
 from PyQt5.QtWidgets import QApplication, QMainWindow
-from PyQt5.QtGui import QImage, QPixmap
-from PyQt5.QtCore import QThread, pyqtSignal, QTimer
+from PyQt5.QtCore import QThread, pyqtSignal
 from ui.window import Ui_MainWindow
+from ui.test import Ui_MainWindow as TabbedUi_MainWindow
+from ui.display import HAS_BGR888, FrameMailbox, prepare_for_display, to_pixmap
 from src.opencv_engine import *
+from src.detection_pool import DetectionPool, PooledCameraPipeline
+from src.metrics import METRICS, MetricsReporter, serve_metrics
+from src.id_tracker import IdStateTracker
+from src.recorder import ClipRecorder
+from src.preview import PreviewChannel, PreviewServer
+from src.camera_config import CameraSpec, ConfigWatcher, detector_factory, load_config, open_recorder, open_source
 from src.config import *
 from sys import platform
 import cv2 as cv
@@ -17,112 +24,287 @@ elif platform == "win32":
     os.environ['QT_QPA_PLATFORM'] = 'windows'
 
 
-CAMERA_1: int | str = 0
-CAMERA_2: int | str = open_cams[0]
+# when this file exists it describes the cameras (see cameras.example.json) and is
+# reloaded on change; otherwise CAMERAS and the settings below are used
+CAMERA_CONFIG: str = "cameras.json"
+CAMERAS: list = [0, open_cams[0]]
+# None: process every new frame as soon as it arrives
+TARGET_FPS: float | None = None
+# cameras not on screen keep detecting at this rate, without drawing; None keeps their full rate
+HIDDEN_FPS: float | None = 5.0
+# the tabbed layout of ui/test.py, one camera on screen at a time
+TABBED_UI: bool = False
+STATS_INTERVAL: float = 5.0
+# per-stage histograms, counters and gauges, logged every STATS_INTERVAL
+METRICS_ENABLED: bool = False
+# e.g. 9105: serves the metrics in Prometheus text format on localhost
+METRICS_PORT: int | None = None
+# MJPEG preview for browsers on http://<pi>:PREVIEW_PORT/, None disables it
+PREVIEW_PORT: int | None = None
+PREVIEW_HOST: str = "0.0.0.0"
+# > 0 runs detection in that many worker processes instead of the camera threads
+DETECTION_WORKERS: int = 0
+# search markers only around their predicted position between full scans
+ARUCO_TRACKING: bool = False
+# None detects at the camera resolution; overlays are drawn on the display frame
+PROCESSING_WIDTH: int | None = None
+ARUCO_GRAYSCALE: bool = True
+# e.g. (320, 640, None): coarse to fine widths, escalating while fewer than ARUCO_MIN_MARKERS are found
+ARUCO_PYRAMID: tuple | None = None
+ARUCO_MIN_MARKERS: int = 1
+# DetectorParameters profile written by benchmarks.tune_aruco, None keeps the defaults
+ARUCO_PROFILE: str | None = None
+DISPLAY_WIDTH: int = 640
+# reuse the last detections while the scene stays static (see CachedReader)
+DETECTION_CACHE: bool = False
+# an ID appears once seen in ID_HITS of the last ID_WINDOW frames, disappears after ID_WINDOW misses
+ID_HITS: int = 3
+ID_WINDOW: int = 5
 
-ARUCO_ID_1: int = -1
-ARUCO_ID_2: int = -1
 
-class WorkerCam1(QThread):
-    image_update = pyqtSignal(QImage)
-    def run(self):
-        self.ThreadActive = True
-        global ARUCO_ID_1
-        reader = ArucoReader(CAMERA_1)
-        
-        while self.ThreadActive:
-            try:
-                image, code = reader.aruco_proccesor()
-                image = imutils.resize(image, width=640)
-                frame = cv.cvtColor(image, cv.COLOR_BGR2RGB)
-                
-                try: ARUCO_ID_1 = code[0][0]
-                except: pass
-                
-                imageComponent = QImage(frame,
-                                        frame.shape[1],
-                                        frame.shape[0],
-                                        frame.strides[0],
-                                        QImage.Format_RGB888)
-                
-                self.image_update.emit(imageComponent)
-            except:
-                pass
-            time.sleep(0.1)
-            
-    def stop(self):
-        self.ThreadActive = False
-        self.quit()
+def default_specs() -> list:
+    specs = []
+    for index, source in enumerate(CAMERAS):
+        kind = "LOCAL_CAMERA_PORT" if isinstance(source, int) else \
+               "WLAN_CAMERA_IP" if "://" in source else "LOCAL_VIDEO"
+        aruco = {"tracking": ARUCO_TRACKING, "grayscale": ARUCO_GRAYSCALE,
+                 "pyramid": ARUCO_PYRAMID, "min_markers": ARUCO_MIN_MARKERS, "profile": ARUCO_PROFILE}
+        specs.append(CameraSpec("camera_{}".format(index), kind, source,
+                                processing_width=PROCESSING_WIDTH, display_width=DISPLAY_WIDTH,
+                                target_fps=TARGET_FPS, aruco=aruco, cache=DETECTION_CACHE))
+    return specs
 
-class WorkerCam2(QThread):
-    image_update = pyqtSignal(QImage)
+
+class CameraWorker(QThread):
+    # only the camera index travels through the signal, the frame waits in the mailbox
+    image_update = pyqtSignal(int)
+    stats_update = pyqtSignal(int, dict)
     
+    def __init__(self, index: int, source: int | str, mailbox: FrameMailbox, tracker: IdStateTracker,
+                 detector=ArucoReader, target_fps: float | None = TARGET_FPS,
+                 pool: DetectionPool | None = None, display_width: int | None = DISPLAY_WIDTH,
+                 recorder: ClipRecorder | None = None, preview: PreviewChannel | None = None,
+                 visible: bool = True) -> None:
+        super().__init__()
+        self.index = index
+        self.mailbox = mailbox
+        self.tracker = tracker
+        self.display_width = display_width
+        self.source = source
+        self.detector = detector
+        self.target_fps = target_fps
+        self.pool = pool
+        self.recorder = recorder
+        self.preview = preview
+        # set from the GUI thread when the camera's tab is shown or hidden
+        self.visible = visible
+        
+    def hidden_fps(self) -> float | None:
+        if HIDDEN_FPS is None:
+            return self.target_fps
+        return min(self.target_fps, HIDDEN_FPS) if self.target_fps else HIDDEN_FPS
+        
     def run(self):
         self.ThreadActive = True
-        global ARUCO_ID_2
-        reader = ArucoReader(CAMERA_2)
+        if self.pool is not None:
+            pipeline = PooledCameraPipeline(self.source, self.detector, self.pool,
+                                            self.index, self.target_fps, self.display_width,
+                                            recorder=self.recorder)
+        else:
+            pipeline = CameraPipeline(self.source, self.detector(None), self.target_fps, self.display_width,
+                                      camera=self.index, recorder=self.recorder)
+        last_report = time.monotonic()
+        errors: int = 0
+        shown: bool | None = None
         
         while self.ThreadActive:
             try:
-                image, code = reader.aruco_proccesor()
-                image = imutils.resize(image, width=640)
-                frame = cv.cvtColor(image, cv.COLOR_BGR2RGB)
-                
-                try: ARUCO_ID_2 = code[0][0] 
-                except: pass
+                # off screen and out of the preview only detection runs, at the hidden rate
+                watched = self.preview is not None and self.preview.watched
+                if shown != (self.visible or watched):
+                    shown = self.visible or watched
+                    pipeline.draw = shown
+                    pipeline.pacer.set_rate(self.target_fps if shown else self.hidden_fps())
                 
-                imageComponent = QImage(frame,
-                                        frame.shape[1],
-                                        frame.shape[0],
-                                        frame.strides[0],
-                                        QImage.Format_RGB888)
+                result = pipeline.step()
+                if result is None:
+                    if pipeline.grabber.finished: break
+                    continue
+                frame, image, detections = result
+                self.tracker.update(self.index, detections, frame.timestamp)
                 
-                self.image_update.emit(imageComponent)
-            except:
-                pass
-            time.sleep(0.1)
+                if image is not None:
+                    start = time.monotonic()
+                    image = prepare_for_display(image)
+                    if self.preview is not None:
+                        # nothing is encoded unless a browser is watching
+                        self.preview.publish(image, rgb=not HAS_BGR888)
+                    if self.visible and self.mailbox.post(self.index, image):
+                        self.image_update.emit(self.index)
+                    pipeline.stats.record("display", time.monotonic() - start)
+            except Exception as error:
+                # keep the camera running, but never silently
+                errors += 1
+                METRICS.increment("worker_errors", camera=self.index)
+                if errors == 1 or errors % 100 == 0:
+                    print("[ERROR] Camera {} ({} errors): {!r}".format(self.index, errors, error))
+            
+            if time.monotonic() - last_report >= STATS_INTERVAL:
+                last_report = time.monotonic()
+                stats = pipeline.stats.snapshot()
+                stats["display_dropped"] = self.mailbox.dropped.get(self.index, 0)
+                stats["errors"] = errors
+                stats["visible"] = self.visible
+                stats["health"] = pipeline.grabber.health()
+                if self.recorder is not None:
+                    stats["clips"] = self.recorder.stats()
+                METRICS.set_gauge("display_dropped", stats["display_dropped"], self.index)
+                if not METRICS.enabled:
+                    print("[INFO] Camera {}: {}".format(self.index, stats))
+                self.stats_update.emit(self.index, stats)
+        pipeline.release()
             
     def stop(self):
         self.ThreadActive = False
         self.quit()
         
 class Window(QMainWindow):
+    # camera index whose visible IDs changed
+    ids_changed = pyqtSignal(object)
+    # new list of CameraSpec from the config watcher
+    config_changed = pyqtSignal(object)
+    
     def __init__(self) -> None:
         super().__init__()
-        self.window_ = Ui_MainWindow()
+        self.window_ = TabbedUi_MainWindow() if TABBED_UI else Ui_MainWindow()
         self.window_.setupUi(self)
         
         self.setWindowTitle("Test")
         #self.setWindowIcon(QtGui.QIcon('static/icon.png'))
         self.setStyleSheet(qdarkstyle.load_stylesheet_pyqt5())
         
-        self.update_worker_1 = WorkerCam1()
-        self.update_worker_1.start()
-        self.update_worker_1.image_update.connect(self.set_picture_cam_1)
+        # (image label, ID label) per camera; with tabs only the current one is on screen
+        self.tabs = None
+        if TABBED_UI:
+            self.tabs = self.window_.tabWidget
+            self.panes: list = [(self.window_.label, None), (self.window_.label_2, None),
+                                (self.window_.label_3, None)]
+        else:
+            self.panes: list = [(self.window_.cam_1, self.window_.id_0),
+                                (self.window_.cam_2, self.window_.id_1)]
         
-        self.update_worker_2 = WorkerCam2()
-        self.update_worker_2.start()
-        self.update_worker_2.image_update.connect(self.set_picture_cam_2)
+        self.pool = DetectionPool(DETECTION_WORKERS) if DETECTION_WORKERS > 0 else None
+        self.mailbox = FrameMailbox()
+        self.tracker = IdStateTracker(ID_HITS, ID_WINDOW)
+        # events arrive on the camera threads, the signal hands them to the GUI thread
+        self.tracker.subscribe(lambda event: self.ids_changed.emit(event.camera))
+        self.ids_changed.connect(self.update_ids)
+        METRICS.enabled = METRICS_ENABLED
+        self.reporter = MetricsReporter(STATS_INTERVAL) if METRICS_ENABLED else None
+        if self.reporter is not None:
+            self.reporter.start()
+        self.metrics_server = serve_metrics(METRICS_PORT) if METRICS_ENABLED and METRICS_PORT else None
+        self.preview = PreviewServer(PREVIEW_PORT, PREVIEW_HOST).start() if PREVIEW_PORT else None
         
-        self.window_.salir.clicked.connect(self.close)   
+        self.specs: list = []
+        self.workers: dict = {}
+        self.watcher = None
+        if os.path.exists(CAMERA_CONFIG):
+            self.apply_config(load_config(CAMERA_CONFIG))
+            self.config_changed.connect(self.apply_config)
+            self.watcher = ConfigWatcher(CAMERA_CONFIG, self.config_changed.emit)
+            self.watcher.start()
+        else:
+            self.apply_config(default_specs())
         
-        timer = QTimer(self)
-        timer.timeout.connect(self.update_ids)
-        timer.start(100)
+        if self.tabs is not None:
+            self.tabs.currentChanged.connect(self.update_visibility)
+            self.window_.comboBox.currentIndexChanged.connect(self.tabs.setCurrentIndex)
+            self.tabs.currentChanged.connect(self.window_.comboBox.setCurrentIndex)
+            self.window_.pushButton.clicked.connect(
+                lambda: self.tabs.setCurrentIndex((self.tabs.currentIndex() + 1) % self.tabs.count()))
+            self.window_.pushButton_2.clicked.connect(self.close)
+        else:
+            self.window_.salir.clicked.connect(self.close)   
         
         self.showMaximized()
         
-    def set_picture_cam_1(self, imageComponent: QImage) -> None:
-        self.window_.cam_1.setPixmap(QPixmap.fromImage(imageComponent))
+    def apply_config(self, specs: list) -> None:
+        # only the cameras whose spec changed are restarted
+        for index in range(max(len(specs), len(self.specs))):
+            old = self.specs[index] if index < len(self.specs) else None
+            new = specs[index] if index < len(specs) else None
+            if old == new:
+                continue
+            if index in self.workers:
+                self.stop_worker(index)
+            if new is not None:
+                self.start_worker(index, new)
+        self.specs = list(specs)
+    
+    def start_worker(self, index: int, spec: CameraSpec) -> None:
+        try:
+            source = open_source(spec)
+        except ValueError as error:
+            print("[ERROR] Camera {}: {}".format(spec.name, error))
+            return
+        worker = CameraWorker(index, source, self.mailbox, self.tracker, detector_factory(spec),
+                              spec.target_fps, self.pool, spec.display_width, open_recorder(spec),
+                              self.preview.channel(index) if self.preview else None,
+                              self.is_visible(index))
+        worker.image_update.connect(self.set_picture)
+        worker.start()
+        self.workers[index] = worker
+    
+    def stop_worker(self, index: int) -> None:
+        worker = self.workers.pop(index)
+        worker.stop()
+        worker.wait(2000)
+        self.tracker.reset(index)
+        self.update_ids(index)
+    
+    def is_visible(self, index: int) -> bool:
+        # cameras without a pane, or on a hidden tab, keep running detection only
+        if index >= len(self.panes):
+            return False
+        return self.tabs is None or self.tabs.currentIndex() == index
+    
+    def update_visibility(self) -> None:
+        for index, worker in self.workers.items():
+            worker.visible = self.is_visible(index)
     
-    def set_picture_cam_2(self, imageComponent: QImage) -> None:
-        self.window_.cam_2.setPixmap(QPixmap.fromImage(imageComponent))
+    def set_picture(self, index: int) -> None:
+        with METRICS.stage("paint", index):
+            image = self.mailbox.take(index)
+            if image is None or not self.is_visible(index):
+                return
+            self.panes[index][0].setPixmap(to_pixmap(image))
 
-    def update_ids(self) -> None:
-        self.window_.id_0.setText(f'<html><head/><body><p align="center"><span style=" font-weight:600;">ID: {ARUCO_ID_1}</span></p></body></html>')
-        self.window_.id_1.setText(f'<html><head/><body><p align="center"><span style=" font-weight:600;">ID: {ARUCO_ID_2}</span></p></body></html>')
+    def update_ids(self, index: int) -> None:
+        if index >= len(self.panes):
+            return
+        visible = sorted(str(value) for _, value in self.tracker.visible(index))
+        text = ", ".join(visible) if visible else -1
+        if self.panes[index][1] is None:
+            # the tabbed layout has no ID labels, the IDs go in the tab title
+            self.tabs.setTabText(index, "Cámara {} - ID: {}".format(index + 1, text))
+            return
+        self.panes[index][1].setText(f'<html><head/><body><p align="center"><span style=" font-weight:600;">ID: {text}</span></p></body></html>')
     
     def close(self) -> None:
+        if self.watcher is not None:
+            self.watcher.stop()
+        for worker in self.workers.values():
+            worker.stop()
+            worker.wait(2000)
+        if self.pool is not None:
+            self.pool.close()
+        if self.reporter is not None:
+            self.reporter.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
+        if self.preview is not None:
+            self.preview.stop()
         sys.exit(0)
         
 
@@ -0,0 +1,58 @@
+import json
+import cv2 as cv
+
+"""
+ArUco detector profiles written by benchmarks.tune_aruco. A profile file
+holds the Pareto-optimal parameter sets found on a corpus (fastest first,
+each with its measured time and recall):
+
+    {"target_recall": 0.95, "profiles": [
+        {"time_ms": 4.1, "recall": 0.96, "precision": 1.0,
+         "dictionary": "DICT_ARUCO_ORIGINAL", "dictionary_size": 50,
+         "parameters": {"adaptiveThreshWinSizeMax": 13, "useAruco3Detection": true}}
+    ]}
+
+`dictionary_size` keeps only the first N markers of the dictionary, which
+is enough when the deployment uses IDs below N and rejects the others.
+ArucoReader(profile=path) loads the fastest set meeting the target recall.
+"""
+
+
+def aruco_dictionary(name: str, size: int | None = None):
+    dictionary = cv.aruco.getPredefinedDictionary(getattr(cv.aruco, name))
+    if size is None or size >= len(dictionary.bytesList):
+        return dictionary
+    return cv.aruco.Dictionary(dictionary.bytesList[:size], dictionary.markerSize,
+                               dictionary.maxCorrectionBits)
+
+
+def detector_parameters(values: dict):
+    parameters = cv.aruco.DetectorParameters()
+    for name, value in values.items():
+        if not hasattr(parameters, name):
+            raise ValueError("Unknown DetectorParameters field {!r}".format(name))
+        setattr(parameters, name, value)
+    return parameters
+
+
+def select_profile(data: dict, min_recall: float | None = None) -> dict:
+    # fastest profile meeting the recall target, else the most accurate one
+    profiles = data["profiles"]
+    if not profiles:
+        raise ValueError("The profile file lists no parameter sets")
+    target = data.get("target_recall", 0.0) if min_recall is None else min_recall
+    meeting = [profile for profile in profiles if profile["recall"] >= target]
+    if meeting:
+        return min(meeting, key=lambda profile: profile["time_ms"])
+    return max(profiles, key=lambda profile: (profile["recall"], -profile["time_ms"]))
+
+
+def load_profile(path: str, min_recall: float | None = None) -> dict:
+    with open(path) as profile_file:
+        return select_profile(json.load(profile_file), min_recall)
+
+
+def save_profiles(path: str, profiles: list, target_recall: float, **info) -> None:
+    profiles = sorted(profiles, key=lambda profile: profile["time_ms"])
+    with open(path, "w") as profile_file:
+        json.dump({"target_recall": target_recall, **info, "profiles": profiles}, profile_file, indent=4)
@@ -0,0 +1,196 @@
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass, field, fields
+from functools import partial
+from src.opencv_engine import *
+from src.capture import MjpegCapture
+from src.pose import PoseReader
+from src.recorder import ClipRecorder, EventTrigger
+
+"""
+Declarative camera setup. A JSON file lists any number of cameras, each
+with its source type (see camera_types), detector chain, processing and
+display resolution, target FPS, capture backend and buffer size:
+
+    {"cameras": [
+        {"name": "line_1", "type": "LOCAL_CAMERA_PORT", "source": 0,
+         "detectors": ["aruco", "two_stage"], "processing_width": 640,
+         "target_fps": 15, "aruco": {"tracking": true}},
+        {"name": "dock", "type": "WLAN_CAMERA_IP", "source": "http://.../video.mjpg",
+         "backend": "FFMPEG", "buffer_size": 2, "cache": true,
+         "pose": {"calibration": "dock.json", "marker_length": 0.05}}
+    ]}
+
+ConfigWatcher polls the file and hands every valid new version to a
+callback, so cameras can be retuned without restarting the process.
+"""
+
+DETECTORS: dict = {
+    "aruco": ArucoReader,
+    "pyzbar": BarcodeReaderPyZbar,
+    "two_stage": BarcodeReaderTwoStage,
+}
+
+
+@dataclass
+class CameraSpec:
+    name: str
+    type: str = "LOCAL_CAMERA_PORT"
+    source: int | str = 0
+    detectors: list = field(default_factory=lambda: ["aruco"])
+    processing_width: int | None = None
+    display_width: int | None = 640
+    target_fps: float | None = None
+    # cv.CAP_<backend>: ANY, FFMPEG, V4L2, GSTREAMER, DSHOW...
+    backend: str = "ANY"
+    # frames the backend may queue (CAP_PROP_BUFFERSIZE); 1 gives the freshest frames
+    buffer_size: int = 1
+    # "mjpeg" reads WLAN_CAMERA_IP MJPEG streams without FFmpeg, decoding at
+    # the smallest 1/2, 1/4, 1/8 scale still covering processing_width
+    decoder: str = "ffmpeg"
+    grayscale_decode: bool = False
+    # replay rate of LOCAL_VIDEO / LOCAL_IMAGE sources
+    pace_fps: float | None = None
+    flip: bool | None = None
+    # extra ArucoReader options; "dictionary" is a cv.aruco.DICT_* name
+    aruco: dict = field(default_factory=dict)
+    # PoseReader options: calibration (file from calibrate.py), marker_length, method...
+    pose: dict = field(default_factory=dict)
+    # event clips: ClipRecorder options plus the EventTrigger ones
+    # (expected_ids, barcode_timeout, cooldown); empty disables recording
+    clips: dict = field(default_factory=dict)
+    cache: bool = False
+
+    def validate(self) -> "CameraSpec":
+        if self.type not in camera_types:
+            raise ValueError("Camera {}: unknown type {!r}, expected one of {}".format(
+                self.name, self.type, camera_types))
+        unknown = [name for name in self.detectors if name not in DETECTORS]
+        if unknown or not self.detectors:
+            raise ValueError("Camera {}: unknown detectors {}, expected {}".format(
+                self.name, unknown, sorted(DETECTORS)))
+        if not hasattr(cv, "CAP_" + self.backend):
+            raise ValueError("Camera {}: unknown backend {!r}".format(self.name, self.backend))
+        if self.decoder not in ("ffmpeg", "mjpeg"):
+            raise ValueError("Camera {}: unknown decoder {!r}".format(self.name, self.decoder))
+        if self.decoder == "mjpeg" and self.type != "WLAN_CAMERA_IP":
+            raise ValueError("Camera {}: the mjpeg decoder needs a WLAN_CAMERA_IP source".format(self.name))
+        if self.pose and ("aruco" not in self.detectors or "calibration" not in self.pose):
+            raise ValueError("Camera {}: pose needs the aruco detector and a calibration".format(self.name))
+        if self.type == "LOCAL_CAMERA_PORT" and not isinstance(self.source, int):
+            raise ValueError("Camera {}: LOCAL_CAMERA_PORT needs an integer source".format(self.name))
+        return self
+
+
+def parse_config(data: dict) -> list:
+    known = {spec_field.name for spec_field in fields(CameraSpec)}
+    specs = []
+    for index, entry in enumerate(data.get("cameras", [])):
+        extra = set(entry) - known
+        if extra:
+            raise ValueError("Camera {}: unknown keys {}".format(entry.get("name", index), sorted(extra)))
+        entry = {"name": "camera_{}".format(index), **entry}
+        specs.append(CameraSpec(**entry).validate())
+    return specs
+
+
+def load_config(path: str) -> list:
+    with open(path) as config_file:
+        return parse_config(json.load(config_file))
+
+
+def save_config(path: str, specs: list) -> None:
+    with open(path, "w") as config_file:
+        json.dump({"cameras": [asdict(spec) for spec in specs]}, config_file, indent=4)
+
+
+def detector_factory(spec: CameraSpec):
+    # picklable factory called with the camera port, usable with DetectionPool
+    options = dict(spec.aruco)
+    if isinstance(options.get("dictionary"), str):
+        options["dictionary"] = getattr(cv.aruco, options["dictionary"])
+    if isinstance(options.get("pyramid"), list):
+        options["pyramid"] = tuple(options["pyramid"])
+
+    # a chain mirrors the frame once for all its readers, barcode readers do not flip
+    chain = len(spec.detectors) > 1 or (bool(spec.flip) and spec.detectors != ["aruco"])
+    readers = []
+    for name in spec.detectors:
+        if name == "aruco":
+            readers.append(partial(ArucoReader, processing_width=spec.processing_width,
+                                   flip=False if chain else spec.flip, **options))
+        else:
+            readers.append(DETECTORS[name])
+
+    factory = partial(ReaderChain, readers=readers, flip=spec.flip) if chain else readers[0]
+    if spec.pose:
+        factory = partial(PoseReader, reader=factory, processing_width=spec.processing_width, **spec.pose)
+    return partial(CachedReader, reader=factory) if spec.cache else factory
+
+
+TRIGGER_OPTIONS: tuple = ("expected_ids", "barcode_timeout", "cooldown")
+
+
+def open_recorder(spec: CameraSpec) -> ClipRecorder | None:
+    if not spec.clips:
+        return None
+    options = {key: value for key, value in spec.clips.items() if key not in TRIGGER_OPTIONS}
+    trigger = {key: value for key, value in spec.clips.items() if key in TRIGGER_OPTIONS}
+    return ClipRecorder(spec.name, trigger=EventTrigger(**trigger) if trigger else None, **options)
+
+
+def open_source(spec: CameraSpec) -> FrameGrabber:
+    backend = getattr(cv, "CAP_" + spec.backend)
+    pace_fps = spec.pace_fps
+    if spec.decoder == "mjpeg":
+        source = MjpegCapture(spec.source, spec.processing_width, spec.grayscale_decode)
+    elif spec.type == "LOCAL_IMAGE":
+        source = ImageSource(spec.source)
+        # a still image would otherwise be "grabbed" in a busy loop
+        pace_fps = pace_fps or 10.0
+    else:
+        source = spec.source
+        if spec.type == "LOCAL_VIDEO" and pace_fps is None:
+            capture = cv.VideoCapture(spec.source)
+            pace_fps = capture.get(cv.CAP_PROP_FPS) or None
+            capture.release()
+    return FrameGrabber(source, backend, spec.buffer_size, pace_fps)
+
+
+class ConfigWatcher(threading.Thread):
+    """
+    Polls the modification time of the config file and calls
+    `callback(specs)` with every new valid version. Invalid edits are
+    reported and ignored, the running setup is kept.
+    """
+    def __init__(self, path: str, callback, interval: float = 1.0) -> None:
+        super().__init__(daemon=True)
+        self.path = path
+        self.callback = callback
+        self.interval = interval
+        self.mtime: float | None = self._mtime()
+        self._stop_event = threading.Event()
+
+    def _mtime(self) -> float | None:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            mtime = self._mtime()
+            if mtime is None or mtime == self.mtime:
+                continue
+            self.mtime = mtime
+            try:
+                specs = load_config(self.path)
+            except (OSError, ValueError, TypeError) as error:
+                print("[ERROR] Ignoring invalid camera config {}: {}".format(self.path, error))
+                continue
+            print("[INFO] Camera config {} reloaded".format(self.path))
+            self.callback(specs)
+
+    def stop(self) -> None:
+        self._stop_event.set()
@@ -0,0 +1,274 @@
+import base64
+import http.client
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+import cv2 as cv
+import numpy as np
+from src.metrics import METRICS
+
+"""
+Network capture that survives stalled or dropped streams. The FFmpeg
+backend is opened with open/read timeouts and low-latency options, so a
+stalled read returns in a bounded time instead of blocking for tens of
+seconds; after a few failed reads the stream is reopened with exponential
+backoff. `read()` keeps the VideoCapture contract but only returns once it
+has a frame or the capture is released, which keeps FrameGrabber simple.
+"""
+
+# applied to every FFmpeg capture unless already set in the environment
+LOW_LATENCY_OPTIONS: str = "fflags;nobuffer|flags;low_delay|probesize;32768|analyzeduration;0"
+
+
+def is_network_source(source) -> bool:
+    return isinstance(source, str) and "://" in source
+
+
+class ReconnectingCapture:
+    def __init__(self, url: str, config: int = cv.CAP_FFMPEG, open_timeout: float = 5.0,
+                 read_timeout: float = 2.0, max_failures: int = 3, backoff: float = 0.5,
+                 max_backoff: float = 30.0, label=None, buffer_size: int = 1) -> None:
+        self.url = url
+        self.config = cv.CAP_FFMPEG if config == cv.CAP_ANY else config
+        self.open_timeout = open_timeout
+        self.read_timeout = read_timeout
+        self.max_failures = max_failures
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.label = label
+        self.buffer_size = buffer_size
+
+        # health
+        self.state: str = "connecting"
+        self.reconnects: int = 0
+        self.failures: int = 0
+        self.frames: int = 0
+        self.last_frame: float | None = None
+        self.last_error: str | None = None
+
+        self.capture: cv.VideoCapture | None = None
+        self._attempt: int = 0
+        self._closed = threading.Event()
+        os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", LOW_LATENCY_OPTIONS)
+
+    def _open(self) -> bool:
+        params = [cv.CAP_PROP_OPEN_TIMEOUT_MSEC, int(self.open_timeout * 1000),
+                  cv.CAP_PROP_READ_TIMEOUT_MSEC, int(self.read_timeout * 1000)]
+        capture = cv.VideoCapture(self.url, self.config, params)
+        if not capture.isOpened():
+            capture.release()
+            self.last_error = "open failed"
+            return False
+        capture.set(cv.CAP_PROP_BUFFERSIZE, self.buffer_size)
+        self.capture = capture
+        return True
+
+    def _grab(self) -> tuple:
+        return self.capture.read()
+
+    def _close_capture(self) -> None:
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+
+    def _wait_backoff(self) -> None:
+        # 0.5, 1, 2, 4... seconds with jitter, so cameras behind the same
+        # switch do not reconnect in lockstep
+        delay = min(self.max_backoff, self.backoff * 2 ** min(self._attempt, 16))
+        self._attempt += 1
+        self._closed.wait(delay * random.uniform(0.8, 1.2))
+
+    def read(self) -> tuple:
+        while not self._closed.is_set():
+            if self.capture is None:
+                if self.state != "connecting":
+                    self.state = "reconnecting"
+                if not self._open():
+                    print("[WARN] {}: cannot open, retrying".format(self.url))
+                    self._wait_backoff()
+                    continue
+                self.last_error = None
+                if self.state == "reconnecting":
+                    self.reconnects += 1
+                    METRICS.increment("reconnects", camera=self.label)
+                    print("[INFO] {}: reconnected".format(self.url))
+
+            try:
+                ret, image = self._grab()
+            except (OSError, ValueError) as error:
+                ret, image = False, None
+                self.last_error = repr(error)
+            if ret and image is not None:
+                self.state = "streaming"
+                self.failures = 0
+                self._attempt = 0
+                self.frames += 1
+                self.last_frame = time.monotonic()
+                return True, image
+
+            # the read timed out or the stream ended
+            self.failures += 1
+            self.state = "stalled"
+            self.last_error = self.last_error or "read failed"
+            if self.failures >= self.max_failures:
+                print("[WARN] {}: stream lost, reconnecting".format(self.url))
+                self._close_capture()
+                self.failures = 0
+                self.state = "reconnecting"
+                self._wait_backoff()
+        return False, None
+
+    def health(self) -> dict:
+        age = time.monotonic() - self.last_frame if self.last_frame is not None else None
+        return {
+            "state": self.state,
+            "frames": self.frames,
+            "reconnects": self.reconnects,
+            "last_frame_age": None if age is None else round(age, 2),
+            "last_error": self.last_error,
+        }
+
+    def isOpened(self) -> bool:
+        return not self._closed.is_set()
+
+    def set(self, prop: int, value) -> bool:
+        return self.capture.set(prop, value) if self.capture is not None else False
+
+    def interrupt(self) -> None:
+        # wakes up a read() waiting in backoff; reads in progress end within read_timeout
+        self._closed.set()
+
+    def release(self) -> None:
+        self._closed.set()
+        self.state = "closed"
+        self._close_capture()
+
+
+# scaled DCT decode: (color, grayscale) imdecode flags per reduction factor
+REDUCED_DECODE: dict = {
+    1: (cv.IMREAD_COLOR, cv.IMREAD_GRAYSCALE),
+    2: (cv.IMREAD_REDUCED_COLOR_2, cv.IMREAD_REDUCED_GRAYSCALE_2),
+    4: (cv.IMREAD_REDUCED_COLOR_4, cv.IMREAD_REDUCED_GRAYSCALE_4),
+    8: (cv.IMREAD_REDUCED_COLOR_8, cv.IMREAD_REDUCED_GRAYSCALE_8),
+}
+
+
+def reduction_for(width: int, target_width: int | None) -> int:
+    # largest factor whose decoded width still covers the processing width
+    if not target_width:
+        return 1
+    return max(factor for factor in REDUCED_DECODE if factor == 1 or width // factor >= target_width)
+
+
+class MjpegCapture(ReconnectingCapture):
+    """
+    Reads a multipart MJPEG HTTP stream without FFmpeg and decodes every
+    JPEG with cv.imdecode, at 1/2, 1/4 or 1/8 of the resolution when
+    `target_width` allows it (the DCT is scaled, the full image is never
+    built) and straight to grayscale when colour is not needed.
+    Coordinates of detections refer to the decoded resolution.
+    """
+    def __init__(self, url: str, target_width: int | None = None, grayscale: bool = False,
+                 reduce: int | None = None, **options) -> None:
+        super().__init__(url, **options)
+        self.target_width = target_width
+        self.grayscale = grayscale
+        # fixed factor, or None to pick it from the first frame and target_width
+        self.reduce = reduce
+        self.connection: http.client.HTTPConnection | None = None
+
+    def _open(self) -> bool:
+        parts = urlsplit(self.url)
+        connection_cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        headers = {}
+        if parts.username:
+            token = "{}:{}".format(parts.username, parts.password or "").encode()
+            headers["Authorization"] = "Basic " + base64.b64encode(token).decode()
+        connection = None
+        try:
+            # a bad port in the URL raises ValueError
+            connection = connection_cls(parts.hostname, parts.port, timeout=self.open_timeout)
+            connection.connect()
+            # the response takes the socket over, keep a reference for the timeout
+            sock = connection.sock
+            target = (parts.path or "/") + ("?" + parts.query if parts.query else "")
+            connection.request("GET", target, headers=headers)
+            response = connection.getresponse()
+        except (OSError, http.client.HTTPException, ValueError) as error:
+            # refused, timed out, or not answering HTTP (e.g. a camera rebooting)
+            if connection is not None:
+                connection.close()
+            self.last_error = repr(error)
+            return False
+        if response.status != 200:
+            connection.close()
+            self.last_error = "HTTP {}".format(response.status)
+            return False
+        sock.settimeout(self.read_timeout)
+        self.connection = connection
+        self.capture = response
+        return True
+
+    def _next_jpeg(self) -> bytes:
+        response = self.capture
+        # skip to the next part; its headers end with an empty line
+        line = response.readline()
+        while not line.startswith(b"--"):
+            if not line:
+                raise EOFError("stream closed")
+            line = response.readline()
+        length = None
+        while True:
+            line = response.readline()
+            if not line:
+                raise EOFError("stream closed")
+            if line in (b"\r\n", b"\n"):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        if length is not None:
+            return response.read(length)
+
+        # no Content-Length: the JPEG ends with the EOI marker
+        data = bytearray()
+        while not data.rstrip(b"\r\n").endswith(b"\xff\xd9"):
+            line = response.readline()
+            if not line:
+                raise EOFError("stream closed")
+            data += line
+        return bytes(data.rstrip(b"\r\n"))
+
+    def _grab(self) -> tuple:
+        try:
+            jpeg = np.frombuffer(self._next_jpeg(), dtype=np.uint8)
+        except (EOFError, OSError, http.client.HTTPException, ValueError) as error:
+            self.last_error = repr(error)
+            return False, None
+        if self.reduce is None:
+            image = cv.imdecode(jpeg, REDUCED_DECODE[1][self.grayscale])
+            if image is None:
+                return False, None
+            self.reduce = reduction_for(image.shape[1], self.target_width)
+            return True, resize_to_factor(image, self.reduce)
+        image = cv.imdecode(jpeg, REDUCED_DECODE[self.reduce][self.grayscale])
+        return image is not None, image
+
+    def _close_capture(self) -> None:
+        if self.capture is not None:
+            self.capture.close()
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+        self.capture = None
+
+
+def resize_to_factor(image: np.ndarray, factor: int) -> np.ndarray:
+    # first frame, decoded at full size to learn the native resolution
+    if factor == 1:
+        return image
+    # same rounding as the reduced decode of the next frames
+    size = (-(-image.shape[1] // factor), -(-image.shape[0] // factor))
+    return cv.resize(image, size, interpolation=cv.INTER_AREA)
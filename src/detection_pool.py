@@ -0,0 +1,299 @@
+import multiprocessing as mp
+import os
+import threading
+import time
+from collections import deque
+from multiprocessing import shared_memory
+from src.opencv_engine import *
+from src.metrics import METRICS
+
+"""
+Process pool mode: detection runs in worker processes so several cameras
+can use every core of the Pi. Frames are written once into shared memory
+slots owned by the GUI process; the workers only receive the slot name and
+send back the detections as small arrays, never the image itself.
+
+Each worker has its own task queue. Frames of a camera whose detector keeps
+state between frames (tracking, detection cache) always go to the same
+worker, in order; the other frames go to the least busy worker.
+"""
+
+
+class SharedFrameSlots:
+    def __init__(self, shape: tuple, slots: int = 2) -> None:
+        self.shape = shape
+        self.nbytes: int = int(np.prod(shape))
+        self.memory: list = [shared_memory.SharedMemory(create=True, size=self.nbytes)
+                             for _ in range(slots)]
+        self.free: deque = deque(range(slots))
+
+    def acquire(self) -> int | None:
+        return self.free.popleft() if self.free else None
+
+    def write(self, slot: int, image: np.ndarray) -> str:
+        view = np.ndarray(self.shape, dtype=np.uint8, buffer=self.memory[slot].buf)
+        np.copyto(view, image)
+        return self.memory[slot].name
+
+    def release(self, slot: int) -> None:
+        self.free.append(slot)
+
+    def idle(self) -> bool:
+        return len(self.free) == len(self.memory)
+
+    def owns(self, name: str) -> bool:
+        return any(memory.name == name for memory in self.memory)
+
+    def close(self) -> None:
+        for memory in self.memory:
+            memory.close()
+            memory.unlink()
+
+
+def _detection_worker(worker: int, tasks, results) -> None:
+    # parallelism comes from the processes, avoid oversubscribing the cores
+    cv.setNumThreads(1)
+    detectors: dict = {}
+    attached: dict = {}
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        camera, slot, seq, timestamp, name, shape, detector_cls = task
+
+        if name not in attached:
+            attached[name] = shared_memory.SharedMemory(name=name)
+        # one detector per camera: stateful ones only ever see their camera's frames
+        key = (camera, repr(detector_cls))
+        if key not in detectors:
+            detectors[key] = detector_cls(None)
+        detector = detectors[key]
+
+        image = np.ndarray(shape, dtype=np.uint8, buffer=attached[name].buf)
+        try:
+            detections = detector.detect_frame(image)
+            # optional arrays: pyramid levels, and the poses of a PoseReader
+            optional = [None if values is None else np.asarray(values, dtype=dtype).tobytes()
+                        for values, dtype in ((detections.levels, np.int8), (detections.rvecs, np.float32),
+                                              (detections.tvecs, np.float32))]
+            message = (detections.ids.tobytes(), detections.corners.tobytes(),
+                       detections.barcodes, detections.size, *optional)
+        except Exception as error:
+            print("[ERROR] Detection failed on camera {}: {}".format(camera, error))
+            message = None
+        del image
+
+        results.put((worker, camera, slot, name, seq, timestamp, message))
+
+    for memory in attached.values():
+        memory.close()
+
+
+def _unpack(message: tuple) -> Detections:
+    ids, corners, barcodes, size, levels, rvecs, tvecs = message
+    return Detections(np.frombuffer(ids, dtype=np.int32),
+                      np.frombuffer(corners, dtype=np.float32).reshape(-1, 4, 2),
+                      barcodes, size,
+                      np.frombuffer(levels, dtype=np.int8) if levels is not None else None,
+                      np.frombuffer(rvecs, dtype=np.float32).reshape(-1, 3) if rvecs is not None else None,
+                      np.frombuffer(tvecs, dtype=np.float32).reshape(-1, 3) if tvecs is not None else None)
+
+
+class DetectionPool:
+    def __init__(self, workers: int | None = None, slots_per_camera: int = 2) -> None:
+        # spawn: never fork a process that already runs capture and Qt threads
+        context = mp.get_context("spawn")
+        self.slots_per_camera = slots_per_camera
+        workers = workers or os.cpu_count() or 1
+        self.tasks: list = [context.Queue() for _ in range(workers)]
+        self.results = context.Queue()
+        self.processes: list = [context.Process(target=_detection_worker,
+                                                args=(worker, self.tasks[worker], self.results), daemon=True)
+                                for worker in range(workers)]
+        for process in self.processes:
+            process.start()
+        # tasks queued or running per worker, and the worker of each stateful camera
+        self.load: list = [0] * workers
+        self.pinned: dict = {}
+
+        self.slots: dict = {}
+        self.retired: dict = {}
+        self.latest: dict = {}
+        self.completed: dict = {}
+        self.dropped: dict = {}
+        self.in_flight: int = 0
+
+        self._lock = threading.Condition()
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    def submit(self, camera: int, image: np.ndarray, seq: int, timestamp: float,
+               detector_cls=ArucoReader, stateful: bool = False) -> bool:
+        with self._lock:
+            slots = self.slots.get(camera)
+            if slots is None or slots.shape != image.shape:
+                if slots is not None:
+                    self._retire(slots)
+                slots = self.slots[camera] = SharedFrameSlots(image.shape, self.slots_per_camera)
+
+            slot = slots.acquire()
+            if slot is None:
+                # every slot is still being processed: drop, a newer frame will follow
+                self.dropped[camera] = self.dropped.get(camera, 0) + 1
+                METRICS.increment("pool_dropped", camera=camera)
+                return False
+            name = slots.write(slot, image)
+            worker = self._worker_for(camera, stateful)
+            self.load[worker] += 1
+            self.in_flight += 1
+            METRICS.set_gauge("pool_in_flight", self.in_flight)
+
+        self.tasks[worker].put((camera, slot, seq, timestamp, name, image.shape, detector_cls))
+        return True
+
+    def _worker_for(self, camera: int, stateful: bool) -> int:
+        # lock held
+        if not stateful:
+            return min(range(len(self.load)), key=self.load.__getitem__)
+        if camera not in self.pinned:
+            # spread the stateful cameras evenly over the workers
+            counts = [list(self.pinned.values()).count(worker) for worker in range(len(self.load))]
+            self.pinned[camera] = counts.index(min(counts))
+        return self.pinned[camera]
+
+    def _retire(self, slots: SharedFrameSlots) -> None:
+        # resolution changed: free the old slots once their frames come back
+        if slots.idle():
+            slots.close()
+            return
+        for memory in slots.memory:
+            self.retired[memory.name] = slots
+
+    def _collect(self) -> None:
+        while True:
+            try:
+                item = self.results.get()
+            except (EOFError, OSError):
+                break
+            if item is None:
+                break
+            worker, camera, slot, name, seq, timestamp, message = item
+
+            with self._lock:
+                self.load[worker] -= 1
+                self.in_flight -= 1
+                METRICS.set_gauge("pool_in_flight", self.in_flight)
+                slots = self.slots.get(camera)
+                if slots is not None and slots.owns(name):
+                    slots.release(slot)
+                elif name in self.retired:
+                    old = self.retired[name]
+                    old.release(slot)
+                    if old.idle():
+                        for memory in old.memory:
+                            self.retired.pop(memory.name, None)
+                        old.close()
+
+                if message is None:
+                    continue
+                self.completed[camera] = self.completed.get(camera, 0) + 1
+                # workers may finish frames of the same camera out of order
+                previous = self.latest.get(camera)
+                if previous is None or previous[0] < seq:
+                    self.latest[camera] = (seq, timestamp, _unpack(message))
+                    self._lock.notify_all()
+
+    def result(self, camera: int, after_seq: int = -1, timeout: float | None = 0.0) -> tuple | None:
+        # (seq, timestamp, Detections) of the newest processed frame
+        with self._lock:
+            ready = lambda: camera in self.latest and self.latest[camera][0] > after_seq
+            if timeout != 0.0:
+                self._lock.wait_for(ready, timeout)
+            return self.latest[camera] if ready() else None
+
+    def close(self) -> None:
+        for tasks in self.tasks:
+            tasks.put(None)
+        for process in self.processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+        self.results.put(None)
+        self._collector.join(timeout=2.0)
+
+        with self._lock:
+            for slots in self.slots.values():
+                slots.close()
+            for slots in set(self.retired.values()):
+                slots.close()
+            self.slots.clear()
+            self.retired.clear()
+
+
+class PooledCameraPipeline:
+    """
+    Same interface as CameraPipeline, but detection is submitted to a
+    DetectionPool and each frame is shown with the newest result available.
+    With `draw=False` the display image is skipped and the detections are
+    given in frame coordinates.
+    """
+    def __init__(self, source, detector_cls, pool: DetectionPool, camera: int,
+                 target_fps: float | None = None, display_width: int = 640,
+                 config: int = cv.CAP_ANY, recorder=None, draw: bool = True) -> None:
+        self.grabber = open_grabber(source, config)
+        if self.grabber.label is None:
+            self.grabber.label = camera
+        self.detector_cls = detector_cls
+        self.reader = detector_cls(None)
+        # frames of a tracking or caching detector go to one worker, in order
+        self.stateful: bool = getattr(self.reader, "stateful", False)
+        self.pool = pool
+        self.camera = camera
+        self.display_width = display_width
+        self.draw = draw
+        self.recorder = recorder
+        self.pacer = RatePacer(target_fps)
+        self.stats = PipelineStats(camera=camera)
+        self.last_seq: int = 0
+
+    def step(self, timeout: float | None = 1.0) -> tuple | None:
+        self.pacer.wait()
+
+        start = time.monotonic()
+        frame = self.grabber.wait_frame(self.last_seq, timeout)
+        if frame is None:
+            return None
+        grabbed = time.monotonic()
+
+        skipped = frame.seq - self.last_seq - 1 if self.last_seq else 0
+        self.last_seq = frame.seq
+        if not self.pool.submit(self.camera, frame.image, frame.seq, frame.timestamp,
+                                self.detector_cls, self.stateful):
+            skipped += 1
+        submitted = time.monotonic()
+
+        image = self.reader.display_image(frame.image, self.display_width) if self.draw else None
+        height, width = (image if image is not None else frame.image).shape[:2]
+        result = self.pool.result(self.camera)
+        detections = Detections(size=(width, height))
+        if result is not None:
+            detections = result[2].scaled(width, height)
+            self.stats.record("result_age", time.monotonic() - result[1])
+        if image is not None:
+            image = self.reader.draw(image, detections)
+        done = time.monotonic()
+
+        self.stats.record("wait", grabbed - start)
+        self.stats.record("submit", submitted - grabbed)
+        self.stats.record("draw", done - submitted)
+        self.stats.frame_done(skipped)
+        if self.recorder is not None:
+            self.recorder.observe(frame, detections)
+
+        return frame, image, detections
+
+    def release(self) -> None:
+        self.grabber.release()
+        if self.recorder is not None:
+            self.recorder.close()
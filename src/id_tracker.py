@@ -0,0 +1,111 @@
+import threading
+import time
+from dataclasses import dataclass
+from src.opencv_engine import Detections
+
+"""
+Debounced state of the marker and barcode IDs seen by each camera. The
+presence of every ID over the last frames is kept as a bit mask: an ID
+appears once it was seen in `hits` of the last `window` frames and
+disappears after `misses` consecutive frames without it. Consumers
+subscribe to the appear/disappear events instead of polling the detections
+of every frame.
+"""
+
+
+@dataclass
+class IdEvent:
+    camera: int | str
+    kind: str               # "marker" or "barcode"
+    value: int | str
+    event: str              # "appear" or "disappear"
+    timestamp: float        # wall clock
+    dwell: float            # seconds visible, 0 on appear
+    confidence: float       # fraction of the window the ID was seen in
+
+
+class IdState:
+    __slots__ = ("history", "visible", "since", "last_seen")
+
+    def __init__(self) -> None:
+        self.history: int = 0
+        self.visible: bool = False
+        self.since: float = 0.0
+        self.last_seen: float = 0.0
+
+
+class IdStateTracker:
+    def __init__(self, hits: int = 3, window: int = 5, misses: int | None = None) -> None:
+        self.hits = hits
+        self.window = window
+        self.misses = misses or window
+        self.mask: int = (1 << max(window, self.misses)) - 1
+        self.miss_mask: int = (1 << self.misses) - 1
+        self.states: dict = {}
+        self.subscribers: list = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback) -> callable:
+        # callback(event) runs on the thread calling update()
+        with self._lock:
+            self.subscribers.append(callback)
+        return lambda: self.unsubscribe(callback)
+
+    def unsubscribe(self, callback) -> None:
+        with self._lock:
+            if callback in self.subscribers:
+                self.subscribers.remove(callback)
+
+    def update(self, camera, detections: Detections, timestamp: float | None = None) -> list:
+        now = time.monotonic() if timestamp is None else timestamp
+        seen = {("marker", marker_id) for marker_id in detections.ids.tolist()}
+        seen.update(("barcode", data) for data, _, _ in detections.barcodes)
+
+        states = self.states.setdefault(camera, {})
+        for key in seen:
+            if key not in states:
+                states[key] = IdState()
+
+        events = []
+        for key, state in list(states.items()):
+            present = key in seen
+            state.history = ((state.history << 1) | present) & self.mask
+            if present:
+                state.last_seen = now
+
+            if not state.visible and self.count(state) >= self.hits:
+                state.visible, state.since = True, now
+                events.append(self._event(camera, key, "appear", state, 0.0))
+            elif state.visible and not state.history & self.miss_mask:
+                state.visible = False
+                events.append(self._event(camera, key, "disappear", state, state.last_seen - state.since))
+
+            if not state.history:
+                del states[key]
+
+        if events:
+            with self._lock:
+                subscribers = list(self.subscribers)
+            for event in events:
+                for callback in subscribers:
+                    callback(event)
+        return events
+
+    def count(self, state: IdState) -> int:
+        return (state.history & ((1 << self.window) - 1)).bit_count()
+
+    def _event(self, camera, key: tuple, event: str, state: IdState, dwell: float) -> IdEvent:
+        return IdEvent(camera, key[0], key[1], event, time.time(), round(dwell, 3),
+                       self.count(state) / self.window)
+
+    def visible(self, camera, now: float | None = None) -> dict:
+        # {(kind, value): (dwell seconds, confidence)} of the IDs currently visible
+        now = time.monotonic() if now is None else now
+        return {key: (now - state.since, self.count(state) / self.window)
+                for key, state in list(self.states.get(camera, {}).items()) if state.visible}
+
+    def reset(self, camera=None) -> None:
+        if camera is None:
+            self.states.clear()
+        else:
+            self.states.pop(camera, None)
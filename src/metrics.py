@@ -0,0 +1,190 @@
+import bisect
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+"""
+Lightweight instrumentation of the pipeline stages: monotonic timers feeding
+rolling latency histograms, counters (dropped frames...) and gauges (queue
+depths). Everything is recorded in the global METRICS registry, which can be
+read in-process with snapshot(), logged periodically with MetricsReporter or
+scraped in Prometheus text format with serve_metrics(). When disabled, every
+hook returns after a single flag check.
+"""
+
+# upper bounds of the histogram buckets, in milliseconds
+BUCKETS_MS: tuple = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, float("inf"))
+NULL_STAGE = nullcontext()
+
+
+class Histogram:
+    def __init__(self, window: int = 512) -> None:
+        self.buckets: list = [0] * len(BUCKETS_MS)
+        self.count: int = 0
+        self.sum: float = 0.0
+        # recent samples for the rolling percentiles
+        self.recent: deque = deque(maxlen=window)
+
+    def observe(self, ms: float) -> None:
+        self.buckets[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum += ms
+        self.recent.append(ms)
+
+    def summary(self) -> dict:
+        recent = sorted(self.recent)
+        pick = lambda q: round(recent[min(len(recent) - 1, int(q * len(recent)))], 3) if recent else None
+        return {"count": self.count, "p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99)}
+
+
+class _Stage:
+    __slots__ = ("metrics", "name", "camera", "start")
+
+    def __init__(self, metrics: "Metrics", name: str, camera) -> None:
+        self.metrics = metrics
+        self.name = name
+        self.camera = camera
+
+    def __enter__(self) -> "_Stage":
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.metrics.observe(self.name, time.monotonic() - self.start, self.camera)
+
+
+class Metrics:
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.histograms: dict = {}
+        self.counters: dict = {}
+        self.gauges: dict = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float, camera=None) -> None:
+        if not self.enabled:
+            return
+        key = (name, camera)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds * 1000.0)
+
+    def increment(self, name: str, value: int = 1, camera=None) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[(name, camera)] = self.counters.get((name, camera), 0) + value
+
+    def set_gauge(self, name: str, value: float, camera=None) -> None:
+        if self.enabled:
+            self.gauges[(name, camera)] = value
+
+    def stage(self, name: str, camera=None):
+        # with METRICS.stage("detect", camera): ...
+        return _Stage(self, name, camera) if self.enabled else NULL_STAGE
+
+    def snapshot(self) -> dict:
+        label = lambda key: key[0] if key[1] is None else "{}[{}]".format(*key)
+        with self._lock:
+            return {
+                "latency": {label(key): histogram.summary() for key, histogram in self.histograms.items()},
+                "counters": {label(key): value for key, value in self.counters.items()},
+                "gauges": {label(key): value for key, value in self.gauges.items()},
+            }
+
+    def prometheus(self) -> str:
+        def labels(camera, extra: str = "") -> str:
+            parts = ['camera="{}"'.format(camera)] if camera is not None else []
+            parts += [extra] if extra else []
+            return "{" + ",".join(parts) + "}" if parts else ""
+
+        lines = []
+        with self._lock:
+            for (name, camera), histogram in sorted(self.histograms.items(), key=str):
+                metric = "vision_{}_ms".format(name)
+                cumulative = 0
+                for bound, count in zip(BUCKETS_MS, histogram.buckets):
+                    cumulative += count
+                    le = 'le="{}"'.format("+Inf" if bound == float("inf") else bound)
+                    lines.append("{}_bucket{} {}".format(metric, labels(camera, le), cumulative))
+                lines.append("{}_sum{} {:.3f}".format(metric, labels(camera), histogram.sum))
+                lines.append("{}_count{} {}".format(metric, labels(camera), histogram.count))
+            for (name, camera), value in sorted(self.counters.items(), key=str):
+                lines.append("vision_{}_total{} {}".format(name, labels(camera), value))
+            for (name, camera), value in sorted(self.gauges.items(), key=str):
+                lines.append("vision_{}{} {}".format(name, labels(camera), value))
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+
+METRICS = Metrics()
+
+
+def timed(name: str):
+    # decorator version of METRICS.stage for methods of the engine
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not METRICS.enabled:
+                return function(*args, **kwargs)
+            start = time.monotonic()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                METRICS.observe(name, time.monotonic() - start)
+        return wrapper
+    return decorator
+
+
+class MetricsReporter(threading.Thread):
+    def __init__(self, interval: float = 5.0, metrics: Metrics = METRICS) -> None:
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.metrics = metrics
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            print("[METRICS] {}".format(format_snapshot(self.metrics.snapshot())))
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+
+def format_snapshot(snapshot: dict) -> str:
+    parts = ["{} p50={} p95={}".format(name, stats["p50_ms"], stats["p95_ms"])
+             for name, stats in sorted(snapshot["latency"].items())]
+    parts += ["{}={}".format(name, value) for name, value in sorted(snapshot["counters"].items())]
+    parts += ["{}={}".format(name, value) for name, value in sorted(snapshot["gauges"].items())]
+    return " | ".join(parts)
+
+
+def serve_metrics(port: int = 9105, host: str = "127.0.0.1", metrics: Metrics = METRICS) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
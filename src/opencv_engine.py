@@ -2,14 +2,467 @@ import cv2 as cv
 import numpy as np
 import imutils
 import warnings 
+import heapq
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field, replace
 from pyzbar import pyzbar
 from src.config import *
+from src.rendering import draw_markers, draw_barcodes
+from src.metrics import METRICS, timed
+from src.capture import ReconnectingCapture, is_network_source
+from src.aruco_profile import aruco_dictionary, detector_parameters, load_profile
 
 warnings.filterwarnings('ignore') 
 
 ARUCO_TYPE: int = cv.aruco.DICT_ARUCO_ORIGINAL
 FLIP: bool = False
 
+
+@dataclass
+class Frame:
+    image: np.ndarray
+    seq: int
+    timestamp: float
+
+
+class FrameGrabber:
+    """
+    Owns a capture source on a dedicated thread and keeps only the newest
+    decoded frames, so consumers never read stale frames queued inside the
+    OpenCV/FFmpeg buffers. `source` may be a camera port, an URL, a video
+    file or any object exposing a VideoCapture-like `read()` (useful to
+    feed synthetic frames). URLs are read through a ReconnectingCapture.
+    Video files and synthetic sources finish after `max_failures` failed
+    reads in a row; a camera port is reopened with backoff instead.
+    `buffer_size` is the number of frames the capture backend may queue
+    (CAP_PROP_BUFFERSIZE) and of frames kept for recent().
+    """
+    def __init__(self, source, config: int = cv.CAP_ANY, buffer_size: int = 1,
+                 pace_fps: float | None = None, max_failures: int = 30) -> None:
+        self.source = source
+        self.config = config
+        self.buffer_size = max(1, buffer_size)
+        self.live: bool = isinstance(source, int) or (isinstance(source, str) and source.startswith("/dev/"))
+        if hasattr(source, "read"):
+            self.capture = source
+        elif is_network_source(source):
+            self.capture = ReconnectingCapture(source, config, buffer_size=self.buffer_size)
+        else:
+            self.capture = self._open_local()
+
+        # Ring buffer with drop-oldest semantics
+        self.frames: deque = deque(maxlen=self.buffer_size)
+        self.pace_fps = pace_fps
+        self.max_failures = max_failures
+        self.seq: int = 0
+        self.finished: bool = False
+        self.state: str = "streaming"
+        self.reconnects: int = 0
+        self.errors: int = 0
+        self.last_error: str | None = None
+        self.last_read_seq: int = 0
+        # camera label of the metrics, set by the pipeline
+        self._label = None
+        
+        self._running: bool = True
+        self._stopped = threading.Event()
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._grab_loop, daemon=True)
+        self._thread.start()
+        
+    def _open_local(self) -> cv.VideoCapture:
+        capture = cv.VideoCapture(self.source, self.config)
+        capture.set(cv.CAP_PROP_BUFFERSIZE, self.buffer_size)
+        return capture
+    
+    def _reopen(self, attempt: int) -> None:
+        # a camera port that stopped answering (unplugged, USB reset...): 0.5, 1, 2... up to 30 s apart
+        self.state = "reconnecting"
+        print("[WARN] Camera {}: no frames from {}, reopening".format(self.label, self.source))
+        if self._stopped.wait(min(30.0, 0.5 * 2 ** min(attempt, 16))):
+            return
+        self.capture.release()
+        self.capture = self._open_local()
+        self.reconnects += 1
+        METRICS.increment("reconnects", camera=self.label)
+    
+    def _grab_loop(self) -> None:
+        try:
+            self._grab_frames()
+        except Exception as error:
+            self.last_error = repr(error)
+            print("[ERROR] Camera {}: capture thread stopped: {!r}".format(self.label, error))
+        finally:
+            # however the loop ends, waiting consumers see a finished source
+            with self._cond:
+                self.finished = True
+                self._cond.notify_all()
+    
+    def _read(self) -> tuple:
+        # an exception of the backend counts as a failed read
+        try:
+            return self.capture.read()
+        except Exception as error:
+            self.errors += 1
+            self.last_error = repr(error)
+            METRICS.increment("capture_errors", camera=self.label)
+            if self.errors == 1 or self.errors % 100 == 0:
+                print("[ERROR] Camera {} ({} capture errors): {!r}".format(self.label, self.errors, error))
+            return False, None
+    
+    def _grab_frames(self) -> None:
+        failures: int = 0
+        attempt: int = 0
+        period = 1.0 / self.pace_fps if self.pace_fps else 0.0
+        next_grab = time.monotonic()
+        
+        while self._running:
+            start = time.monotonic()
+            ret, image = self._read()
+            METRICS.observe("capture", time.monotonic() - start, self.label)
+            
+            if not ret or image is None:
+                failures += 1
+                if failures >= self.max_failures:
+                    if not self.live:
+                        break
+                    self._reopen(attempt)
+                    attempt += 1
+                    failures = 0
+                    continue
+                self._stopped.wait(0.01)
+                continue
+            failures = 0
+            attempt = 0
+            self.state = "streaming"
+            
+            with self._cond:
+                self.seq += 1
+                self.frames.append(Frame(image, self.seq, time.monotonic()))
+                self._cond.notify_all()
+            
+            # Emulate the camera rate when replaying video files
+            if period:
+                next_grab += period
+                delay = next_grab - time.monotonic()
+                if delay > 0: time.sleep(delay)
+                else: next_grab = time.monotonic()
+    
+    @property
+    def label(self):
+        return self._label
+    
+    @label.setter
+    def label(self, value) -> None:
+        self._label = value
+        if hasattr(self.capture, "label"):
+            self.capture.label = value
+    
+    def health(self) -> dict:
+        if hasattr(self.capture, "health"):
+            health = self.capture.health()
+            if self.finished:
+                health["state"] = "finished"
+            return health
+        return {"state": "finished" if self.finished else self.state, "frames": self.seq,
+                "reconnects": self.reconnects, "errors": self.errors, "last_error": self.last_error}
+    
+    def latest(self) -> Frame | None:
+        with self._cond:
+            return self.frames[-1] if self.frames else None
+        
+    def recent(self) -> list:
+        with self._cond:
+            return list(self.frames)
+    
+    def wait_frame(self, after_seq: int = 0, timeout: float | None = None) -> Frame | None:
+        # Blocks until a frame newer than `after_seq` is available
+        with self._cond:
+            self._cond.wait_for(lambda: (self.frames and self.frames[-1].seq > after_seq)
+                                or self.finished, timeout)
+            if self.frames and self.frames[-1].seq > after_seq:
+                return self.frames[-1]
+            return None
+    
+    def read(self, timeout: float | None = None) -> tuple:
+        # Drop-in replacement of cv.VideoCapture.read(): blocks until a new
+        # frame arrives, (False, None) once the source finished or after `timeout`
+        frame = self.wait_frame(self.last_read_seq, timeout)
+        if frame is None:
+            return False, None
+        self.last_read_seq = frame.seq
+        return True, frame.image
+    
+    def isOpened(self) -> bool:
+        return not self.finished
+    
+    def release(self) -> None:
+        self._running = False
+        self._stopped.set()
+        if hasattr(self.capture, "interrupt"):
+            self.capture.interrupt()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        if hasattr(self.capture, "release"):
+            self.capture.release()
+        with self._cond:
+            self.frames.clear()
+            self.finished = True
+            self._cond.notify_all()
+
+
+def open_grabber(source, config: int = cv.CAP_ANY) -> FrameGrabber:
+    # Lets several readers share the same grabber
+    if isinstance(source, FrameGrabber):
+        return source
+    return FrameGrabber(source, config)
+
+
+class ImageSource:
+    # still image as a VideoCapture-like source (LOCAL_IMAGE cameras)
+    def __init__(self, path: str) -> None:
+        self.image = cv.imread(path)
+        if self.image is None:
+            raise ValueError("Cannot read image {}".format(path))
+
+    def read(self) -> tuple:
+        return True, self.image
+
+
+def resize_to_width(img: np.ndarray, width: int | None, interpolation: int = cv.INTER_AREA) -> np.ndarray:
+    h, w = img.shape[:2]
+    if width is None or width == w:
+        return img
+    return cv.resize(img, (width, max(1, round(width*(h/w)))), interpolation=interpolation)
+
+
+class FrameContext:
+    """
+    One frame plus its derived images (resized, gray, flipped), computed on
+    first use and memoized, so the readers sharing a frame convert and
+    resize it at most once. Every reader accepts either an ndarray or a
+    FrameContext; the returned images are shared and must not be drawn on.
+    """
+    def __init__(self, image: np.ndarray) -> None:
+        self.image = image
+        self.size: tuple = (image.shape[1], image.shape[0])
+        self._cache: dict = {}
+        self._flipped: "FrameContext | None" = None
+
+    @staticmethod
+    def of(frame) -> "FrameContext":
+        return frame if isinstance(frame, FrameContext) else FrameContext(frame)
+
+    def view(self, width: int | None = None, gray: bool = False, flip: bool = False,
+             interpolation: int = cv.INTER_AREA) -> np.ndarray:
+        if width == self.size[0]:
+            width = None
+        key = (width, gray, flip, interpolation if width else None)
+        image = self._cache.get(key)
+        if image is not None:
+            return image
+
+        if flip:
+            image = cv.flip(self.view(width, gray, False, interpolation), 1)
+        elif gray:
+            # resizing an already converted frame is cheaper than converting again
+            source = self._cache.get((None, True, False, None)) if width else None
+            if source is not None:
+                image = resize_to_width(source, width, interpolation)
+            else:
+                image = self.view(width, False, False, interpolation)
+                if image.ndim == 3:
+                    image = cv.cvtColor(image, cv.COLOR_BGR2GRAY)
+        else:
+            image = resize_to_width(self.image, width, interpolation)
+        self._cache[key] = image
+        return image
+
+    def gray(self) -> np.ndarray:
+        return self.view(gray=True)
+
+    def flipped(self) -> "FrameContext":
+        # the mirrored frame as a context of its own, for readers that do not flip themselves
+        if self._flipped is None:
+            self._flipped = FrameContext(self.view(flip=True))
+        return self._flipped
+
+
+@dataclass
+class Detections:
+    # corners are (N, 4, 2) float32 in the coordinates of the detected image
+    ids: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
+    corners: np.ndarray = field(default_factory=lambda: np.empty((0, 4, 2), dtype=np.float32))
+    # (data, type, (x, y, w, h))
+    barcodes: list = field(default_factory=list)
+    # (width, height) of the image the coordinates refer to
+    size: tuple = (0, 0)
+    # pyramid level that resolved each marker, when pyramid detection is used
+    levels: np.ndarray | None = None
+    # (N, 3) marker poses, when a PoseReader estimated them
+    rvecs: np.ndarray | None = None
+    tvecs: np.ndarray | None = None
+    
+    def scaled(self, width: int, height: int) -> "Detections":
+        if not self.size[0] or (width, height) == tuple(self.size):
+            return self
+        fx, fy = width / self.size[0], height / self.size[1]
+        corners = self.corners * np.array([fx, fy], dtype=np.float32)
+        barcodes = [(data, kind, (int(x * fx), int(y * fy), int(w * fx), int(h * fy)))
+                    for (data, kind, (x, y, w, h)) in self.barcodes]
+        return replace(self, corners=corners, barcodes=barcodes, size=(width, height))
+
+
+def boxes_around(corners: np.ndarray, margin: float, width: int, height: int,
+                 shift: np.ndarray | None = None) -> list:
+    # padded bounding boxes of (N, 4, 2) quads, merged when they overlap
+    boxes = []
+    for i, quad in enumerate(corners):
+        x0, y0 = quad.min(axis=0)
+        x1, y1 = quad.max(axis=0)
+        pad = margin * max(x1 - x0, y1 - y0) + (np.abs(shift[i]).max() if shift is not None else 0)
+        boxes.append([max(0, int(x0 - pad)), max(0, int(y0 - pad)),
+                      min(width, int(x1 + pad) + 1), min(height, int(y1 + pad) + 1)])
+    
+    merged = []
+    for box in sorted(boxes):
+        for other in merged:
+            if box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]:
+                other[:] = [min(box[0], other[0]), min(box[1], other[1]),
+                            max(box[2], other[2]), max(box[3], other[3])]
+                break
+        else:
+            merged.append(box)
+    return merged
+
+
+class RatePacer:
+    """
+    Deadline based pacing. With no target FPS the pipeline is driven only by
+    frame arrival; otherwise each step is scheduled on a fixed period and the
+    missed deadlines are dropped instead of accumulated when running behind.
+    """
+    def __init__(self, target_fps: float | None = None) -> None:
+        self.period: float = 1.0 / target_fps if target_fps else 0.0
+        self.deadline: float | None = None
+        self.missed: int = 0
+        
+    def set_rate(self, target_fps: float | None) -> None:
+        # takes effect from the next step, the schedule restarts at the new period
+        self.period = 1.0 / target_fps if target_fps else 0.0
+        self.deadline = None
+        
+    def wait(self) -> None:
+        if not self.period:
+            return
+        now = time.monotonic()
+        if self.deadline is None:
+            self.deadline = now
+        
+        delay = self.deadline - now
+        if delay > 0:
+            time.sleep(delay)
+        elif -delay > self.period:
+            self.missed += int(-delay / self.period)
+            self.deadline = now
+        self.deadline += self.period
+
+
+class PipelineStats:
+    # per pipeline EMA summary; every sample is also forwarded to METRICS
+    def __init__(self, smoothing: float = 0.1, camera=None) -> None:
+        self.smoothing = smoothing
+        self.camera = camera
+        self.frames: int = 0
+        self.skipped: int = 0
+        self.fps: float = 0.0
+        self.latency: dict = {}
+        self._last_frame: float | None = None
+        
+    def record(self, stage: str, seconds: float) -> None:
+        previous = self.latency.get(stage)
+        ms = seconds * 1000.0
+        METRICS.observe(stage, seconds, self.camera)
+        self.latency[stage] = ms if previous is None else previous + self.smoothing * (ms - previous)
+        
+    def frame_done(self, skipped: int = 0) -> None:
+        now = time.monotonic()
+        self.frames += 1
+        self.skipped += skipped
+        METRICS.increment("frames", camera=self.camera)
+        if skipped:
+            METRICS.increment("frames_skipped", skipped, self.camera)
+        if self._last_frame is not None and now > self._last_frame:
+            fps = 1.0 / (now - self._last_frame)
+            self.fps = fps if self.frames == 2 else self.fps + self.smoothing * (fps - self.fps)
+        self._last_frame = now
+        
+    def snapshot(self) -> dict:
+        return {
+            "fps": round(self.fps, 2),
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "latency_ms": {stage: round(ms, 2) for stage, ms in self.latency.items()},
+        }
+
+
+class CameraPipeline:
+    """
+    Runs a detector over the frames of one source. The detector is any
+    reader exposing `process_frame(image) -> (image, Detections)`. With
+    `draw=False` only `detect_frame` runs and no display image is produced;
+    it may be switched between steps, e.g. while the camera is not on screen.
+    A `recorder` (src.recorder.ClipRecorder) sees every processed frame.
+    """
+    def __init__(self, source, detector, target_fps: float | None = None,
+                 display_width: int | None = None, config: int = cv.CAP_ANY, camera=None,
+                 draw: bool = True, recorder=None) -> None:
+        self.grabber = open_grabber(source, config)
+        if self.grabber.label is None:
+            self.grabber.label = camera
+        self.detector = detector
+        self.display_width = display_width
+        self.draw = draw
+        self.recorder = recorder
+        self.pacer = RatePacer(target_fps)
+        self.stats = PipelineStats(camera=camera)
+        self.last_seq: int = 0
+        
+    def step(self, timeout: float | None = 1.0) -> tuple | None:
+        self.pacer.wait()
+        
+        start = time.monotonic()
+        frame = self.grabber.wait_frame(self.last_seq, timeout)
+        if frame is None:
+            return None
+        grabbed = time.monotonic()
+        
+        # frames overwritten in the grabber while we were busy
+        skipped = frame.seq - self.last_seq - 1 if self.last_seq else 0
+        self.last_seq = frame.seq
+        
+        if self.draw:
+            image, detections = self.detector.process_frame(frame.image, self.display_width)
+        else:
+            image, detections = None, self.detector.detect_frame(frame.image)
+        done = time.monotonic()
+        
+        self.stats.record("wait", grabbed - start)
+        self.stats.record("detect", done - grabbed)
+        self.stats.record("frame_age", done - frame.timestamp)
+        self.stats.frame_done(skipped)
+        if self.recorder is not None:
+            self.recorder.observe(frame, detections)
+        
+        return frame, image, detections
+    
+    def release(self) -> None:
+        self.grabber.release()
+        if self.recorder is not None:
+            self.recorder.close()
+
 """
 ABSTRACTO:
 El cálculo del gradiente de Scharr es un método utilizado 
@@ -27,8 +480,8 @@ como la detección de bordes o el realce de ciertas características en la image
 """
 
 
-def detect_barcode(image) -> list:
-    gray = cv.cvtColor(image, cv.COLOR_BGR2GRAY)
+def barcode_mask(image) -> np.ndarray:
+    gray = cv.cvtColor(image, cv.COLOR_BGR2GRAY) if image.ndim == 3 else image
 
     ddepth: int = cv.cv.CV_32F if imutils.is_cv2() else cv.CV_32F
     gradX = cv.Sobel(gray, ddepth=ddepth, dx=1, dy=0, ksize=-1)
@@ -50,6 +503,116 @@ def detect_barcode(image) -> list:
     closed = cv.erode(closed, None, iterations=4)
     closed = cv.dilate(closed, None, iterations=4)
     
+    return closed
+
+
+class FrameReader:
+    """
+    Base of the readers: process_frame() detects on the source frame, then
+    draws the detections on the display image. Subclasses provide
+    detect_frame(frame), display_image(frame, width) and draw(image, detections).
+    """
+    def process_frame(self, frame, display_width: int | None = None) -> tuple:
+        frame = FrameContext.of(frame)
+        detections = self.detect_frame(frame)
+        image = self.display_image(frame, display_width)
+        image = self.draw(image, detections.scaled(image.shape[1], image.shape[0]))
+        
+        return image, detections
+
+
+class BarcodeLocalizer:
+    """
+    Stateful version of detect_barcode for video streams: the kernels are
+    built once, every step writes into buffers allocated for the stream
+    resolution, and the chain runs on a downscaled image (kernels scaled
+    accordingly) with the rects mapped back to frame coordinates.
+    """
+    def __init__(self, scale: float = 0.5, top_k: int = 1, min_area: float = 400.0) -> None:
+        self.scale = scale
+        self.top_k = top_k
+        self.min_area = min_area * scale * scale
+        
+        size = lambda n: max(1, int(round(n * scale)))
+        self.blur_size: tuple = (size(9), size(9))
+        self.close_kernel = cv.getStructuringElement(cv.MORPH_RECT, (size(21), size(7)))
+        # 4 iterations of the default 3x3 kernel in a single pass
+        self.erode_kernel = cv.getStructuringElement(cv.MORPH_RECT, (2 * size(4) + 1, 2 * size(4) + 1))
+        self.shape: tuple | None = None
+        
+    def _allocate(self, shape: tuple) -> None:
+        h, w = shape[:2]
+        self.size: tuple = (max(1, int(round(w * self.scale))), max(1, int(round(h * self.scale))))
+        sw, sh = self.size
+        self.small = np.empty((sh, sw) + tuple(shape[2:]), dtype=np.uint8)
+        self.gray = np.empty((sh, sw), dtype=np.uint8)
+        self.grad_x = np.empty((sh, sw), dtype=np.float32)
+        self.grad_y = np.empty((sh, sw), dtype=np.float32)
+        self.gradient = np.empty((sh, sw), dtype=np.uint8)
+        self.blurred = np.empty((sh, sw), dtype=np.uint8)
+        self.thresh = np.empty((sh, sw), dtype=np.uint8)
+        self.closed = np.empty((sh, sw), dtype=np.uint8)
+        self.shape = shape
+        
+    def mask(self, image: np.ndarray) -> np.ndarray:
+        if image.shape != self.shape:
+            self._allocate(image.shape)
+        
+        small = image
+        if self.size != (image.shape[1], image.shape[0]):
+            small = cv.resize(image, self.size, dst=self.small, interpolation=cv.INTER_AREA)
+        gray = small
+        if small.ndim == 3:
+            gray = cv.cvtColor(small, cv.COLOR_BGR2GRAY, dst=self.gray)
+        
+        cv.Sobel(gray, cv.CV_32F, 1, 0, dst=self.grad_x, ksize=-1)
+        cv.Sobel(gray, cv.CV_32F, 0, 1, dst=self.grad_y, ksize=-1)
+        cv.subtract(self.grad_x, self.grad_y, dst=self.grad_x)
+        cv.convertScaleAbs(self.grad_x, dst=self.gradient)
+        
+        cv.blur(self.gradient, self.blur_size, dst=self.blurred)
+        cv.threshold(self.blurred, 225, 255, cv.THRESH_BINARY, dst=self.thresh)
+        cv.morphologyEx(self.thresh, cv.MORPH_CLOSE, self.close_kernel, dst=self.closed)
+        cv.erode(self.closed, self.erode_kernel, dst=self.thresh)
+        cv.dilate(self.thresh, self.erode_kernel, dst=self.closed)
+        
+        return self.closed
+    
+    @timed("barcode_localize")
+    def locate(self, image: np.ndarray) -> list:
+        # rotated rects ((cx, cy), (w, h), angle) in frame coordinates, largest first
+        cnts = cv.findContours(self.mask(image), cv.RETR_EXTERNAL, cv.CHAIN_APPROX_SIMPLE)
+        cnts = imutils.grab_contours(cnts)
+        if len(cnts) == 0:
+            return []
+        
+        if self.top_k == 1:
+            largest = [max(cnts, key=cv.contourArea)]
+        else:
+            largest = heapq.nlargest(self.top_k, cnts, key=cv.contourArea)
+        
+        fx = image.shape[1] / self.size[0]
+        fy = image.shape[0] / self.size[1]
+        rects = []
+        for c in largest:
+            if cv.contourArea(c) < self.min_area:
+                break
+            (cx, cy), (w, h), angle = cv.minAreaRect(c)
+            rects.append(((cx * fx, cy * fy), (w * fx, h * fy), angle))
+        return rects
+    
+    def box(self, image: np.ndarray) -> np.ndarray | None:
+        # largest box like detect_barcode, but None when even that contour is
+        # under min_area (detect_barcode returns it however small it is)
+        rects = self.locate(image)
+        if not rects:
+            return None
+        return np.intp(cv.boxPoints(rects[0]))
+
+
+def detect_barcode(image) -> list:
+    closed = barcode_mask(image)
+    
     # find the contours in the thresholded image
     cnts = cv.findContours(closed.copy(), cv.RETR_EXTERNAL,
        cv.CHAIN_APPROX_SIMPLE)
@@ -64,14 +627,15 @@ def detect_barcode(image) -> list:
     c = sorted(cnts, key=cv.contourArea, reverse=True)[0]
     rect = cv.minAreaRect(c)
     box = cv.cv.BoxPoints(rect) if imutils.is_cv2() else cv.boxPoints(rect)
-    box = np.int0(box)
+    box = np.intp(box)
     # return the bounding box of the barcode
     return box
 
 
 class BarcodeReader:
     def __init__(self, camera_port: str | int, config: int = cv.CAP_FFMPEG) -> None:
-        self.image_buffer = cv.VideoCapture(camera_port, config)
+        self.image_buffer = open_grabber(camera_port, config)
+        self.localizer = BarcodeLocalizer()
             
     def process_buffer(self, run_on_loop: bool = False) -> None:
         while True:
@@ -80,9 +644,11 @@ class BarcodeReader:
             # video
             if frame is None:
                 break
+            # the grabber may share this frame with other readers
+            frame = frame.copy()
             
             # detect the barcode in the image
-            box = detect_barcode(frame)
+            box = self.localizer.box(frame)
             
             # if a barcode was found, draw a bounding box on the frame
             if box is not None:
@@ -97,72 +663,67 @@ class BarcodeReader:
                 break
             if not run_on_loop: break
             
-class BarcodeReaderPyZbar:
-    def __init__(self, camera_port: str | int, config: int = cv.CAP_FFMPEG) -> None:
-        self.image_buffer = cv.VideoCapture(camera_port, config)
+class BarcodeReaderPyZbar(FrameReader):
+    def __init__(self, camera_port: str | int | None, config: int = cv.CAP_FFMPEG) -> None:
+        self.image_buffer = open_grabber(camera_port, config) if camera_port is not None else None
 
         self.last_type_detected: str = ""
         self.last_code_detected: str = ""
         
         self.num_frames: int = 60
         
-    def process_buffer(self) -> tuple[np.ndarray, str, str]:
-        _, frame = self.image_buffer.read()
-
-        barcodes = pyzbar.decode(frame)
+    @timed("pyzbar_detect")
+    def detect(self, frame) -> Detections:
+        # pyzbar would otherwise keep only the blue channel of a BGR frame
+        context = FrameContext.of(frame)
+        barcodes = pyzbar.decode(context.gray())
+        detections = Detections(size=context.size)
         
         for barcode in barcodes:
-            # extract the bounding box location of the barcode and draw the
-            # bounding box surrounding the barcode on the image
-            (x, y, w, h) = barcode.rect
-            cv.rectangle(frame, (x, y), (x + w, y + h), (0, 0, 255), 2)
-            
             # the barcode data is a bytes object so if we want to draw it on
             # our output image we need to convert it to a string first
             barcodeData = barcode.data.decode("utf-8")
             barcodeType = barcode.type
+            detections.barcodes.append((barcodeData, barcodeType, tuple(barcode.rect)))
             
-            # draw the barcode data and barcode type on the image
-            text = "{} ({})".format(barcodeData, barcodeType)
-            cv.putText(frame, text, (x, y - 10), cv.FONT_HERSHEY_SIMPLEX,
-                0.5, (0, 0, 255), 2)
-            
-            print("[INFO] Found {} barcode: {}".format(barcodeType, barcodeData))
             if barcodeData != self.last_code_detected:
+                print("[INFO] Found {} barcode: {}".format(barcodeType, barcodeData))
                 self.last_code_detected = barcodeData
+                self.last_type_detected = barcodeType
+        
+        return detections
+    
+    @timed("barcode_draw")
+    def draw(self, frame: np.ndarray, detections: Detections) -> np.ndarray:
+        return draw_barcodes(frame, detections.barcodes)
+    
+    def detect_frame(self, frame) -> Detections:
+        return self.detect(frame)
+    
+    @timed("display_resize")
+    def display_image(self, frame, width: int | None = None) -> np.ndarray:
+        # the frame and its views are shared, draw on a copy
+        return FrameContext.of(frame).view(width).copy()
+    
+    def process_buffer(self) -> tuple[np.ndarray, str, str]:
+        ret, frame = self.image_buffer.read()
+        if not ret:
+            return None, self.last_code_detected, self.last_type_detected
+
+        frame, _ = self.process_frame(frame)
         
         cv.putText(frame, str(cv.CAP_PROP_FPS), (30, 30), cv.FONT_HERSHEY_SIMPLEX,
                 0.5, (0, 0, 255), 2)
         
-        # show the frame and record if the user presses a key
-        
         return frame, self.last_code_detected, self.last_type_detected
     
     def run_on_loop(self) -> None:
         while True:
-            _, frame = self.image_buffer.read()
+            ret, frame = self.image_buffer.read()
+            if not ret:
+                break
 
-            barcodes = pyzbar.decode(frame)
-            
-            for barcode in barcodes:
-                # extract the bounding box location of the barcode and draw the
-                # bounding box surrounding the barcode on the image
-                (x, y, w, h) = barcode.rect
-                cv.rectangle(frame, (x, y), (x + w, y + h), (0, 0, 255), 2)
-                
-                # the barcode data is a bytes object so if we want to draw it on
-                # our output image we need to convert it to a string first
-                barcodeData = barcode.data.decode("utf-8")
-                barcodeType = barcode.type
-                
-                # draw the barcode data and barcode type on the image
-                text = "{} ({})".format(barcodeData, barcodeType)
-                cv.putText(frame, text, (x, y - 10), cv.FONT_HERSHEY_SIMPLEX,
-                    0.5, (0, 0, 255), 2)
-                
-                if barcodeData != self.last_code_detected:
-                    print("[INFO] Found {} barcode: {}".format(barcodeType, barcodeData))
-                    self.last_code_detected = barcodeData
+            frame, _ = self.process_frame(frame)
             
             cv.putText(frame, str(cv.CAP_PROP_FPS), (30, 30), cv.FONT_HERSHEY_SIMPLEX,
                     0.5, (0, 0, 255), 2)
@@ -175,62 +736,421 @@ class BarcodeReaderPyZbar:
                 break
         cv.destroyAllWindows()
         
-class ArucoReader:
-    def __init__(self, camera_port: str | int, config: int = cv.CAP_FFMPEG) -> None:
+def deskew_crop(image: np.ndarray, rect: tuple, pad: float = 0.25) -> tuple:
+    # Warps the rotated rect (plus a quiet zone) into an upright crop and
+    # returns it with the affine transform from crop to image coordinates
+    (cx, cy), (w, h), angle = rect
+    w, h = w + pad * w + 20, h + pad * h + 20
+    matrix = cv.getRotationMatrix2D((cx, cy), angle, 1.0)
+    matrix[:, 2] += (w / 2 - cx, h / 2 - cy)
+    crop = cv.warpAffine(image, matrix, (int(w), int(h)), flags=cv.INTER_LINEAR,
+                         borderMode=cv.BORDER_REPLICATE)
+    return crop, cv.invertAffineTransform(matrix)
+
+
+class BarcodeReaderTwoStage(BarcodeReaderPyZbar):
+    """
+    Localizes barcode candidates with the cheap gradient detector, decodes
+    only the deskewed crops with pyzbar and falls back to a full-frame
+    decode when no candidate could be read.
+    """
+    def __init__(self, camera_port: str | int | None, config: int = cv.CAP_FFMPEG,
+                 top_k: int = 3, fallback: bool = True, scale: float = 0.5) -> None:
+        super().__init__(camera_port, config)
+        self.localizer = BarcodeLocalizer(scale, top_k)
+        self.fallback = fallback
+        self.crop_hits: int = 0
+        self.fallbacks: int = 0
+        
+    @timed("two_stage_detect")
+    def detect(self, frame) -> Detections:
+        context = FrameContext.of(frame)
+        gray = context.gray()
+        detections = Detections(size=context.size)
+        seen = set()
+        
+        for rect in self.localizer.locate(gray):
+            crop, matrix = deskew_crop(gray, rect)
+            for barcode in pyzbar.decode(crop):
+                key = (barcode.data, barcode.type)
+                if key in seen:
+                    continue
+                seen.add(key)
+                
+                # polygon back to frame coordinates
+                polygon = np.array(barcode.polygon, dtype=np.float32).reshape(-1, 1, 2)
+                polygon = cv.transform(polygon, matrix)
+                x, y, w, h = cv.boundingRect(polygon)
+                detections.barcodes.append((barcode.data.decode("utf-8"), barcode.type, (x, y, w, h)))
+        
+        if detections.barcodes:
+            self.crop_hits += 1
+        elif self.fallback:
+            self.fallbacks += 1
+            return super().detect(context)
+        
+        for (barcodeData, barcodeType, _) in detections.barcodes:
+            if barcodeData != self.last_code_detected:
+                print("[INFO] Found {} barcode: {}".format(barcodeType, barcodeData))
+                self.last_code_detected = barcodeData
+                self.last_type_detected = barcodeType
+        
+        return detections
+
+
+class MarkerTracker:
+    """
+    Keeps the last corners and velocity of every visible marker and predicts
+    where to search on the next frame. A full-frame scan is requested every
+    `full_scan_interval` frames, when nothing is tracked, or after a miss;
+    new markers entering the scene are picked up by those scans. Markers
+    lost during a full scan keep being searched at their predicted position
+    for a few frames, so a single bad frame does not drop them.
+    """
+    def __init__(self, full_scan_interval: int = 10, margin: float = 0.5, max_coast: int = 5) -> None:
+        self.full_scan_interval = full_scan_interval
+        self.margin = margin
+        self.max_coast = max_coast
+        # id -> (corners, velocity, frames since last seen)
+        self.tracks: dict = {}
+        self.frames_since_scan: int = 0
+        
+    def needs_full_scan(self) -> bool:
+        return not self.tracks or self.frames_since_scan >= self.full_scan_interval
+    
+    def rois(self, width: int, height: int) -> list:
+        if not self.tracks:
+            return []
+        corners = np.array([track[0] for track in self.tracks.values()])
+        velocities = np.array([track[1] for track in self.tracks.values()])
+        return boxes_around(corners + velocities[:, None, :], self.margin, width, height, velocities)
+    
+    def missed(self, detections: Detections) -> bool:
+        visible = {marker_id for marker_id, (_, _, lost) in self.tracks.items() if lost == 0}
+        return not visible.issubset(detections.ids.tolist())
+    
+    def update(self, detections: Detections, full_scan: bool) -> None:
+        tracks = {}
+        for marker_id, corners in zip(detections.ids.tolist(), detections.corners):
+            velocity = np.zeros(2, dtype=np.float32)
+            if marker_id in self.tracks:
+                velocity = (corners - self.tracks[marker_id][0]).mean(axis=0)
+            tracks[marker_id] = (corners, velocity, 0)
+        
+        # coast the markers that were not found along their last velocity
+        for marker_id, (corners, velocity, lost) in self.tracks.items():
+            if marker_id not in tracks and lost < self.max_coast:
+                tracks[marker_id] = (corners + velocity, velocity, lost + 1)
+        
+        self.tracks = tracks
+        self.frames_since_scan = 0 if full_scan else self.frames_since_scan + 1
+
+
+class ArucoReader(FrameReader):
+    def __init__(self, camera_port: str | int | None, config: int = cv.CAP_FFMPEG,
+                 tracking: bool = False, full_scan_interval: int = 10,
+                 processing_width: int | None = None, interpolation: int = cv.INTER_AREA,
+                 grayscale: bool = True, pyramid: tuple | None = None, min_markers: int = 1,
+                 pyramid_crops: bool = True, refine_corners: bool = True,
+                 dictionary: int | None = None, flip: bool | None = None,
+                 profile: str | None = None) -> None:
         self.camera_port = camera_port
-        self.image_buffer = cv.VideoCapture(self.camera_port)
-        self.arucoDict = cv.aruco.getPredefinedDictionary(ARUCO_TYPE)
+        self.image_buffer = open_grabber(self.camera_port) if camera_port is not None else None
+        # None: module defaults ARUCO_TYPE / FLIP
+        self.flip = FLIP if flip is None else flip
+        self.arucoDict = cv.aruco.getPredefinedDictionary(ARUCO_TYPE if dictionary is None else dictionary)
         self.arucoParams = cv.aruco.DetectorParameters()
+        # tuned parameters (see benchmarks.tune_aruco); an explicit dictionary wins
+        self.profile = load_profile(profile) if profile else None
+        if self.profile:
+            self.arucoParams = detector_parameters(self.profile["parameters"])
+            if dictionary is None and self.profile.get("dictionary"):
+                self.arucoDict = aruco_dictionary(self.profile["dictionary"], self.profile.get("dictionary_size"))
         self.detector = cv.aruco.ArucoDetector(self.arucoDict, self.arucoParams)
+        self.tracker = MarkerTracker(full_scan_interval) if tracking else None
+        # None detects at the native resolution of the source
+        self.processing_width = processing_width
+        self.interpolation = interpolation
+        self.grayscale = grayscale
+        # widths from coarse to fine, None being the native resolution
+        self.pyramid = pyramid
+        self.min_markers = min_markers
+        self.pyramid_crops = pyramid_crops
+        self.refine_corners = refine_corners
         
+    @property
+    def stateful(self) -> bool:
+        # the tracker needs every frame of its camera, in order (see DetectionPool)
+        return self.tracker is not None
+    
     def aruco_display(self, corners, ids, rejected, image):
-        if len(corners) > 0: 
-            ids = ids.flatten()
+        return draw_markers(image, corners, ids)
+    
+    @timed("aruco_prepare")
+    def prepare(self, frame, width: int | None = None) -> np.ndarray:
+        # detectMarkers converts BGR input itself, a shared gray view is reused
+        return FrameContext.of(frame).view(width or self.processing_width, self.grayscale,
+                                           self.flip, self.interpolation)
+    
+    def detect_full(self, img: np.ndarray) -> Detections:
+        corners, ids, rejected = self.detector.detectMarkers(img)
+        
+        size = (img.shape[1], img.shape[0])
+        if ids is None:
+            return Detections(size=size)
+        return Detections(ids.flatten().astype(np.int32),
+                          np.asarray(corners, dtype=np.float32).reshape(-1, 4, 2), size=size)
+    
+    def detect_rois(self, img: np.ndarray, rois: list) -> Detections:
+        all_ids, all_corners = [], []
+        for (x0, y0, x1, y1) in rois:
+            corners, ids, rejected = self.detector.detectMarkers(img[y0:y1, x0:x1])
+            if ids is None:
+                continue
+            all_ids.append(ids.flatten().astype(np.int32))
+            all_corners.append(np.asarray(corners, dtype=np.float32).reshape(-1, 4, 2)
+                               + np.array([x0, y0], dtype=np.float32))
+        
+        size = (img.shape[1], img.shape[0])
+        if not all_ids:
+            return Detections(size=size)
+        return Detections(np.concatenate(all_ids), np.concatenate(all_corners), size=size)
+    
+    @timed("aruco_detect")
+    def detect(self, img: np.ndarray) -> Detections:
+        if self.tracker is None:
+            return self.detect_full(img)
+        
+        if not self.tracker.needs_full_scan():
+            detections = self.detect_rois(img, self.tracker.rois(img.shape[1], img.shape[0]))
+            if not self.tracker.missed(detections):
+                self.tracker.update(detections, full_scan=False)
+                return detections
+        
+        detections = self.detect_full(img)
+        self.tracker.update(detections, full_scan=True)
+        return detections
+    
+    @timed("aruco_draw")
+    def draw(self, img: np.ndarray, detections: Detections) -> np.ndarray:
+        return self.aruco_display(detections.corners, detections.ids, None, img)
+    
+    @timed("aruco_pyramid")
+    def detect_pyramid(self, frame) -> Detections:
+        # Coarse levels first; escalate only while fewer than `min_markers`
+        # are found. Candidates rejected on a level are searched first as
+        # crops of the next one, before scanning that level entirely.
+        frame = FrameContext.of(frame)
+        w, h = frame.size
+        found: dict = {}
+        candidates = np.empty((0, 4, 2), dtype=np.float32)
+        
+        for level, width in enumerate(self.pyramid):
+            width = width or w
+            img = self.prepare(frame, width)
+            scale = np.array([img.shape[1] / w, img.shape[0] / h], dtype=np.float32)
             
-            for (markerCorner, markerID) in zip(corners, ids):
-                
-                corners = markerCorner.reshape((4, 2))
-                (topLeft, topRight, bottomRight, bottomLeft) = corners
-                
-                topRight = (int(topRight[0]), int(topRight[1]))
-                bottomRight = (int(bottomRight[0]), int(bottomRight[1]))
-                bottomLeft = (int(bottomLeft[0]), int(bottomLeft[1]))
-                topLeft = (int(topLeft[0]), int(topLeft[1]))
-
-                cv.line(image, topLeft, topRight, (0, 255, 0), 2)
-                cv.line(image, topRight, bottomRight, (0, 255, 0), 2)
-                cv.line(image, bottomRight, bottomLeft, (0, 255, 0), 2)
-                cv.line(image, bottomLeft, topLeft, (0, 255, 0), 2)
-                
-                cX = int((topLeft[0] + bottomRight[0]) / 2.0)
-                cY = int((topLeft[1] + bottomRight[1]) / 2.0)
-                cv.circle(image, (cX, cY), 4, (0, 0, 255), -1)
-                
-                cv.putText(image, str(markerID),(topLeft[0], topLeft[1] - 10), cv.FONT_HERSHEY_SIMPLEX,
-                    0.5, (0, 255, 0), 2)
-                #print("[Inference] ArUco marker ID: {}".format(markerID))
-
-        return image
+            results = []
+            if len(candidates) and self.pyramid_crops:
+                rois = boxes_around(candidates * scale, 0.5, img.shape[1], img.shape[0])
+                results.append(self.detect_rois(img, rois))
+            if not results or len(found) + len(results[0].ids) < self.min_markers:
+                corners, ids, rejected = self.detector.detectMarkers(img)
+                if ids is not None:
+                    results.append(Detections(ids.flatten().astype(np.int32),
+                                              np.asarray(corners, dtype=np.float32).reshape(-1, 4, 2)))
+                candidates = np.asarray(rejected, dtype=np.float32).reshape(-1, 4, 2) / scale
+            
+            for detections in results:
+                for marker_id, corners in zip(detections.ids.tolist(), detections.corners):
+                    if marker_id not in found:
+                        found[marker_id] = (corners / scale, level, width)
+            if len(found) >= self.min_markers:
+                break
+        
+        if not found:
+            return Detections(size=(w, h))
+        ids = np.array(list(found), dtype=np.int32)
+        corners = np.array([item[0] for item in found.values()], dtype=np.float32)
+        levels = np.array([item[1] for item in found.values()], dtype=np.int8)
+        
+        # corners from coarse levels are refined on the full resolution image
+        coarse = np.array([item[2] < w for item in found.values()])
+        if self.refine_corners and coarse.any():
+            gray = frame.view(gray=True, flip=self.flip)
+            window = max(2, int(w / min(item[2] for item in found.values())))
+            points = np.ascontiguousarray(corners[coarse].reshape(-1, 1, 2))
+            criteria = (cv.TERM_CRITERIA_EPS + cv.TERM_CRITERIA_MAX_ITER, 30, 0.01)
+            cv.cornerSubPix(gray, points, (window, window), (-1, -1), criteria)
+            corners[coarse] = points.reshape(-1, 4, 2)
+        
+        return Detections(ids, corners, size=(w, h), levels=levels)
+    
+    def detect_frame(self, frame) -> Detections:
+        if self.pyramid:
+            return self.detect_pyramid(frame)
+        # corners are mapped back to the (flipped) source resolution
+        frame = FrameContext.of(frame)
+        detections = self.detect(self.prepare(frame))
+        return detections.scaled(*frame.size)
+    
+    @timed("display_resize")
+    def display_image(self, frame, width: int | None = None) -> np.ndarray:
+        # the frame and its views are shared, draw on a copy
+        return FrameContext.of(frame).view(width, flip=self.flip).copy()
     
     def aruco_proccesor(self) -> tuple:
         ret, img = self.image_buffer.read()
+        if not ret:
+            # stream finished
+            return None, None
 
-        h, w, _ = img.shape
-
-        width = 1000
-        height = int(width*(h/w))
-        img = cv.resize(img, (width, height), interpolation=cv.INTER_CUBIC)
-        if FLIP: img = cv.flip(img, 1)
-        
-        corners, ids, rejected = self.detector.detectMarkers(img)
-
-        detected_markers = self.aruco_display(corners, ids, rejected, img)
+        detected_markers, detections = self.process_frame(img)
+        ids = detections.ids.reshape(-1, 1) if len(detections.ids) else None
         
         return detected_markers, ids
-  
+
+
+class ChangeGate:
+    """
+    Decides whether a frame differs enough from the last analysed one to be
+    worth a new detection. The signature is a tiny gray thumbnail; the score
+    is the largest change of any of its cells, so a marker entering a corner
+    is not averaged away by the rest of a static scene.
+    """
+    def __init__(self, threshold: float = 8.0, size: tuple = (32, 24),
+                 max_age: float | None = 2.0, refresh_interval: int | None = 30) -> None:
+        self.threshold = threshold
+        self.size = size
+        # seconds / frames after which a detection is forced anyway
+        self.max_age = max_age
+        self.refresh_interval = refresh_interval
+        self.reference: np.ndarray | None = None
+        self.reference_time: float = 0.0
+        self.reused: int = 0
+        self.score: float = 0.0
+
+    def signature(self, frame) -> np.ndarray:
+        image = frame.image if isinstance(frame, FrameContext) else frame
+        small = cv.resize(image, self.size, interpolation=cv.INTER_AREA)
+        if small.ndim == 3:
+            small = cv.cvtColor(small, cv.COLOR_BGR2GRAY)
+        return small
+
+    def check(self, frame, now: float | None = None) -> tuple:
+        # (changed, signature); store the signature with accept() after detecting
+        now = time.monotonic() if now is None else now
+        signature = self.signature(frame)
+        if self.reference is None or self.reference.shape != signature.shape:
+            return True, signature
+        if self.max_age is not None and now - self.reference_time >= self.max_age:
+            return True, signature
+        if self.refresh_interval is not None and self.reused >= self.refresh_interval:
+            return True, signature
+        self.score = float(cv.absdiff(signature, self.reference).max())
+        return self.score > self.threshold, signature
+
+    def accept(self, signature: np.ndarray, now: float | None = None) -> None:
+        self.reference = signature
+        self.reference_time = time.monotonic() if now is None else now
+        self.reused = 0
+
+
+class CachedReader(FrameReader):
+    """
+    Wraps a reader and reuses its last detections while the scene does not
+    change (see ChangeGate). Same interface as the wrapped reader; `reader`
+    is its class or a partial, built with `camera_port` so the wrapper can
+    also be used as detector class of a DetectionPool.
+    """
+    def __init__(self, camera_port: str | int | None, reader=None, threshold: float = 8.0,
+                 max_age: float | None = 2.0, refresh_interval: int | None = 30) -> None:
+        self.reader = (reader or ArucoReader)(camera_port)
+        self.gate = ChangeGate(threshold, max_age=max_age, refresh_interval=refresh_interval)
+        self.cached: Detections | None = None
+        self.hits: int = 0
+        self.misses: int = 0
+
+    @property
+    def stateful(self) -> bool:
+        # the reference frame and the cached detections belong to one camera
+        return True
+
+    def detect_frame(self, frame) -> Detections:
+        frame = FrameContext.of(frame)
+        changed, signature = self.gate.check(frame)
+        if not changed and self.cached is not None:
+            self.hits += 1
+            self.gate.reused += 1
+            METRICS.increment("cache_hit")
+            return self.cached
+
+        self.misses += 1
+        METRICS.increment("cache_miss")
+        self.cached = self.reader.detect_frame(frame)
+        self.gate.accept(signature)
+        return self.cached
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def display_image(self, frame, width: int | None = None) -> np.ndarray:
+        return self.reader.display_image(frame, width)
+
+    def draw(self, frame: np.ndarray, detections: Detections) -> np.ndarray:
+        return self.reader.draw(frame, detections)
+
+
+class ReaderChain(FrameReader):
+    """
+    Runs several readers on the same frame (e.g. ArUco and barcodes) and
+    merges their detections. Display preprocessing is done by the first one.
+    With `flip` the frame is mirrored once for every reader, so the readers
+    themselves must not flip.
+    """
+    def __init__(self, camera_port: str | int | None, readers: list, flip: bool | None = None) -> None:
+        self.readers: list = [reader(camera_port) for reader in readers]
+        self.flip = FLIP if flip is None else flip
+
+    def oriented(self, frame) -> FrameContext:
+        frame = FrameContext.of(frame)
+        return frame.flipped() if self.flip else frame
+
+    @property
+    def stateful(self) -> bool:
+        return any(getattr(reader, "stateful", False) for reader in self.readers)
+
+    def detect_frame(self, frame) -> Detections:
+        # one context, so the readers share their gray and resized views
+        frame = self.oriented(frame)
+        results = [reader.detect_frame(frame) for reader in self.readers]
+        merged = Detections(size=frame.size)
+        for detections in results:
+            merged.barcodes.extend(detections.barcodes)
+        found = [detections for detections in results if len(detections.ids)]
+        if found:
+            merged.ids = np.concatenate([detections.ids for detections in found])
+            merged.corners = np.concatenate([detections.corners for detections in found])
+            if all(detections.rvecs is not None for detections in found):
+                merged.rvecs = np.concatenate([detections.rvecs for detections in found])
+                merged.tvecs = np.concatenate([detections.tvecs for detections in found])
+        return merged
+
+    def display_image(self, frame, width: int | None = None) -> np.ndarray:
+        return self.readers[0].display_image(self.oriented(frame), width)
+
+    def draw(self, frame: np.ndarray, detections: Detections) -> np.ndarray:
+        for reader in self.readers:
+            frame = reader.draw(frame, detections)
+        return frame
+
 if __name__ == '__main__':
     dector = ArucoReader(0)
     
-    cv.imshow("Image", dector.aruco_proccesor()[0])
+    image, _ = dector.aruco_proccesor()
+    if image is not None:
+        cv.imshow("Image", image)
 
-    key = cv.waitKey(1) & 0xFF
\ No newline at end of file
+    key = cv.waitKey(1) & 0xFF
+    dector.image_buffer.release()
\ No newline at end of file
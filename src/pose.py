@@ -0,0 +1,322 @@
+import json
+from dataclasses import dataclass, field, replace
+import cv2 as cv
+import numpy as np
+from src.opencv_engine import ArucoReader, Detections, FrameContext, FrameReader, timed
+
+"""
+Marker pose on top of the detectors. The calibration of a camera is loaded
+once and rescaled to whatever resolution the corners refer to. Only the
+corner points are undistorted, with one cv.undistortPoints call per frame,
+so the solver sees an ideal pinhole camera. Poses come from IPPE_SQUARE
+per marker or, for crowded frames, from a batched solver: closed-form
+square homographies decomposed and refined with NumPy, every marker at
+once. Frames are remapped (with cached initUndistortRectifyMap tables)
+only for lenses distorted enough to hurt the detection itself.
+
+rvecs / tvecs are (N, 3) float32 arrays in the marker order of the
+detections, tvecs in the unit of `marker_length`.
+"""
+
+
+@dataclass
+class Calibration:
+    camera_matrix: np.ndarray
+    dist_coeffs: np.ndarray
+    # (width, height) of the calibration images
+    size: tuple
+    rms: float | None = None
+    _scaled: dict = field(default_factory=dict, init=False, repr=False, compare=False)
+    _maps: dict = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    @classmethod
+    def load(cls, path: str) -> "Calibration":
+        with open(path) as calibration_file:
+            data = json.load(calibration_file)
+        return cls(np.array(data["camera_matrix"], dtype=np.float64),
+                   np.array(data["dist_coeffs"], dtype=np.float64).ravel(),
+                   tuple(data["size"]), data.get("rms"))
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as calibration_file:
+            json.dump({"size": list(self.size), "camera_matrix": self.camera_matrix.tolist(),
+                       "dist_coeffs": self.dist_coeffs.ravel().tolist(), "rms": self.rms},
+                      calibration_file, indent=4)
+
+    def scaled(self, size: tuple) -> "Calibration":
+        # same lens at another resolution; distortion works on normalized
+        # coordinates and does not change
+        size = tuple(size)
+        if size == tuple(self.size):
+            return self
+        if size not in self._scaled:
+            fx, fy = size[0] / self.size[0], size[1] / self.size[1]
+            matrix = self.camera_matrix * np.array([[fx], [fy], [1.0]])
+            self._scaled[size] = Calibration(matrix, self.dist_coeffs, size, self.rms)
+        return self._scaled[size]
+
+    def maps(self, size: tuple) -> tuple:
+        # remap tables and the camera matrix of the undistorted image, per size
+        size = tuple(size)
+        if size not in self._maps:
+            calibration = self.scaled(size)
+            matrix, _ = cv.getOptimalNewCameraMatrix(calibration.camera_matrix, calibration.dist_coeffs,
+                                                     size, 0.0, size)
+            map_x, map_y = cv.initUndistortRectifyMap(calibration.camera_matrix, calibration.dist_coeffs,
+                                                      None, matrix, size, cv.CV_16SC2)
+            self._maps[size] = (map_x, map_y, matrix)
+        return self._maps[size]
+
+    def undistort(self, image: np.ndarray) -> np.ndarray:
+        map_x, map_y, _ = self.maps((image.shape[1], image.shape[0]))
+        return cv.remap(image, map_x, map_y, cv.INTER_LINEAR)
+
+    def rectified(self) -> "Calibration":
+        # pinhole camera of the images returned by undistort()
+        _, _, matrix = self.maps(self.size)
+        return Calibration(matrix, np.zeros(5), self.size)
+
+    def normalize(self, corners: np.ndarray, size: tuple) -> np.ndarray:
+        # (N, 4, 2) pixel corners at `size` -> undistorted normalized coordinates
+        if not len(corners):
+            return np.empty((0, 4, 2), dtype=np.float64)
+        calibration = self.scaled(size)
+        points = cv.undistortPoints(np.ascontiguousarray(corners, dtype=np.float64).reshape(-1, 1, 2),
+                                    calibration.camera_matrix, calibration.dist_coeffs)
+        return points.reshape(-1, 4, 2)
+
+
+def object_corners(marker_length: float) -> np.ndarray:
+    # ArUco corner order, marker frame centered with Z out of the marker
+    half = marker_length / 2
+    return np.array([[-half, half, 0], [half, half, 0], [half, -half, 0], [-half, -half, 0]], dtype=np.float64)
+
+
+def square_homographies(quads: np.ndarray, marker_length: float) -> np.ndarray:
+    # (N, 4, 2) quads -> (N, 3, 3) homographies from the marker plane (X, Y),
+    # unit square to quad in closed form, then marker plane to unit square
+    x0, x1, x2, x3 = (quads[:, i, 0] for i in range(4))
+    y0, y1, y2, y3 = (quads[:, i, 1] for i in range(4))
+    dx1, dx2, sx = x1 - x2, x3 - x2, x0 - x1 + x2 - x3
+    dy1, dy2, sy = y1 - y2, y3 - y2, y0 - y1 + y2 - y3
+    det = dx1 * dy2 - dx2 * dy1
+    det = np.where(np.abs(det) < 1e-12, 1e-12, det)
+    g = (sx * dy2 - dx2 * sy) / det
+    h = (dx1 * sy - sx * dy1) / det
+
+    homographies = np.empty((len(quads), 3, 3))
+    homographies[:, 0] = np.stack([x1 - x0 + g * x1, x3 - x0 + h * x3, x0], axis=1)
+    homographies[:, 1] = np.stack([y1 - y0 + g * y1, y3 - y0 + h * y3, y0], axis=1)
+    homographies[:, 2] = np.stack([g, h, np.ones_like(g)], axis=1)
+
+    # (u, v) = (X / L + 1/2, 1/2 - Y / L)
+    plane = np.array([[1 / marker_length, 0, 0.5], [0, -1 / marker_length, 0.5], [0, 0, 1]])
+    return homographies @ plane
+
+
+def rotation_vectors(rotations: np.ndarray) -> np.ndarray:
+    # batched Rodrigues through quaternions (Shepperd), stable near 180 degrees
+    r = rotations
+    trace = r[:, 0, 0] + r[:, 1, 1] + r[:, 2, 2]
+    candidates = np.stack([trace, r[:, 0, 0], r[:, 1, 1], r[:, 2, 2]], axis=1)
+    choice = candidates.argmax(axis=1)
+    q = np.empty((len(r), 4))
+
+    for index, column in enumerate((None, 0, 1, 2)):
+        rows = choice == index
+        if not rows.any():
+            continue
+        m = r[rows]
+        if column is None:
+            s = np.sqrt(1.0 + trace[rows]) * 2
+            q[rows] = np.stack([0.25 * s, (m[:, 2, 1] - m[:, 1, 2]) / s,
+                                (m[:, 0, 2] - m[:, 2, 0]) / s, (m[:, 1, 0] - m[:, 0, 1]) / s], axis=1)
+            continue
+        i, j, k = column, (column + 1) % 3, (column + 2) % 3
+        s = np.sqrt(1.0 + m[:, i, i] - m[:, j, j] - m[:, k, k]) * 2
+        vector = np.empty((len(m), 3))
+        vector[:, i] = 0.25 * s
+        vector[:, j] = (m[:, j, i] + m[:, i, j]) / s
+        vector[:, k] = (m[:, k, i] + m[:, i, k]) / s
+        q[rows] = np.concatenate([((m[:, k, j] - m[:, j, k]) / s)[:, None], vector], axis=1)
+
+    q[q[:, 0] < 0] *= -1
+    norm = np.linalg.norm(q[:, 1:], axis=1)
+    angle = 2 * np.arctan2(norm, q[:, 0])
+    scale = np.where(norm > 1e-12, angle / np.maximum(norm, 1e-12), 2.0)
+    return q[:, 1:] * scale[:, None]
+
+
+def rotation_matrices(rvecs: np.ndarray) -> np.ndarray:
+    # batched inverse of rotation_vectors (Rodrigues formula)
+    angle = np.linalg.norm(rvecs, axis=1)
+    axis = rvecs / np.maximum(angle, 1e-12)[:, None]
+    cross = np.zeros((len(rvecs), 3, 3))
+    cross[:, 0, 1], cross[:, 0, 2], cross[:, 1, 2] = -axis[:, 2], axis[:, 1], -axis[:, 0]
+    cross -= cross.transpose(0, 2, 1)
+    sin, cos = np.sin(angle)[:, None, None], np.cos(angle)[:, None, None]
+    return np.eye(3) + sin * cross + (1 - cos) * cross @ cross
+
+
+def refine(rotations: np.ndarray, tvecs: np.ndarray, normalized: np.ndarray,
+           marker_length: float, iterations: int = 2) -> tuple:
+    # Gauss-Newton on the reprojection error, every marker in lockstep, with
+    # rotation updates applied on the left (R <- exp(w) R) and the analytic
+    # Jacobian of the pinhole projection
+    objects = object_corners(marker_length)
+    count = len(normalized)
+    for _ in range(iterations):
+        rotated = objects @ rotations.transpose(0, 2, 1)
+        points = rotated + tvecs[:, None]
+        inverse_z = 1.0 / points[:, :, 2]
+        x, y = points[:, :, 0] * inverse_z, points[:, :, 1] * inverse_z
+        residual = np.stack([x, y], axis=2) - normalized
+
+        # d(x, y)/dP for every corner, then dP/dt = I and dP/dw = -[RX]x
+        projection = np.zeros((count, 4, 2, 3))
+        projection[..., 0, 0] = projection[..., 1, 1] = inverse_z
+        projection[..., 0, 2], projection[..., 1, 2] = -x * inverse_z, -y * inverse_z
+        skew = np.zeros((count, 4, 3, 3))
+        skew[..., 0, 1], skew[..., 0, 2], skew[..., 1, 2] = rotated[..., 2], -rotated[..., 1], rotated[..., 0]
+        skew -= np.swapaxes(skew, -1, -2)
+        jacobian = np.concatenate([projection @ skew, projection], axis=3).reshape(count, 8, 6)
+
+        normal = jacobian.transpose(0, 2, 1) @ jacobian + 1e-12 * np.eye(6)
+        gradient = jacobian.transpose(0, 2, 1) @ residual.reshape(count, 8, 1)
+        delta = -np.linalg.solve(normal, gradient)[:, :, 0]
+        rotations = rotation_matrices(delta[:, :3]) @ rotations
+        tvecs = tvecs + delta[:, 3:]
+    return rotations, tvecs
+
+
+def solve_batch(normalized: np.ndarray, marker_length: float, iterations: int = 3) -> tuple:
+    # (N, 4, 2) undistorted normalized corners -> (rvecs, tvecs), all markers at once
+    if not len(normalized):
+        empty = np.empty((0, 3), dtype=np.float32)
+        return empty, empty.copy()
+    homographies = square_homographies(normalized, marker_length)
+    h1, h2, h3 = homographies[:, :, 0], homographies[:, :, 1], homographies[:, :, 2]
+    scale = 2.0 / (np.linalg.norm(h1, axis=1) + np.linalg.norm(h2, axis=1))
+    # the marker is in front of the camera
+    scale *= np.sign(h3[:, 2])
+
+    r1, r2 = h1 * scale[:, None], h2 * scale[:, None]
+    approx = np.stack([r1, r2, np.cross(r1, r2)], axis=2)
+    u, _, vt = np.linalg.svd(approx)
+    rotations = u @ vt
+    # keep proper rotations after the orthonormalization
+    flip = np.linalg.det(rotations) < 0
+    if flip.any():
+        u[flip, :, 2] *= -1
+        rotations[flip] = u[flip] @ vt[flip]
+    tvecs = h3 * scale[:, None]
+    # the algebraic solution is several degrees off with noisy corners
+    if iterations:
+        rotations, tvecs = refine(rotations, tvecs, normalized, marker_length, iterations)
+    return rotation_vectors(rotations).astype(np.float32), tvecs.astype(np.float32)
+
+
+def solve_each(normalized: np.ndarray, marker_length: float) -> tuple:
+    # reference: one IPPE_SQUARE solvePnP per marker on the normalized corners
+    objects = object_corners(marker_length)
+    rvecs, tvecs = [], []
+    for quad in normalized:
+        _, rvec, tvec = cv.solvePnP(objects, quad, np.eye(3), None, flags=cv.SOLVEPNP_IPPE_SQUARE)
+        rvecs.append(rvec.ravel())
+        tvecs.append(tvec.ravel())
+    return (np.array(rvecs, dtype=np.float32).reshape(-1, 3),
+            np.array(tvecs, dtype=np.float32).reshape(-1, 3))
+
+
+class PoseReader(FrameReader):
+    """
+    Wraps a marker reader and adds rvecs / tvecs to its detections. Same
+    interface as the wrapped reader, built with `camera_port` so it also
+    works as detector class of a DetectionPool. `method` is "ippe"
+    (solvePnP per marker) or "batch" (vectorized, pays off from about a
+    hundred markers per frame). With `undistort_frames`, frames are
+    remapped at `processing_width` before the detection instead of
+    undistorting the corners, and the display shows the remapped image.
+    """
+    def __init__(self, camera_port: str | int | None, reader=None, calibration=None,
+                 marker_length: float = 0.05, method: str = "ippe",
+                 undistort_frames: bool = False, processing_width: int | None = None,
+                 axes: bool = True) -> None:
+        if calibration is None:
+            raise ValueError("PoseReader needs a calibration (see calibrate.py)")
+        if method not in ("ippe", "batch"):
+            raise ValueError("Unknown pose method {!r}, expected ippe or batch".format(method))
+        self.reader = (reader or ArucoReader)(camera_port)
+        self.calibration = Calibration.load(calibration) if isinstance(calibration, str) else calibration
+        self.marker_length = marker_length
+        self.solve = solve_each if method == "ippe" else solve_batch
+        self.undistort_frames = undistort_frames
+        self.processing_width = processing_width
+        self.axes = axes
+        # camera of the remapped frames, whatever their size
+        self.rectified = self.calibration.rectified() if undistort_frames else None
+
+    @property
+    def stateful(self) -> bool:
+        return getattr(self.reader, "stateful", False)
+
+    @timed("pose")
+    def estimate(self, detections: Detections, calibration: Calibration | None = None) -> Detections:
+        calibration = calibration or self.calibration
+        normalized = calibration.normalize(detections.corners, detections.size)
+        rvecs, tvecs = self.solve(normalized, self.marker_length)
+        return replace(detections, rvecs=rvecs, tvecs=tvecs)
+
+    def detect_frame(self, frame) -> Detections:
+        frame = FrameContext.of(frame)
+        if not self.undistort_frames:
+            return self.estimate(self.reader.detect_frame(frame))
+
+        # corners of the remapped frame are already undistorted
+        image = self.calibration.undistort(frame.view(self.processing_width))
+        detections = self.reader.detect_frame(FrameContext(image))
+        return self.estimate(detections, self.rectified).scaled(*frame.size)
+
+    def display_image(self, frame, width: int | None = None) -> np.ndarray:
+        if self.undistort_frames:
+            return self.calibration.undistort(FrameContext.of(frame).view(width))
+        return self.reader.display_image(frame, width)
+
+    def draw(self, frame: np.ndarray, detections: Detections) -> np.ndarray:
+        frame = self.reader.draw(frame, detections)
+        if self.axes and detections.rvecs is not None:
+            calibration = (self.rectified or self.calibration).scaled((frame.shape[1], frame.shape[0]))
+            for rvec, tvec in zip(detections.rvecs, detections.tvecs):
+                cv.drawFrameAxes(frame, calibration.camera_matrix, calibration.dist_coeffs,
+                                 rvec, tvec, self.marker_length / 2)
+        return frame
+
+
+def charuco_board(squares: tuple = (5, 7), square_length: float = 0.04, marker_length: float = 0.03,
+                  dictionary: int = cv.aruco.DICT_5X5_100):
+    return cv.aruco.CharucoBoard(squares, square_length, marker_length,
+                                 cv.aruco.getPredefinedDictionary(dictionary))
+
+
+def calibrate_charuco(images, board, min_corners: int = 6) -> tuple:
+    """
+    Calibrates from views of a ChArUco board. Returns the Calibration and
+    the number of views used; views with fewer than `min_corners` chessboard
+    corners found are skipped.
+    """
+    detector = cv.aruco.CharucoDetector(board)
+    object_points, image_points, size = [], [], None
+    for image in images:
+        gray = cv.cvtColor(image, cv.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        size = (gray.shape[1], gray.shape[0])
+        corners, ids, _, _ = detector.detectBoard(gray)
+        if ids is None or len(ids) < min_corners:
+            continue
+        objects, points = board.matchImagePoints(corners, ids)
+        object_points.append(objects)
+        image_points.append(points)
+
+    if len(object_points) < 3:
+        raise ValueError("Only {} usable views of the board, at least 3 are needed".format(len(object_points)))
+    rms, matrix, dist, _, _ = cv.calibrateCamera(object_points, image_points, size, None, None)
+    return Calibration(matrix, dist.ravel(), size, float(rms)), len(object_points)
@@ -0,0 +1,211 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import cv2 as cv
+import numpy as np
+from src.metrics import METRICS
+
+"""
+Browser preview of the cameras over HTTP, as MJPEG streams:
+
+    http://<host>:<port>/                  page with every camera
+    http://<host>:<port>/camera/0.mjpg     stream, ?quality=50&fps=5
+    http://<host>:<port>/camera/0.jpg      snapshot
+
+Camera threads only publish a reference to their newest annotated frame.
+Nothing is encoded until a client asks for it: each frame is encoded at
+most once per quality level, by whichever client thread needs it first,
+and the same bytes are sent to every client. A slow client skips straight
+to the newest frame instead of queueing old ones, and with no client
+connected the cameras skip the preview entirely.
+"""
+
+BOUNDARY: str = "frame"
+
+
+class PreviewChannel:
+    def __init__(self, camera) -> None:
+        self.camera = camera
+        self.image: np.ndarray | None = None
+        self.rgb: bool = False
+        self.seq: int = 0
+        self.clients: int = 0
+        # quality -> (seq, jpeg) of the newest encoded frame
+        self.encoded: dict = {}
+        self.encodes: int = 0
+        self._cond = threading.Condition()
+        self._encode_lock = threading.Lock()
+
+    @property
+    def watched(self) -> bool:
+        return self.clients > 0
+
+    def publish(self, image: np.ndarray, rgb: bool = False) -> None:
+        # camera thread; `image` must not be modified afterwards
+        if not self.clients:
+            return
+        with self._cond:
+            self.image, self.rgb = image, rgb
+            self.seq += 1
+            self._cond.notify_all()
+
+    def wait(self, after_seq: int, timeout: float) -> int:
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq > after_seq, timeout)
+            return self.seq
+
+    def jpeg(self, quality: int) -> tuple:
+        # (seq, bytes) of the newest frame, encoded once per quality
+        with self._encode_lock:
+            with self._cond:
+                image, rgb, seq = self.image, self.rgb, self.seq
+            if image is None:
+                return seq, None
+            cached = self.encoded.get(quality)
+            if cached is not None and cached[0] == seq:
+                return cached
+
+            start = time.perf_counter()
+            if rgb:
+                image = cv.cvtColor(image, cv.COLOR_RGB2BGR)
+            ok, data = cv.imencode(".jpg", image, [cv.IMWRITE_JPEG_QUALITY, quality])
+            METRICS.observe("preview_encode", time.perf_counter() - start, self.camera)
+            self.encodes += 1
+            self.encoded[quality] = (seq, data.tobytes() if ok else None)
+            return self.encoded[quality]
+
+    def attach(self, delta: int) -> int:
+        # returns the current seq: only frames published after it are kept
+        with self._cond:
+            self.clients += delta
+            if not self.clients:
+                # the last frame is not kept alive for nobody
+                self.image = None
+                self.encoded.clear()
+            seq = self.seq
+        METRICS.set_gauge("preview_clients", self.clients, self.camera)
+        return seq
+
+
+class PreviewServer:
+    """
+    MJPEG preview of every camera registered with channel(). Streams are
+    capped at `max_fps` (clients may ask for less) and `quality` is the
+    default JPEG quality. A client whose socket stays blocked for
+    `send_timeout` seconds is disconnected.
+    """
+    def __init__(self, port: int = 8080, host: str = "127.0.0.1", quality: int = 70,
+                 max_fps: float = 15.0, send_timeout: float = 10.0) -> None:
+        self.quality = quality
+        self.max_fps = max_fps
+        self.send_timeout = send_timeout
+        self.channels: dict = {}
+        self.sent: int = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                url = urlparse(self.path)
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                if url.path in ("/", "/index.html"):
+                    server.index(self)
+                    return
+                name, _, kind = url.path.rpartition("/")[2].partition(".")
+                channel = server.channels.get(name) if url.path.startswith("/camera/") else None
+                if channel is None or kind not in ("mjpg", "jpg"):
+                    self.send_error(404)
+                    return
+                try:
+                    quality = min(100, max(1, int(query.get("quality", server.quality))))
+                    fps = min(server.max_fps, float(query.get("fps", server.max_fps)))
+                except ValueError:
+                    self.send_error(400)
+                    return
+                self.connection.settimeout(server.send_timeout)
+                try:
+                    if kind == "jpg":
+                        server.snapshot(self, channel, quality)
+                    else:
+                        server.stream(self, channel, quality, fps)
+                except OSError:
+                    # gone, or blocked for send_timeout
+                    pass
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def channel(self, camera) -> PreviewChannel:
+        return self.channels.setdefault(str(camera), PreviewChannel(camera))
+
+    def index(self, handler) -> None:
+        images = "".join('<h3>{0}</h3><img src="/camera/{0}.mjpg">'.format(name) for name in sorted(self.channels))
+        body = "<!doctype html><title>Cameras</title><body>{}</body>".format(images).encode()
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/html; charset=utf-8")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def snapshot(self, handler, channel: PreviewChannel, quality: int) -> None:
+        # nothing is kept while nobody watches: wait for a frame published after attaching
+        seq = channel.attach(1)
+        try:
+            jpeg = None
+            if channel.wait(seq, 2.0) > seq:
+                _, jpeg = channel.jpeg(quality)
+        finally:
+            channel.attach(-1)
+        if jpeg is None:
+            handler.send_error(503, "No frame yet")
+            return
+        handler.send_response(200)
+        handler.send_header("Content-Type", "image/jpeg")
+        handler.send_header("Content-Length", str(len(jpeg)))
+        handler.end_headers()
+        handler.wfile.write(jpeg)
+
+    def stream(self, handler, channel: PreviewChannel, quality: int, fps: float) -> None:
+        handler.send_response(200)
+        handler.send_header("Content-Type", "multipart/x-mixed-replace; boundary=" + BOUNDARY)
+        handler.send_header("Cache-Control", "no-cache")
+        handler.end_headers()
+        period = 1.0 / fps if fps > 0 else 0.0
+        last_seq = channel.attach(1)
+        try:
+            while True:
+                if not channel.wait(last_seq, 1.0) > last_seq:
+                    continue
+                start = time.monotonic()
+                # frames published while the previous one was being sent are skipped
+                seq, jpeg = channel.jpeg(quality)
+                if jpeg is None:
+                    # nothing to send for this frame (failed encode): wait for the next one
+                    last_seq = max(last_seq, seq)
+                    continue
+                if last_seq and seq > last_seq + 1:
+                    METRICS.increment("preview_skipped", seq - last_seq - 1, channel.camera)
+                last_seq = seq
+                handler.wfile.write("--{}\r\nContent-Type: image/jpeg\r\nContent-Length: {}\r\n\r\n".format(
+                    BOUNDARY, len(jpeg)).encode() + jpeg + b"\r\n")
+                handler.wfile.flush()
+                self.sent += 1
+                delay = period - (time.monotonic() - start)
+                if delay > 0:
+                    time.sleep(delay)
+        finally:
+            channel.attach(-1)
+
+    def start(self) -> "PreviewServer":
+        self._thread.start()
+        print("[INFO] Camera preview on http://{}:{}/".format(*self.httpd.server_address[:2]))
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
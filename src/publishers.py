@@ -0,0 +1,116 @@
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from src.opencv_engine import Detections
+
+"""
+Publishers for the headless mode: every detection record is serialized once
+as a line of JSON (NDJSON) and written to stdout or to every client
+connected to a local TCP or Unix socket. Clients that cannot keep up are
+disconnected instead of stalling the camera threads.
+"""
+
+
+def detection_record(camera, seq: int, detections: Detections) -> dict:
+    record = {
+        "camera": camera,
+        "seq": seq,
+        "timestamp": round(time.time(), 3),
+        # resolution the coordinates refer to
+        "size": list(detections.size),
+        "ids": detections.ids.tolist(),
+        "corners": detections.corners.round(1).tolist(),
+        "barcodes": [{"data": data, "type": kind, "rect": list(rect)}
+                     for data, kind, rect in detections.barcodes],
+    }
+    if detections.rvecs is not None:
+        # marker poses, translation in the unit of the marker length
+        record["rvecs"] = detections.rvecs.astype(float).round(4).tolist()
+        record["tvecs"] = detections.tvecs.astype(float).round(4).tolist()
+    return record
+
+
+def encode(record: dict) -> bytes:
+    return (json.dumps(record, separators=(",", ":")) + "\n").encode()
+
+
+class StdoutPublisher:
+    def __init__(self, stream=None) -> None:
+        self.stream = stream or sys.stdout.buffer
+        self._lock = threading.Lock()
+
+    def publish(self, record: dict) -> None:
+        line = encode(record)
+        with self._lock:
+            self.stream.write(line)
+            self.stream.flush()
+
+    def close(self) -> None:
+        pass
+
+
+class SocketPublisher:
+    # address: (host, port) for TCP or a filesystem path for a Unix socket
+    def __init__(self, address, send_timeout: float = 0.2) -> None:
+        self.address = address
+        self.send_timeout = send_timeout
+        if isinstance(address, str):
+            if os.path.exists(address):
+                os.unlink(address)
+            self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(address)
+        self.server.listen()
+
+        self.clients: list = []
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self._thread.start()
+
+    def _accept_loop(self) -> None:
+        while True:
+            try:
+                client, _ = self.server.accept()
+            except OSError:
+                break
+            client.settimeout(self.send_timeout)
+            with self._lock:
+                self.clients.append(client)
+
+    def publish(self, record: dict) -> None:
+        line = encode(record)
+        with self._lock:
+            for client in list(self.clients):
+                try:
+                    client.sendall(line)
+                except OSError:
+                    # gone or too slow: a partial line would corrupt the stream
+                    self.clients.remove(client)
+                    client.close()
+
+    def close(self) -> None:
+        self.server.close()
+        with self._lock:
+            for client in self.clients:
+                client.close()
+            self.clients.clear()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+
+
+def open_publisher(target: str):
+    # "-" / "stdout", "tcp:HOST:PORT" or "unix:PATH"
+    if target in ("-", "stdout"):
+        return StdoutPublisher()
+    kind, _, rest = target.partition(":")
+    if kind == "tcp":
+        host, _, port = rest.rpartition(":")
+        return SocketPublisher((host or "127.0.0.1", int(port)))
+    if kind == "unix":
+        return SocketPublisher(rest)
+    raise ValueError("Unknown output {!r}, expected stdout, tcp:HOST:PORT or unix:PATH".format(target))
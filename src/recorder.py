@@ -0,0 +1,252 @@
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+import cv2 as cv
+import numpy as np
+from src.opencv_engine import Detections, Frame, resize_to_width
+from src.metrics import METRICS
+
+"""
+Event clips. Every camera keeps its last `pre_seconds` of frames as JPEG
+bytes in a ring buffer; frames are encoded once, on a background thread,
+at most `fps` times per second. When a trigger fires (an unexpected marker
+ID, a barcode that stopped showing up, or a manual trigger) the buffered
+frames plus `post_seconds` of new ones are handed to a writer thread and
+saved as a clip: concatenated JPEGs (`.mjpg`, playable with ffplay/VLC and
+readable with cv.VideoCapture) and a `.json` sidecar with the timestamps.
+
+Memory is bounded by `max_mb`: the ring plus the clips waiting to be
+written never hold more than that (shared frames are counted twice, so the
+bound is conservative). The pre-trigger window shrinks first, then a clip
+growing past the ceiling is closed early, or dropped when the memory is
+held by older clips the writer has not stored yet; all of it is counted
+in stats().
+"""
+
+
+class EventTrigger:
+    """
+    Decides when a camera is worth a clip: a marker ID outside `expected_ids`
+    is seen, or no barcode was read for `barcode_timeout` seconds. The same
+    reason does not trigger again within `cooldown` seconds.
+    """
+    def __init__(self, expected_ids: list | None = None, barcode_timeout: float | None = None,
+                 cooldown: float = 10.0) -> None:
+        self.expected_ids = None if expected_ids is None else set(expected_ids)
+        self.barcode_timeout = barcode_timeout
+        self.cooldown = cooldown
+        self.last_barcode: float | None = None
+        self.fired: dict = {}
+
+    def check(self, detections: Detections, now: float) -> list:
+        reasons = []
+        if self.expected_ids is not None:
+            reasons += ["unexpected_id_{}".format(marker_id) for marker_id in detections.ids.tolist()
+                        if marker_id not in self.expected_ids]
+        if self.barcode_timeout is not None:
+            if detections.barcodes or self.last_barcode is None:
+                self.last_barcode = now
+            elif now - self.last_barcode >= self.barcode_timeout:
+                reasons.append("missing_barcode")
+
+        fresh = [reason for reason in reasons if now - self.fired.get(reason, -np.inf) >= self.cooldown]
+        for reason in fresh:
+            self.fired[reason] = now
+        return fresh
+
+
+class ClipRecorder:
+    def __init__(self, camera, output: str = "clips", pre_seconds: float = 5.0, post_seconds: float = 5.0,
+                 max_mb: float = 32.0, fps: float = 10.0, quality: int = 80, width: int | None = 640,
+                 trigger: EventTrigger | None = None) -> None:
+        self.camera = camera
+        self.output = output
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.max_bytes = int(max_mb * 1e6)
+        self.period = 1.0 / fps if fps else 0.0
+        self.params = [cv.IMWRITE_JPEG_QUALITY, quality]
+        self.width = width
+        self.trigger_rule = trigger
+
+        # (timestamp, jpeg) of the pre-trigger window
+        self.ring: deque = deque()
+        self.ring_bytes: int = 0
+        # clip being collected: {"start", "until", "reasons", "frames", "bytes"}
+        self.clip: dict | None = None
+        self.pending_bytes: int = 0
+        self.counters: dict = dict.fromkeys(("encoded", "encode_dropped", "clips", "clips_dropped",
+                                             "clips_truncated", "written_bytes"), 0)
+        self.encode_time: float = 0.0
+        self.write_time: float = 0.0
+        self.last_push: float = -np.inf
+
+        self._lock = threading.Lock()
+        self._input = None
+        self._ready = threading.Event()
+        self._running: bool = True
+        self._writes: queue.Queue = queue.Queue()
+        self._encoder = threading.Thread(target=self._encode_loop, daemon=True)
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._encoder.start()
+        self._writer.start()
+
+    def observe(self, frame: Frame, detections: Detections) -> None:
+        # called by the pipeline for every processed frame
+        if self.trigger_rule is not None:
+            for reason in self.trigger_rule.check(detections, frame.timestamp):
+                self.trigger(reason, frame.timestamp)
+        self.push(frame.image, frame.timestamp)
+
+    def push(self, image: np.ndarray, timestamp: float) -> None:
+        # never blocks the camera: a frame arriving while the encoder is busy replaces the waiting one
+        if timestamp - self.last_push < self.period:
+            return
+        self.last_push = timestamp
+        with self._lock:
+            if self._input is not None:
+                self.counters["encode_dropped"] += 1
+            self._input = (image, timestamp)
+            # under the lock, so the encoder never sees the event without its frame
+            self._ready.set()
+
+    def trigger(self, reason: str = "manual", timestamp: float | None = None) -> None:
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        with self._lock:
+            if self.clip is None:
+                self.clip = {"start": timestamp, "until": timestamp + self.post_seconds, "reasons": [reason],
+                             "wall": time.time(), "frames": [], "bytes": 0, "truncated": False}
+            else:
+                # a new event while recording extends the clip
+                self.clip["until"] = max(self.clip["until"], timestamp + self.post_seconds)
+                if reason not in self.clip["reasons"]:
+                    self.clip["reasons"].append(reason)
+        print("[INFO] Camera {}: recording clip ({})".format(self.camera, reason))
+
+    def _encode_loop(self) -> None:
+        while self._running:
+            if not self._ready.wait(0.2):
+                self._close_expired()
+                continue
+            with self._lock:
+                self._ready.clear()
+                if self._input is None:
+                    continue
+                image, timestamp = self._input
+                self._input = None
+
+            start = time.perf_counter()
+            ok, jpeg = cv.imencode(".jpg", resize_to_width(image, self.width), self.params)
+            elapsed = time.perf_counter() - start
+            self.encode_time += elapsed
+            self.counters["encoded"] += 1
+            METRICS.observe("clip_encode", elapsed, self.camera)
+            if ok:
+                self._store(timestamp, jpeg.tobytes())
+            self._close_expired()
+
+    def _store(self, timestamp: float, jpeg: bytes) -> None:
+        with self._lock:
+            self.ring.append((timestamp, jpeg))
+            self.ring_bytes += len(jpeg)
+            clip = self.clip
+            if clip is not None:
+                if not clip["frames"]:
+                    # the pre-trigger part, from the ring
+                    clip["frames"] = [item for item in self.ring if item[0] >= clip["start"] - self.pre_seconds]
+                    clip["bytes"] = sum(len(item[1]) for item in clip["frames"])
+                    self.pending_bytes += clip["bytes"]
+                else:
+                    clip["frames"].append((timestamp, jpeg))
+                    clip["bytes"] += len(jpeg)
+                    self.pending_bytes += len(jpeg)
+
+            # the pre-trigger window, then the memory ceiling
+            while self.ring and (self.ring[0][0] < timestamp - self.pre_seconds
+                                 or self.ring_bytes + self.pending_bytes > self.max_bytes):
+                self.ring_bytes -= len(self.ring.popleft()[1])
+            if clip is not None and self.pending_bytes > self.max_bytes:
+                if clip["bytes"] * 2 < self.pending_bytes:
+                    # the writer is behind on older clips: give this one up
+                    self.clip = None
+                    self.pending_bytes -= clip["bytes"]
+                    self.counters["clips_dropped"] += 1
+                else:
+                    clip["truncated"] = True
+                    self.counters["clips_truncated"] += 1
+                    self._finish_clip()
+            METRICS.set_gauge("clip_memory_bytes", self.ring_bytes + self.pending_bytes, self.camera)
+
+    def _close_expired(self) -> None:
+        with self._lock:
+            if self.clip is not None and self.clip["frames"] and self.clip["frames"][-1][0] >= self.clip["until"]:
+                self._finish_clip()
+
+    def _finish_clip(self) -> None:
+        # lock held; the writer releases the pending bytes once the clip is on disk
+        clip, self.clip = self.clip, None
+        self._writes.put(clip)
+
+    def _write_loop(self) -> None:
+        while True:
+            clip = self._writes.get()
+            if clip is None:
+                break
+            try:
+                self._write(clip)
+            except OSError as error:
+                self.counters["clips_dropped"] += 1
+                print("[ERROR] Camera {}: clip not written: {}".format(self.camera, error))
+            with self._lock:
+                self.pending_bytes -= clip["bytes"]
+
+    def _write(self, clip: dict) -> None:
+        os.makedirs(self.output, exist_ok=True)
+        name = "{}_{}_{}".format(self.camera, time.strftime("%Y%m%d-%H%M%S", time.localtime(clip["wall"])),
+                                 clip["reasons"][0])
+        path = os.path.join(self.output, name)
+        start = time.perf_counter()
+        with open(path + ".mjpg", "wb") as video:
+            for _, jpeg in clip["frames"]:
+                video.write(jpeg)
+            video.flush()
+            # on the SD card, a clip only counts once it is really stored
+            os.fsync(video.fileno())
+        with open(path + ".json", "w") as sidecar:
+            json.dump({"camera": self.camera, "reasons": clip["reasons"], "time": clip["wall"],
+                       "pre_seconds": self.pre_seconds, "truncated": clip["truncated"],
+                       "offsets": [round(timestamp - clip["start"], 3) for timestamp, _ in clip["frames"]]},
+                      sidecar)
+        elapsed = time.perf_counter() - start
+        self.write_time += elapsed
+        self.counters["clips"] += 1
+        self.counters["written_bytes"] += clip["bytes"]
+        METRICS.observe("clip_write", elapsed, self.camera)
+        METRICS.increment("clips_written", camera=self.camera)
+        print("[INFO] Camera {}: clip {}.mjpg written ({} frames, {:.1f} MB)".format(
+            self.camera, path, len(clip["frames"]), clip["bytes"] / 1e6))
+
+    def stats(self) -> dict:
+        with self._lock:
+            seconds = self.ring[-1][0] - self.ring[0][0] if len(self.ring) > 1 else 0.0
+            stats = dict(self.counters, buffered_frames=len(self.ring), buffered_seconds=round(seconds, 2),
+                         memory_mb=round((self.ring_bytes + self.pending_bytes) / 1e6, 2),
+                         max_mb=round(self.max_bytes / 1e6, 2), recording=self.clip is not None)
+        encoded = self.counters["encoded"]
+        stats["encode_ms"] = round(self.encode_time / encoded * 1000, 2) if encoded else None
+        stats["write_mb_s"] = round(self.counters["written_bytes"] / self.write_time / 1e6, 1) \
+            if self.write_time else None
+        return stats
+
+    def close(self) -> None:
+        # the clip being recorded is saved with what it has
+        self._running = False
+        self._encoder.join(timeout=2.0)
+        with self._lock:
+            if self.clip is not None and self.clip["frames"]:
+                self._finish_clip()
+        self._writes.put(None)
+        self._writer.join()
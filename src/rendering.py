@@ -0,0 +1,62 @@
+import cv2 as cv
+import numpy as np
+from functools import lru_cache
+
+"""
+Overlay rendering for detections. Corners are converted with a single NumPy
+operation and all outlines of a frame are drawn with one cv.polylines call;
+only the labels, which OpenCV cannot batch, are drawn one by one.
+"""
+
+MARKER_COLOR: tuple = (0, 255, 0)
+CENTER_COLOR: tuple = (0, 0, 255)
+BARCODE_COLOR: tuple = (0, 0, 255)
+FONT: int = cv.FONT_HERSHEY_SIMPLEX
+FONT_SCALE: float = 0.5
+THICKNESS: int = 2
+
+
+@lru_cache(maxsize=1024)
+def text_size(text: str, scale: float = FONT_SCALE, thickness: int = THICKNESS) -> tuple:
+    (w, h), baseline = cv.getTextSize(text, FONT, scale, thickness)
+    return w, h, baseline
+
+
+def draw_label(image: np.ndarray, text: str, x: int, y: int, color: tuple) -> None:
+    # keep the label inside the frame instead of clipping it at the top
+    w, h, _ = text_size(text)
+    x = min(max(0, x), max(0, image.shape[1] - w))
+    y = max(h, y)
+    cv.putText(image, text, (x, y), FONT, FONT_SCALE, color, THICKNESS)
+
+
+def draw_markers(image: np.ndarray, corners: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    if len(corners) == 0:
+        return image
+    
+    points = np.rint(np.asarray(corners, dtype=np.float32).reshape(-1, 4, 2)).astype(np.int32)
+    cv.polylines(image, list(points), True, MARKER_COLOR, THICKNESS)
+    
+    # center between the top-left and bottom-right corners
+    centers = (points[:, 0] + points[:, 2]) // 2
+    for (cX, cY), (x, y), marker_id in zip(centers.tolist(), points[:, 0].tolist(), np.ravel(ids).tolist()):
+        cv.circle(image, (cX, cY), 4, CENTER_COLOR, -1)
+        draw_label(image, str(marker_id), x, y - 10, MARKER_COLOR)
+    
+    return image
+
+
+def draw_barcodes(image: np.ndarray, barcodes: list) -> np.ndarray:
+    if not barcodes:
+        return image
+    
+    rects = np.array([rect for (_, _, rect) in barcodes], dtype=np.int32)
+    x, y, w, h = rects.T
+    boxes = np.stack([np.stack([x, y], 1), np.stack([x + w, y], 1),
+                      np.stack([x + w, y + h], 1), np.stack([x, y + h], 1)], axis=1)
+    cv.polylines(image, list(boxes), True, BARCODE_COLOR, THICKNESS)
+    
+    for (data, kind, _), (bx, by) in zip(barcodes, rects[:, :2].tolist()):
+        draw_label(image, "{} ({})".format(data, kind), bx, by - 10, BARCODE_COLOR)
+    
+    return image
@@ -0,0 +1,78 @@
+import http.client
+import threading
+import time
+import numpy as np
+import pytest
+from src.preview import PreviewServer
+
+
+@pytest.fixture
+def server():
+    server = PreviewServer(0).start()
+    yield server
+    server.stop()
+
+
+def get(server: PreviewServer, path: str, timeout: float = 5.0) -> tuple:
+    connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=timeout)
+    connection.request("GET", path)
+    response = connection.getresponse()
+    body = response.read()
+    connection.close()
+    return response.status, body
+
+
+def publisher(channel, stop: threading.Event) -> threading.Thread:
+    image = np.zeros((48, 64, 3), dtype=np.uint8)
+
+    def run() -> None:
+        while not stop.is_set():
+            channel.publish(image)
+            time.sleep(0.01)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_every_snapshot_gets_a_frame(server):
+    # each snapshot leaves the channel unwatched again, which drops the stored frame
+    stop = threading.Event()
+    publisher(server.channel(0), stop)
+    try:
+        for _ in range(5):
+            status, body = get(server, "/camera/0.jpg")
+            assert status == 200
+            assert body.startswith(b"\xff\xd8")
+    finally:
+        stop.set()
+
+
+def test_stalled_camera(server):
+    channel = server.channel(0)
+    stop = threading.Event()
+    publisher(channel, stop)
+    assert get(server, "/camera/0.jpg")[0] == 200
+    stop.set()
+    time.sleep(0.1)
+
+    # no new frame: the snapshot gives up instead of sending nothing
+    assert get(server, "/camera/0.jpg")[0] == 503
+
+    # a stream waiting for a stalled camera must not spin
+    connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+    connection.request("GET", "/camera/0.mjpg")
+    response = connection.getresponse()
+    assert response.status == 200
+    start_cpu, start = time.process_time(), time.monotonic()
+    time.sleep(1.5)
+    assert time.process_time() - start_cpu < 0.5 * (time.monotonic() - start)
+
+    # and it resumes with the next frame
+    channel.publish(np.zeros((48, 64, 3), dtype=np.uint8))
+    line = response.fp.readline()
+    while not line.lower().startswith(b"content-length:"):
+        line = response.fp.readline()
+    response.fp.readline()
+    assert response.fp.read(int(line.split(b":")[1])).startswith(b"\xff\xd8")
+    connection.close()
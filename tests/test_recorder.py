@@ -0,0 +1,41 @@
+import sys
+import threading
+import time
+import numpy as np
+from src.recorder import ClipRecorder
+
+
+def test_push_from_another_thread_keeps_the_encoder_alive(tmp_path):
+    # push() and the encoder thread used to race on the ready event, which
+    # killed the encoder with a TypeError; tiny switch intervals make it likely
+    recorder = ClipRecorder("test", str(tmp_path), pre_seconds=1.0, post_seconds=0.0, fps=0, width=None)
+    image = np.zeros((8, 8, 3), dtype=np.uint8)
+    stop = threading.Event()
+    pushed = [0]
+
+    def camera() -> None:
+        while not stop.is_set():
+            recorder.push(image, pushed[0] * 0.001)
+            pushed[0] += 1
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    thread = threading.Thread(target=camera)
+    try:
+        thread.start()
+        time.sleep(3.0)
+        stop.set()
+        thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert recorder._encoder.is_alive()
+    assert recorder.counters["encoded"] > 0
+
+    # and the recorder still writes clips afterwards
+    recorder.trigger("manual", pushed[0] * 0.001)
+    recorder.push(image, pushed[0] * 0.001 + 0.1)
+    time.sleep(0.5)
+    recorder.close()
+    assert recorder.stats()["clips"] == 1
+    assert len(list(tmp_path.glob("*.mjpg"))) == 1
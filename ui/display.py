@@ -0,0 +1,60 @@
+import threading
+import cv2 as cv
+import numpy as np
+from PyQt5.QtGui import QImage, QPixmap
+
+"""
+Hand-off of display frames from the camera threads to the GUI thread.
+
+Workers post numpy frames to a FrameMailbox and only signal the GUI when no
+paint is already pending for that camera, so signals never queue up: a frame
+the GUI could not paint in time is simply replaced by the newer one. The
+QImage is built in the GUI thread over the numpy buffer, which stays alive
+until QPixmap.fromImage has made its copy. With Format_BGR888 (Qt >= 5.14)
+that copy is the only one per frame; older Qt versions need an in-place BGR
+to RGB conversion in the worker.
+"""
+
+HAS_BGR888: bool = hasattr(QImage, "Format_BGR888")
+
+
+def prepare_for_display(image: np.ndarray) -> np.ndarray:
+    # runs in the worker thread, on a frame the worker owns
+    if image.ndim == 3 and not HAS_BGR888:
+        cv.cvtColor(image, cv.COLOR_BGR2RGB, dst=image)
+    return np.ascontiguousarray(image)
+
+
+def to_pixmap(image: np.ndarray) -> QPixmap:
+    # the QImage borrows `image`, it must not outlive this call
+    if image.ndim == 2:
+        image_format = QImage.Format_Grayscale8
+    else:
+        image_format = QImage.Format_BGR888 if HAS_BGR888 else QImage.Format_RGB888
+    imageComponent = QImage(image.data, image.shape[1], image.shape[0], image.strides[0], image_format)
+    return QPixmap.fromImage(imageComponent)
+
+
+class FrameMailbox:
+    def __init__(self) -> None:
+        self.frames: dict = {}
+        self.pending: set = set()
+        self.posted: dict = {}
+        self.dropped: dict = {}
+        self._lock = threading.Lock()
+
+    def post(self, index: int, image: np.ndarray) -> bool:
+        # True when the GUI has to be signalled for this camera
+        with self._lock:
+            if index in self.frames:
+                self.dropped[index] = self.dropped.get(index, 0) + 1
+            self.frames[index] = image
+            self.posted[index] = self.posted.get(index, 0) + 1
+            notify = index not in self.pending
+            self.pending.add(index)
+            return notify
+
+    def take(self, index: int) -> np.ndarray | None:
+        with self._lock:
+            self.pending.discard(index)
+            return self.frames.pop(index, None)